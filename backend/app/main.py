@@ -1,7 +1,11 @@
+from dotenv import load_dotenv
+load_dotenv()  # before the routes: some services read their settings at import
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.routes import chat
-import uvicorn
+from backend.routes import batch, chat, metrics, runs
+import os
+import threading
 
 app = FastAPI(title="OpenCompX Agent S3 Backend")
 
@@ -23,6 +27,31 @@ app.include_router(chat.router, prefix="/api") # or just app.include_router(chat
 # So I should include it at root.
 
 app.include_router(chat.router)
+app.include_router(metrics.router)
+app.include_router(batch.router)
+app.include_router(runs.router)
+
+
+@app.on_event("startup")
+def warm_up_agent():
+    """Heavy imports and AgentService construction happen in the background; the API is up immediately."""
+    if os.getenv("AGENT_WARMUP", "1").lower() in ("1", "true", "yes"):
+        from backend.services.agent_service import warm_up
+        threading.Thread(target=warm_up, name="agent-warmup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_sandbox_pools():
+    """Branch and batch sandboxes are kept warm between runs; stop the idle ones with the worker."""
+    from backend.services.agent_service import shutdown_sandbox_pools
+    shutdown_sandbox_pools()
+
 
 if __name__ == "__main__":
-    uvicorn.run("backend.app.main:app", host="0.0.0.0", port=8000, reload=True)
+    import uvicorn
+    # Production entry point; BACKEND_RELOAD=1 enables the dev auto-reloader
+    reload = os.getenv("BACKEND_RELOAD", "0").lower() in ("1", "true", "yes")
+    # Several workers need a shared session store (SESSION_STORE=sqlite or redis)
+    workers = 1 if reload else int(os.getenv("BACKEND_WORKERS", 1))
+    uvicorn.run("backend.app.main:app", host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", 8000)),
+                reload=reload, workers=workers)
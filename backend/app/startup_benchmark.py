@@ -0,0 +1,58 @@
+"""
+Startup Benchmark - Import time of the backend app and its heaviest modules.
+
+Runs `python -X importtime -c "import backend.app.main"` in a fresh
+interpreter (repeatedly, best run wins) and reports the total and the
+slowest top-level packages. Exits non-zero above --budget seconds so it can
+guard CI against heavy imports creeping back into the startup path.
+
+    python -m backend.app.startup_benchmark --runs 5 --budget 1.0
+"""
+
+import re
+import sys
+import subprocess
+from collections import defaultdict
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _importtime(code: str) -> list[tuple[int, int, int, str]]:
+    """(self us, cumulative us, nesting, module) per line of `-X importtime` output."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    return [(int(m.group(1)), int(m.group(2)), len(m.group(3)), m.group(4))
+            for m in map(_LINE.match, proc.stderr.splitlines()) if m]
+
+
+def measure(module: str = "backend.app.main") -> tuple[float, dict[str, float]]:
+    """(total seconds, self seconds per top-level package) for one cold import of `module`."""
+    startup = {name for _, _, _, name in _importtime("pass")}
+    packages: dict[str, float] = defaultdict(float)
+    total = 0.0
+    for self_us, cumulative_us, nesting, name in _importtime(f"import {module}"):
+        if name in startup:
+            continue
+        packages[name.split(".")[0]] += self_us / 1e6
+        if nesting == 1:  # imported directly by the measured statement
+            total += cumulative_us / 1e6
+    return total, dict(packages)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure backend import time.")
+    parser.add_argument("--module", default="backend.app.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=None, help="Fail if the best run exceeds this (seconds)")
+    args = parser.parse_args()
+
+    best_total, best_packages = min((measure(args.module) for _ in range(args.runs)), key=lambda r: r[0])
+    print(f"import {args.module}: {best_total * 1000:.0f} ms (best of {args.runs})")
+    for name, seconds in sorted(best_packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+    if args.budget is not None and best_total > args.budget:
+        print(f"Over budget ({args.budget * 1000:.0f} ms)")
+        sys.exit(1)
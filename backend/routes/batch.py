@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from backend.services.batch import BatchRunner, parse_tasks
+import json
+import os
+
+router = APIRouter()
+
+@router.post("/batch")
+async def run_batch(request: Request):
+    """
+    Run a batch of tasks headlessly and stream one NDJSON result record per task.
+    Body: JSONL (one task per line) or JSON {"tasks": [...], "concurrency": N}.
+    """
+    body = (await request.body()).decode()
+    concurrency = int(request.query_params.get("concurrency", os.getenv("BATCH_CONCURRENCY", 2)))
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            payload = json.loads(body)
+            concurrency = int(payload.get("concurrency", concurrency))
+            tasks = parse_tasks(t if isinstance(t, str) else json.dumps(t) for t in payload.get("tasks", []))
+        else:
+            tasks = parse_tasks(body.splitlines())
+    except (ValueError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {e}")
+    if not tasks:
+        raise HTTPException(status_code=400, detail="No tasks given")
+
+    from backend.services.agent_service import get_agent_service  # heavy: imported on first use, not at startup
+    runner = BatchRunner(get_agent_service(), concurrency)
+
+    def records():
+        for record in runner.run(tasks):
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(iterate_in_threadpool(records()), media_type="application/x-ndjson")
@@ -1,12 +1,14 @@
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from backend.services.agent_service import AgentService
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from backend.services.sessions import get_session_registry, TERMINAL_STATUSES, WORKER_ID
+from backend.services.blobs import blobs
+from backend.services.event_log import event_logs, RunEventLog
 import json
 import asyncio
 
 router = APIRouter()
-agent_service = AgentService()
 
 class ChatRequest(BaseModel):
     messages: list
@@ -15,23 +17,49 @@ class ChatRequest(BaseModel):
     resolution: list[int] | None = None
     image: str | None = None
     selectedTool: str | None = None
+    conversationId: str | None = None
 
     class Config:
         extra = "ignore"
 
-async def event_generator(instruction: str, existing_sandbox_id: str | None, resolution: list[int] | None, reset_env: bool = False, image: str | None = None, selectedTool: str | None = None):
-    """Generate SSE events with proper structured format for frontend consumption."""
+async def event_generator(instruction: str, existing_sandbox_id: str | None, resolution: list[int] | None, reset_env: bool = False, image: str | None = None, selectedTool: str | None = None, conversation_id: str | None = None, events: RunEventLog | None = None):
+    """
+    Generate SSE events with proper structured format for frontend consumption.
+    `events` is the run's resumable event log; it is bound to the run id once the run exists.
+    """
     
+    registry = get_session_registry()
+    run = None
+    stream = None
+    final_status = "running"
     try:
-        # 1. Reset/Prepare Backend State
-        agent_service.ensure_backend_ready()
+        # AgentService (and its transport, httpx and gui_agents) is imported and constructed on the
+        # first request, not at app import
+        from backend.services.agent_service import get_agent_service
+        agent_service = get_agent_service()
+
+        # One run per worker at a time; more throughput means more workers (see SESSION_STORE)
+        if agent_service.active_run_id:
+            yield f"event: error\ndata: {json.dumps({'content': f'Worker {WORKER_ID} is busy with run {agent_service.active_run_id}.'})}\n\n"
+            return
+        run = registry.create_run(instruction, sandbox=agent_service.container_name, conversation=conversation_id)
+        agent_service.active_run_id = run.run_id
+        if events is not None:
+            event_logs.bind(run.run_id, events)
+        yield f"event: run\ndata: {json.dumps({'runId': run.run_id, 'worker': run.worker})}\n\n"
+
+        # 1. Reset/Prepare Backend State (follow-ups keep the desktop and agent context)
+        history = agent_service.begin_turn(conversation_id, reset_env)
         
         # 2. Initialize Sandbox
         res = resolution if resolution and len(resolution) == 2 else None
         info = agent_service.initialize_sandbox(resolution=res)
         
         yield f"event: sandbox_created\ndata: {json.dumps({'sandboxId': info['sandbox_id'], 'vncUrl': info['vnc_url']})}\n\n"
-        yield f"event: reasoning\ndata: {json.dumps({'content': 'Initializing Agent (V0.1 LangGraph)...'})}\n\n"
+        if history:
+            yield f"event: reasoning\ndata: {json.dumps({'content': f'Continuing in the same desktop (turn {len(history) + 1})...'})}\n\n"
+        else:
+            yield f"event: reasoning\ndata: {json.dumps({'content': 'Initializing Agent (V0.1 LangGraph)...'})}\n\n"
         
         # 2. Run LangGraph Agent
         if not agent_service.langgraph_agent:
@@ -39,17 +67,37 @@ async def event_generator(instruction: str, existing_sandbox_id: str | None, res
              return
 
         # V0.1: Use LangGraph Runner
-        stream = agent_service.langgraph_agent.run(instruction, user_image=image)
+        # Decode the attached image once; the graph only carries a blob reference
+        task = agent_service.follow_up_instruction(instruction, history) if history else instruction
+        stream = agent_service.langgraph_agent.run(task, user_image=blobs.put_base64(image),
+                                                   cancel_check=lambda: registry.cancel_requested(run.run_id) or (
+                                                       events is not None and events.abandoned(event_logs.grace)),
+                                                   follow_up=bool(history), run_id=run.run_id)
         
         pending_actions = []
 
-        for output in stream:
+        # The graph blocks between steps: iterate it off the event loop so followers keep streaming
+        async for output in iterate_in_threadpool(stream):
             # Keep-Alive Ping
             yield f"event: ping\ndata: {json.dumps({'timestamp': 1})}\n\n"
             
-            # Handle Agent Node Output
-            if "agent" in output:
-                payload = output["agent"]
+            # Fan-out: split announcement, per-branch progress and branch completion
+            if "split" in output:
+                for log in output["split"].get("logs", []):
+                    yield f"event: reasoning\ndata: {json.dumps({'content': log})}\n\n"
+                continue
+            if "branch_progress" in output:
+                yield f"event: branch\ndata: {json.dumps(output['branch_progress'])}\n\n"
+                continue
+            if "branch" in output:
+                for result in output["branch"].get("branch_results", []):
+                    summary = {k: v for k, v in result.items() if k != "report"}
+                    yield f"event: branch\ndata: {json.dumps({**summary, 'final': True})}\n\n"
+                continue
+
+            # Handle Agent Node Output (the reducer reports a fanned-out run the same way)
+            if "agent" in output or "reduce" in output:
+                payload = output.get("agent") or output["reduce"]
                 logs = payload.get("logs", [])
                 actions = payload.get("latest_actions", [])
                 status = payload.get("status", "running")
@@ -71,10 +119,34 @@ async def event_generator(instruction: str, existing_sandbox_id: str | None, res
                     final_msg = "Task completed successfully."
                     if actions: # If explicit DONE action
                          final_msg = "Task completed."
-                    yield f"event: done\ndata: {json.dumps({'content': final_msg})}\n\n"
+                    final_status = status
+                    yield f"event: done\ndata: {json.dumps({'content': final_msg, 'stats': agent_service.langgraph_agent.run_report()})}\n\n"
                     break
                 elif status == "fail":
-                    yield f"event: done\ndata: {json.dumps({'content': 'Task failed.'})}\n\n"
+                    final_status = status
+                    yield f"event: done\ndata: {json.dumps({'content': 'Task failed.', 'stats': agent_service.langgraph_agent.run_report()})}\n\n"
+                    break
+                elif status == "quota":
+                    final_status = status
+                    report = agent_service.langgraph_agent.run_report()
+                    stop_msg = f"Task stopped: {report['quota']['exceeded']}."
+                    yield f"event: done\ndata: {json.dumps({'content': stop_msg, 'stats': report})}\n\n"
+                    break
+                elif status == "stalled":
+                    final_status = status
+                    report = agent_service.langgraph_agent.run_report()
+                    stop_msg = (f"Task stopped: no progress after repeated attempts "
+                                f"({report['stall']['steps_saved']} steps of budget saved).")
+                    yield f"event: done\ndata: {json.dumps({'content': stop_msg, 'stats': report})}\n\n"
+                    break
+                elif status == "error":
+                    final_status = status
+                    error_msg = next((log for log in reversed(logs) if log), "Agent error.")
+                    yield f"event: error\ndata: {json.dumps({'content': error_msg, 'stats': agent_service.langgraph_agent.run_report()})}\n\n"
+                    break
+                elif status == "cancelled":
+                    final_status = status
+                    yield f"event: done\ndata: {json.dumps({'content': 'Task cancelled.', 'stats': agent_service.langgraph_agent.run_report()})}\n\n"
                     break
                 
                 # Yield Actions
@@ -114,7 +186,31 @@ async def event_generator(instruction: str, existing_sandbox_id: str | None, res
                 pass
                 
     except Exception as e:
+        final_status = "error"
         yield f"event: error\ndata: {json.dumps({'content': str(e)})}\n\n"
+    finally:
+        if run is not None:
+            if final_status not in TERMINAL_STATUSES:
+                # Stream ended early (producer stopped): stop the graph at its next step
+                registry.request_cancel(run.run_id)
+                final_status = "cancelled" if final_status == "running" else final_status
+            if stream is not None:
+                # Blocks (off the event loop) until the graph has really stopped acting on the desktop
+                try:
+                    await run_in_threadpool(stream.close)
+                except ValueError:
+                    pass  # still executing a step in the threadpool; it ends at the cancel check
+            registry.update_run(run.run_id, status=final_status)
+            agent_service.end_turn(instruction)
+            agent_service.active_run_id = None
+
+async def _produce(events: RunEventLog, generator):
+    """Drive the run independently of any HTTP connection, numbering every event into its log."""
+    try:
+        async for chunk in generator:
+            events.append(chunk)
+    finally:
+        events.close()
 
 @router.post("/chat")
 async def chat(request: ChatRequest):
@@ -128,8 +224,10 @@ async def chat(request: ChatRequest):
     # If messages length is 1 (just the new prompt), we clean up.
     should_reset_env = len(request.messages) == 1
     
-    return StreamingResponse(
-        event_generator(last_message, request.sandboxId, request.resolution, should_reset_env, request.image, request.selectedTool),
-        media_type="text/event-stream"
-    )
+    # The run keeps going if this response drops; clients resume with GET /runs/{runId}/events
+    events = event_logs.create()
+    events.producer = asyncio.create_task(_produce(events, event_generator(
+        last_message, request.sandboxId, request.resolution, should_reset_env, request.image, request.selectedTool,
+        request.conversationId, events=events)))
+    return StreamingResponse(events.follow(), media_type="text/event-stream")
 
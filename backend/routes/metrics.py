@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from backend.services.metrics import metrics
+from backend.services.replicas import all_replica_stats
+from backend.services.grounding_tiers import tier_stats
+from backend.services.pacing import pacing
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/grounding/replicas")
+async def grounding_replicas():
+    """Per-replica routing and latency stats for the UI-TARS grounding pools."""
+    return all_replica_stats()
+
+@router.get("/grounding/tiers")
+async def grounding_tiers():
+    """Hit rate and mean latency per grounding tier (a11y, template, ocr, uitars)."""
+    return tier_stats.snapshot()
+
+@router.get("/pacing")
+async def pacing_timings():
+    """Learned post-action settle times per action type."""
+    return pacing.snapshot()
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import JSONResponse, StreamingResponse
+from backend.services.sessions import get_session_registry, WORKER_ID
+from backend.services.recording import RECORDING_DIR
+from backend.services.event_log import event_logs
+import json
+
+router = APIRouter()
+
+def _describe(record) -> dict:
+    """Run record plus where it lives, so a load balancer or client can route to the owning worker."""
+    owner = get_session_registry().worker_info(record.worker) or {}
+    return {**record.to_dict(), "owner_url": owner.get("url") or None, "owner_alive": owner.get("alive", False),
+            "local": record.worker == WORKER_ID}
+
+@router.get("/runs")
+async def list_runs(limit: int = 50, worker: str | None = None):
+    """Recent runs across all workers sharing the session store."""
+    return [_describe(r) for r in get_session_registry().list_runs(limit=limit, worker=worker)]
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """Status and owner of one run; `X-Run-Owner` lets a sticky load balancer route follow-ups."""
+    record = get_session_registry().get_run(run_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown run")
+    return JSONResponse(_describe(record), headers={"X-Run-Owner": record.worker})
+
+@router.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    """Request cancellation; the owning worker (any process/node) stops the run before its next step."""
+    record = get_session_registry().request_cancel(run_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown run")
+    return _describe(record)
+
+@router.get("/runs/{run_id}/events")
+async def run_events(run_id: str, after: int | None = None, last_event_id: str | None = Header(None)):
+    """Resume a run's SSE stream after `Last-Event-ID` (or `?after=`): missed events first, then live ones."""
+    events = event_logs.get(run_id)
+    if events is None:
+        record = get_session_registry().get_run(run_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Unknown run")
+        raise HTTPException(status_code=404, detail="Run events are not buffered on this worker (expired or remote)",
+                            headers={"X-Run-Owner": record.worker})
+    if after is None:
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(events.follow(after), media_type="text/event-stream",
+                             headers={"X-Run-Owner": WORKER_ID})
+
+@router.get("/runs/{run_id}/recording")
+async def run_recording(run_id: str):
+    """Storage stats and action timeline of a run's recording (on the node that executed it)."""
+    index = RECORDING_DIR / run_id / "index.json"
+    if not index.exists():
+        raise HTTPException(status_code=404, detail="No recording for this run (yet)")
+    data = json.loads(index.read_text())
+    return {"stats": data["stats"], "format": data["format"], "size": data["size"], "events": data["events"]}
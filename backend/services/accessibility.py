@@ -0,0 +1,167 @@
+"""
+Accessibility Observation - Compact AT-SPI tree from the desktop sandbox.
+
+The sandbox ships `a11y-dump` (docker/a11y_dump.py), which walks the AT-SPI
+registry (GTK widgets and, with accessibility enabled, Firefox page content)
+and prints visible named/interactive nodes with their screen extents. The
+provider caches one snapshot per screen state, diffs it against the previous
+one so the planner only sees what changed, and resolves element descriptions
+like "the Save button" to screen coordinates before anything reaches UI-TARS.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+from dataclasses import dataclass
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Words in grounding queries that describe the target rather than name it
+_STOPWORDS = {"the", "a", "an", "on", "in", "of", "to", "at", "click", "button", "field", "icon", "link",
+              "tab", "menu", "item", "box", "input", "text", "labeled", "labelled", "named", "called", "with"}
+_ROLE_HINTS = {
+    "button": {"push button", "toggle button"},
+    "link": {"link"},
+    "tab": {"page tab"},
+    "checkbox": {"check box"},
+    "field": {"text", "entry", "password text", "combo box"},
+    "input": {"text", "entry", "password text"},
+    "menu": {"menu", "menu item"},
+}
+
+
+@dataclass(frozen=True)
+class A11yNode:
+    """One visible accessible element in desktop coordinates."""
+    id: str
+    role: str
+    name: str
+    x: int
+    y: int
+    width: int
+    height: int
+
+    @property
+    def center(self) -> tuple[int, int]:
+        return self.x + self.width // 2, self.y + self.height // 2
+
+    def describe(self) -> str:
+        return f"[{self.role}] {self.name!r} @ {self.center[0]},{self.center[1]}"
+
+
+def _tokens(text: str) -> set[str]:
+    return set(_WORD.findall(text.lower()))
+
+
+class AccessibilityProvider:
+    """Snapshots, diffs and queries the sandbox accessibility tree."""
+
+    def __init__(self, adapter, max_nodes: int = 2000, ttl: float = 2.0, min_score: float = 0.75):
+        self.adapter = adapter
+        self.max_nodes = max_nodes
+        self.ttl = ttl
+        self.min_score = min_score
+        self.available = True
+        self.nodes: dict[str, A11yNode] = {}
+        self.previous: dict[str, A11yNode] = {}
+        self.taken_at = 0.0
+
+    def invalidate(self):
+        """Force the next snapshot to re-read the tree (call after acting on the desktop)."""
+        self.taken_at = 0.0
+
+    def snapshot(self, force: bool = False) -> dict[str, A11yNode]:
+        """Current tree, re-read at most once per `ttl` seconds unless invalidated."""
+        if not self.available:
+            return {}
+        if not force and self.taken_at and time.time() - self.taken_at < self.ttl:
+            return self.nodes
+
+        start = time.perf_counter()
+        result = self.adapter._exec(f"a11y-dump {int(self.max_nodes)}", timeout=10)
+        if result.returncode == 127:
+            logger.warning("a11y-dump not found in the sandbox image, disabling accessibility observations")
+            self.available = False
+            return {}
+        try:
+            rows = json.loads(result.stdout or "[]")
+        except json.JSONDecodeError:
+            logger.debug(f"a11y-dump returned invalid JSON: {result.stderr.strip()[:200]}")
+            rows = []
+
+        self.previous = self.nodes
+        self.nodes = {row[0]: A11yNode(*row[:7]) for row in rows if len(row) >= 7}
+        self.taken_at = time.time()
+        metrics.observe("a11y_snapshot_seconds", time.perf_counter() - start)
+        return self.nodes
+
+    def diff(self) -> dict[str, list[A11yNode]]:
+        """Nodes added, removed or changed (moved/renamed) since the previous snapshot."""
+        added = [n for key, n in self.nodes.items() if key not in self.previous]
+        removed = [n for key, n in self.previous.items() if key not in self.nodes]
+        changed = [n for key, n in self.nodes.items() if key in self.previous and self.previous[key] != n]
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def observation(self, limit: int = 60) -> str:
+        """Compact text for the planner: the full tree on the first step, then only the diff."""
+        nodes = self.snapshot()
+        if not nodes:
+            return ""
+        if not self.previous:
+            lines = [n.describe() for n in list(nodes.values())[:limit]]
+            return "UI elements:\n" + "\n".join(lines)
+        delta = self.diff()
+        lines = [f"+ {n.describe()}" for n in delta["added"]] + [f"~ {n.describe()}" for n in delta["changed"]]
+        lines += [f"- [{n.role}] {n.name!r}" for n in delta["removed"]]
+        if not lines:
+            return "UI elements: unchanged"
+        return "UI changes:\n" + "\n".join(lines[:limit])
+
+    def resolve(self, description: str, region=None) -> tuple[int, int] | None:
+        """
+        Best node matching a grounding description, as screen coordinates. Returns
+        None when nothing matches confidently or two candidates tie (ambiguous).
+        """
+        query = _tokens(description)
+        wanted = query - _STOPWORDS
+        if not wanted:
+            return None
+        roles = set().union(*(_ROLE_HINTS[w] for w in query if w in _ROLE_HINTS)) if query & _ROLE_HINTS.keys() else set()
+
+        scored = []
+        for node in self.snapshot().values():
+            if not node.name:
+                continue
+            if region and not (region[0] <= node.center[0] < region[0] + region[2]
+                               and region[1] <= node.center[1] < region[1] + region[3]):
+                continue
+            name = _tokens(node.name)
+            if not name:
+                continue
+            overlap = len(wanted & name)
+            score = overlap / len(wanted | name) if overlap else 0.0
+            if overlap == len(wanted):
+                score = max(score, 0.8)  # every query word is in the name
+            if roles and node.role in roles:
+                score += 0.1
+            scored.append((score, node))
+
+        if not scored:
+            return None
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best_score, best = scored[0]
+        if best_score < self.min_score or (len(scored) > 1 and scored[1][0] == best_score):
+            return None
+        return best.center
+
+
+def get_accessibility_provider(adapter) -> AccessibilityProvider | None:
+    """Provider for `adapter` when A11Y_OBSERVATION is enabled, else None."""
+    if os.getenv("A11Y_OBSERVATION", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return AccessibilityProvider(adapter, max_nodes=int(os.getenv("A11Y_MAX_NODES", 2000)))
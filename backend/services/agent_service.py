@@ -5,21 +5,50 @@ No E2B dependency - runs entirely locally with Docker + VNC.
 
 import os
 import time
+import logging
+import threading
 from dotenv import load_dotenv
 
 # Import local adapter
 from backend.services.local_adapter import LocalDockerAdapter, is_container_running, start_container, get_novnc_url
+from backend.services.transport import attach_shared_clients
+from backend.services.replicas import get_replica_pool
+from backend.services.grounding_broker import get_grounding_broker
+from backend.services.prompts import PromptAssembler
+from backend.services.desktop_reset import get_reset_strategy
+from backend.services.sandbox import get_provisioner, get_profile
+from backend.services.metrics import metrics
+from backend.services.resources import ResourceMonitor, RunQuota
+from backend.services.imaging import crop_png, clamp_region, offset_point, png_size
+from backend.services.accessibility import get_accessibility_provider
+from backend.services.grounding_tiers import build_tiered_grounder, tier_stats
+from backend.services.fanout import SandboxPool
+from backend.services.blobs import blobs
+from backend.services.sessions import get_session_registry
+from backend.services.cascade import PlannerCascade
 
-# Try importing from gui_agents
-try:
-    from gui_agents.s3.agents.agent_s import AgentS3
-    from gui_agents.s3.agents.grounding import OSWorldACI
-except ImportError as e:
-    import traceback
-    print(f"CRITICAL WARNING: gui_agents failed to import: {e}")
-    traceback.print_exc()
-    AgentS3 = None
-    OSWorldACI = None
+logger = logging.getLogger(__name__)
+
+_gui_agents = None
+_gui_agents_lock = threading.Lock()
+
+
+def load_gui_agents():
+    """
+    Import gui_agents (AgentS3, OSWorldACI) on first use rather than at module
+    import; it is by far the heaviest dependency. Returns (None, None) if unavailable.
+    """
+    global _gui_agents
+    with _gui_agents_lock:
+        if _gui_agents is None:
+            try:
+                from gui_agents.s3.agents.agent_s import AgentS3
+                from gui_agents.s3.agents.grounding import OSWorldACI
+                _gui_agents = (AgentS3, OSWorldACI)
+            except ImportError as e:
+                logger.error(f"gui_agents failed to import: {e}", exc_info=True)
+                _gui_agents = (None, None)
+        return _gui_agents
 
 class GroundingProxy:
     """
@@ -29,14 +58,32 @@ class GroundingProxy:
     - Allows the Planner (Agent-S) to run WITHOUT seeing the screenshot (saving tokens).
     - When the Planner calls the Grounder, this proxy re-injects the real screenshot 
       that was cached from the latest observation.
+    - When a focus region is set (e.g. the active dialog), grounding runs on that
+      crop only and the returned coordinates are translated back to screen space.
+    - CPU-local tiers (accessibility tree, template matching, OCR) are tried
+      first; only unresolved queries reach UI-TARS.
     """
-    def __init__(self, real_grounder):
+    def __init__(self, real_grounder, broker=None, accessibility=None, tiers=None):
         self.real_grounder = real_grounder
+        self.broker = broker
+        self.accessibility = accessibility
+        self.tiers = tiers
         self.latest_screenshot = None
+        self.focus_region = None
+        # AgentS3 evaluates `agent.click(...)` on the real grounder, which grounds through its
+        # own generate_coords; route that call through the proxy instead
+        self._generate_coords = getattr(real_grounder, "generate_coords", None)
+        if self._generate_coords:
+            real_grounder.generate_coords = self.generate_coords
         
-    def update_screenshot(self, screenshot: bytes):
-        """Update the cached screenshot."""
-        self.latest_screenshot = screenshot
+    def update_screenshot(self, screenshot, region=None):
+        """
+        Update the cached screenshot and the region the next grounding call targets.
+        Bytes are stored here; a blob ref passes its reference to the proxy. The previous frame is released.
+        """
+        previous, self.latest_screenshot = self.latest_screenshot, blobs.put(screenshot)
+        blobs.release(previous)
+        self.focus_region = region
         
     # --- Compatibility Methods (Fixing AttributeErrors from Planner) ---
     def screenshot(self):
@@ -89,26 +136,67 @@ class GroundingProxy:
         """Compat alias for scroll."""
         return f"agent.scroll({clicks})"
 
-    def predict(self, *args, **kwargs):
-        """Intercept the grounding call and inject the real screenshot."""
-        # If we have a cached screenshot, inject it into the observation
-        if self.latest_screenshot:
-            if "observation" in kwargs:
-                kwargs["observation"]["screenshot"] = self.latest_screenshot
-            elif len(args) > 1 and isinstance(args[1], dict):
-                 # Handle positional args: (instruction, observation)
-                 args[1]["screenshot"] = self.latest_screenshot
-        
-        # Determine strict mode based on observation (heuristics)
-        # If Planner didn't see the screen, we need fairly strict grounding
-        return self.real_grounder.predict(*args, **kwargs)
+    def _screen_size(self, frame):
+        """Screen and grounding-model dimensions ((W, H), (gw, gh)) used by OSWorldACI.resize_coordinates."""
+        size = png_size(frame) if frame else None
+        screen = (getattr(self.real_grounder, "width", None) or (size[0] if size else 1),
+                  getattr(self.real_grounder, "height", None) or (size[1] if size else 1))
+        params = getattr(self.real_grounder, "engine_params_for_grounding", None) or {}
+        model = (params.get("grounding_width") or screen[0], params.get("grounding_height") or screen[1])
+        return screen, model
+
+    @staticmethod
+    def _model_space(image, screen, model):
+        """
+        Coordinate space the grounding model answers in for an `image`-sized input. A model
+        configured at screen size (UI-TARS here) answers in the pixels of whatever it is shown,
+        so a crop is answered in crop pixels; a normalised model (e.g. 1000x1000) keeps its space.
+        """
+        return tuple(image) if tuple(model) == tuple(screen) else tuple(model)
+
+    def generate_coords(self, ref_expr, obs):
+        """
+        Grounding hook for OSWorldACI's click/type/drag actions (installed on the real grounder).
+        Tries the local tiers, otherwise grounds on the focus-region crop of the cached screenshot
+        and maps the answer back to the grounding model's full-screen coordinate space.
+        """
+        full_frame = blobs.get(self.latest_screenshot) or (obs or {}).get("screenshot")
+        (width, height), (gw, gh) = self._screen_size(full_frame)
+        region = clamp_region(self.focus_region, width, height) if self.focus_region else None
+
+        # Common targets resolve locally (a11y tree, templates, OCR) without a GPU call
+        point = None
+        if self.tiers and ref_expr and full_frame:
+            point = self.tiers.locate(ref_expr, full_frame, region)
+        if not point:
+            screenshot = crop_png(full_frame, region) if full_frame and region else full_frame
+            observation = dict(obs or {}, screenshot=screenshot) if screenshot else obs
+            start = time.perf_counter()
+            if self.broker:
+                # Batch with grounding calls from other sessions
+                coords = self.broker.submit(self._generate_coords, ref_expr, observation)
+            else:
+                coords = self._generate_coords(ref_expr, observation)
+            tier_stats.record("uitars", time.perf_counter() - start, hit=True)
+            # Convert from the coordinate space the model used for the image it saw, then
+            # shift crop-relative pixels back onto the screen
+            span = tuple(region[2:]) if region else (width, height)
+            space = self._model_space(span, (width, height), (gw, gh))
+            point = (round(coords[0] * span[0] / space[0]), round(coords[1] * span[1] / space[1]))
+            point = offset_point(point, region) if region else point
+            # Let the template tier resolve this target locally next time
+            if self.tiers and ref_expr:
+                self.tiers.remember(ref_expr, full_frame, point)
+
+        # OSWorldACI rescales our answer with resize_coordinates, so return it in grounding space
+        return [round(point[0] * gw / width), round(point[1] * gh / height)]
 
     def __getattr__(self, name):
         """Delegate all other calls to the real grounder."""
         return getattr(self.real_grounder, name)
 
 class AgentService:
-    def __init__(self):
+    def __init__(self, grounding_endpoints: list[str] | None = None):
         load_dotenv()
         
         self.provider = os.getenv("LLM_PROVIDER", "google")
@@ -118,10 +206,16 @@ class AgentService:
             default_model = "accounts/fireworks/models/kimi-k2p5"
             
         self.model = os.getenv("LLM_MODEL", default_model)
+        self.prompts = PromptAssembler(self.provider)
         
         # Grounding Config (UI-TARS local)
         self.ground_provider = "openai"
-        self.ground_url = os.getenv("VISION_SERVICE_URL", "http://localhost:8080/v1")
+        # VISION_SERVICE_URL may list several comma-separated UI-TARS replicas
+        self.ground_urls = grounding_endpoints or [
+            u.strip() for u in os.getenv("VISION_SERVICE_URL", "http://localhost:8080/v1").split(",") if u.strip()
+        ]
+        self.ground_url = self.ground_urls[0]
+        self.ground_pool = get_replica_pool(self.ground_urls)
         self.ground_model = os.getenv("VISION_MODEL", "ByteDance-Seed/UI-TARS-1.5-7B")
         self.ground_width = 1920
         self.ground_height = 1080
@@ -131,16 +225,65 @@ class AgentService:
         self.langgraph_agent = None
         self.vnc_url = None
         self.container_running = False
-        self.container_name = "opencompx-desktop"
+        # Each worker process claims its own desktop in the shared session registry
+        self.registry = get_session_registry()
+        self.worker_slot, self.container_name = self._claim_desktop()
+        self.reset_strategy = get_reset_strategy()
+        self.quota = RunQuota.from_env()
+        self.monitor = ResourceMonitor(self.container_name, interval=float(os.getenv("SANDBOX_STATS_INTERVAL", 5)))
+
+        # Sandbox profile: 'full' (Xfce + TigerVNC) or 'lite' (Xvfb + Openbox, VNC on demand)
+        self.sandbox_profile = get_profile()
 
-    def initialize_sandbox(self, resolution=None):
-        """Initialize local Docker container for desktop automation."""
+        # Build the desktop image in the background if its Dockerfile changed
+        get_provisioner(self.sandbox_profile.name).prebuild()
+
+        self.active_run_id = None  # run id (session registry) currently streaming on this worker
+
+        # Conversation continuity: follow-ups keep the desktop and agent trajectory until idle eviction
+        self.conversation = None  # {"id", "instructions", "last_active"}
+        self.conversation_idle_timeout = float(os.getenv("CONVERSATION_IDLE_TIMEOUT", 600))
+        self._conversation_lock = threading.Lock()
+        self._reaper = None
+
+        # Fan-out: independent sub-goals run on extra sandboxes leased from this pool
+        self.branch_pool = SandboxPool(self.sandbox_profile.name, max_size=int(os.getenv("FANOUT_MAX_BRANCHES", 3)),
+                                       prefix=self.pool_prefix("branch"))
+        self._branch_agents = {}  # branch sandbox name -> LangGraphAgentService
+        # Batch runs share one pool per worker, so concurrent batches never reuse each other's container names
+        self.batch_pool = SandboxPool(self.sandbox_profile.name, max_size=int(os.getenv("BATCH_MAX_SANDBOXES", 4)),
+                                      prefix=self.pool_prefix("batch"))
+
+    def _claim_desktop(self, max_slots: int = 64) -> tuple[int, str]:
+        """
+        First desktop name not held by another live worker. Slot 0 is the
+        default `opencompx-desktop` on the fixed VNC ports; further workers get
+        `opencompx-desktop-<n>` on ephemeral ports.
+        """
+        base = os.getenv("SANDBOX_NAME", "opencompx-desktop")
+        for slot in range(max_slots):
+            name = base if slot == 0 else f"{base}-{slot}"
+            if self.registry.claim_sandbox(name):
+                return slot, name
+        raise RuntimeError(f"All {max_slots} desktop sandboxes are claimed by other workers")
+
+    def pool_prefix(self, kind: str) -> str:
+        """Container name prefix for this worker's extra sandboxes (branch, batch)."""
+        return f"opencompx-{kind}" if self.worker_slot == 0 else f"opencompx-{kind}-w{self.worker_slot}"
+
+    def initialize_sandbox(self, resolution=None, watch: bool = True):
+        """
+        Initialize local Docker container for desktop automation.
+        `watch=False` skips VNC for headless runs on the lightweight profile.
+        """
         if not self.container_running:
             print("Checking Local Docker Container...")
+            boot_start = time.perf_counter()
             
-            if not is_container_running():
+            if not is_container_running(self.container_name):
                 print("Container not running, starting it...")
-                if not start_container():
+                ports = None if self.worker_slot == 0 else {5901: None, 6080: None}
+                if not start_container(self.container_name, self.sandbox_profile.name, ports=ports):
                     raise RuntimeError("Failed to start Docker container. Make sure Docker is running.")
                 print("Container started!")
             else:
@@ -162,30 +305,42 @@ class AgentService:
                 print(f"Failed to get resolution, keeping default 1920x1080: {e}")
                 
             # 2. Initialize Agent (Dependency for LangGraph)
-            if not self.agent and AgentS3:
+            if not self.agent and load_gui_agents()[0]:
                  self._init_agent()
                  
             # 3. Initialize LangGraph Agent
             if not self.langgraph_agent:
                 try:
                     from backend.services.langgraph_agent import LangGraphAgentService
-                    self.langgraph_agent = LangGraphAgentService(self.agent, self.adapter)
+                    self.langgraph_agent = LangGraphAgentService(self.agent, self.adapter, prompts=self.prompts,
+                                                                quota=self.quota, monitor=self.monitor,
+                                                                branch_runner=self.run_branch)
                     print("LangGraph Agent Service Initialized!")
                 except Exception as e:
                     print(f"Failed to init LangGraph: {e}")
                     self.langgraph_agent = None
                 
-            # Wait for VNC to be ready (Polling)
-            print("Waiting for VNC availability...")
-            if not self.adapter.wait_for_vnc(timeout=20):
-                 print("WARNING: VNC polling timed out. Desktop might not be viewable.")
-            
-            # Get VNC URL
-            self.vnc_url = get_novnc_url()
+            if watch or not self.sandbox_profile.vnc_on_demand:
+                if self.sandbox_profile.vnc_on_demand:
+                    self.adapter.start_vnc()
+
+                # Wait for VNC to be ready (Polling)
+                print("Waiting for VNC availability...")
+                if not self.adapter.wait_for_vnc(timeout=20):
+                     print("WARNING: VNC polling timed out. Desktop might not be viewable.")
+                
+                # Get VNC URL
+                novnc_port = 6080
+                if self.worker_slot:
+                    novnc_port = get_provisioner(self.sandbox_profile.name).host_port(self.container_name, 6080) or 6080
+                self.vnc_url = get_novnc_url(novnc_port)
             print(f"Desktop ready! VNC: {self.vnc_url}")
             
             # Wait for desktop to be ready
             self._wait_for_desktop_ready()
+            boot_seconds = time.perf_counter() - boot_start
+            metrics.observe("sandbox_boot_seconds", boot_seconds)
+            print(f"Sandbox boot took {boot_seconds:.1f}s")
                 
         return {"sandbox_id": "local-docker", "vnc_url": self.vnc_url}
 
@@ -216,6 +371,11 @@ class AgentService:
             return b""
 
     def _init_agent(self):
+        self.agent, self.grounding_agent, self.grounding_agent_proxy = self._build_agent(self.adapter)
+        print("Agent S3 Initialized!")
+
+    def _build_agent(self, adapter: LocalDockerAdapter):
+        """Planner + proxied grounder bound to `adapter` (the main desktop or a branch sandbox)."""
         if self.provider == "google":
              engine_params = {
                 "engine_type": "google",
@@ -250,8 +410,9 @@ class AgentService:
             "grounding_height": self.ground_height,
         }
 
-        print(f"Initializing OSWorldACI with Grounding URL: {self.ground_url} | Model: {self.ground_model}")
-        self.grounding_agent = OSWorldACI(
+        AgentS3, OSWorldACI = load_gui_agents()
+        print(f"Initializing OSWorldACI with Grounding URLs: {', '.join(self.ground_urls)} | Model: {self.ground_model}")
+        grounding_agent = OSWorldACI(
             env=None,
             platform="linux",
             engine_params_for_generation=engine_params,
@@ -261,16 +422,156 @@ class AgentService:
         )
         
         # Wrap in Proxy to enable cost optimization (Text-Only Planner)
-        self.grounding_agent_proxy = GroundingProxy(self.grounding_agent)
+        accessibility = get_accessibility_provider(adapter)
+        grounding_agent_proxy = GroundingProxy(grounding_agent, broker=get_grounding_broker(),
+                                               accessibility=accessibility,
+                                               tiers=build_tiered_grounder(accessibility))
 
-        self.agent = AgentS3(
+        agent = AgentS3(
             engine_params,
-            self.grounding_agent_proxy, # Use proxy for AgentS3
+            grounding_agent_proxy, # Use proxy for AgentS3
             platform="linux",
             max_trajectory_length=50,
             enable_reflection=True
         )
-        print("Agent S3 Initialized!")
+
+        planners = [agent]
+
+        # Fast/strong planner cascade: routine steps on a cheaper engine, escalate on trouble
+        fast_params = self._fast_engine_params(engine_params)
+        if fast_params is not None:
+            fast_agent = AgentS3(
+                fast_params,
+                grounding_agent_proxy,
+                platform="linux",
+                max_trajectory_length=50,
+                enable_reflection=False
+            )
+            planners.append(fast_agent)
+            agent = PlannerCascade(fast_agent, agent)
+
+        # Share pooled keep-alive clients (retries, rate limits, hedging) across sessions
+        for planner in planners:
+            attach_shared_clients(planner, self.ground_url, replica_pool=self.ground_pool,
+                                  cache_affinity=self.prompts.prefix_hash)
+        return agent, grounding_agent, grounding_agent_proxy
+
+    def _fast_engine_params(self, engine_params: dict) -> dict | None:
+        """Engine params of the cascade's fast tier, or None when the cascade is off or has nothing cheaper."""
+        if os.getenv("PLANNER_CASCADE", "1").lower() not in ("1", "true", "yes"):
+            return None
+        fast_model = os.getenv("PLANNER_FAST_MODEL")
+        if self.provider == "google":
+            return {**engine_params, "model": fast_model or self.model,
+                    "thinking_level": os.getenv("PLANNER_FAST_THINKING", "LOW")}
+        if fast_model and fast_model != self.model:
+            return {**engine_params, "model": fast_model}
+        return None
+
+    def run_branch(self, index: int, instruction: str, emit, cancel_check=None) -> dict:
+        """
+        Run one fan-out sub-goal on a leased branch sandbox; `emit` receives progress events.
+        `cancel_check` is the parent run's, so cancelling the run stops its branches too.
+        """
+        result = self.run_leased(self.branch_pool, instruction, cancel_check=cancel_check,
+                                 on_progress=lambda event: emit({"index": index, "instruction": instruction, **event}))
+        return {"index": index, **result}
+
+    def run_leased(self, pool, instruction: str, on_progress=None, final_screenshot: bool = False,
+                   cancel_check=None, run_id: str | None = None) -> dict:
+        """
+        Run `instruction` to completion on a sandbox leased from `pool` (fan-out
+        branches, batch jobs), without SSE. Agents are cached per sandbox.
+        """
+        lease = pool.lease()
+        start = time.perf_counter()
+        status, last_log, steps, report, screenshot = "running", "", 0, None, None
+        try:
+            if lease.name not in self._branch_agents:
+                from backend.services.langgraph_agent import LangGraphAgentService
+                agent, _, _ = self._build_agent(lease.adapter)
+                self._branch_agents[lease.name] = LangGraphAgentService(agent, lease.adapter, prompts=self.prompts,
+                                                                        quota=self.quota)
+            runner = self._branch_agents[lease.name]
+            stream = runner.run(instruction, cancel_check=cancel_check, run_id=run_id)
+            try:
+                for output in stream:
+                    payload = output.get("agent") or output.get("tools") or {}
+                    steps += 1 if "agent" in output else 0
+                    status = payload.get("status", status)
+                    last_log = (payload.get("logs") or [last_log])[-1]
+                    if on_progress:
+                        on_progress({"sandbox": lease.name, "step": steps, "status": status, "log": last_log})
+            finally:
+                stream.close()  # waits for the graph to stop before the sandbox is released
+            report = runner.run_report()
+            if final_screenshot:
+                screenshot = blobs.put(lease.adapter.screenshot())
+        except Exception as e:
+            status, last_log = "error", str(e)
+            if on_progress:
+                on_progress({"sandbox": lease.name, "step": steps, "status": status, "log": last_log})
+        finally:
+            pool.release(lease)
+        return {"instruction": instruction, "sandbox": lease.name,
+                "status": "done" if status == "running" else status, "summary": last_log,
+                "wall_seconds": round(time.perf_counter() - start, 2), "report": report, "screenshot": screenshot}
+
+    def begin_turn(self, conversation_id: str | None, reset_env: bool) -> list[str]:
+        """
+        Start a chat turn. Returns the earlier instructions of the conversation when this
+        turn continues it (desktop and agent state kept), or [] after resetting for a new one.
+        """
+        now = time.time()
+        with self._conversation_lock:
+            conversation = self.conversation
+            continuing = (
+                not reset_env and conversation is not None and self.langgraph_agent is not None
+                and conversation_id in (None, conversation["id"])
+                and now - conversation["last_active"] < self.conversation_idle_timeout
+            )
+            if not continuing:
+                self.conversation = {"id": conversation_id, "instructions": [], "last_active": now}
+            history = list(self.conversation["instructions"])
+        metrics.inc("chat_turns_total", continued=str(continuing).lower())
+        if not continuing:
+            self.ensure_backend_ready()
+        return history
+
+    def end_turn(self, instruction: str):
+        """Record a finished turn and (re)arm idle eviction."""
+        with self._conversation_lock:
+            if self.conversation is not None:
+                self.conversation["instructions"].append(instruction)
+                self.conversation["last_active"] = time.time()
+            if self._reaper is None and self.conversation_idle_timeout > 0:
+                self._reaper = threading.Thread(target=self._reap_idle_conversation, name="conversation-reaper",
+                                                daemon=True)
+                self._reaper.start()
+
+    def _reap_idle_conversation(self):
+        """Reset the desktop once a conversation has been idle past CONVERSATION_IDLE_TIMEOUT."""
+        while True:
+            time.sleep(min(30.0, self.conversation_idle_timeout / 4))
+            with self._conversation_lock:
+                conversation = self.conversation
+                if (conversation is None or self.active_run_id
+                        or time.time() - conversation["last_active"] < self.conversation_idle_timeout):
+                    continue
+                self.conversation = None
+            logger.info(f"Conversation idle for {self.conversation_idle_timeout:.0f}s, resetting desktop")
+            metrics.inc("conversation_evictions_total")
+            try:
+                self.cleanup_desktop()
+            except Exception as e:
+                logger.warning(f"Idle desktop reset failed: {e}")
+
+    @staticmethod
+    def follow_up_instruction(instruction: str, history: list[str]) -> str:
+        """The follow-up with the conversation's previous requests as context for the planner."""
+        earlier = "; ".join(f'"{text}"' for text in history[-3:])
+        return f"{instruction}\n\n(Follow-up in the same session. Earlier requests: {earlier}. " \
+               f"The desktop is still in the state the last request left it in.)"
 
     def ensure_backend_ready(self):
         """Reset internal state for a new request."""
@@ -285,15 +586,12 @@ class AgentService:
 
 
     def cleanup_desktop(self):
-        """Kill all running applications directly."""
+        """Restore the desktop to its baseline (see DESKTOP_RESET)."""
         if not self.adapter:
              return
-        print("Cleaning up desktop...")
-        self.adapter._exec("pkill -9 -f firefox")
-        self.adapter._exec("pkill -9 -f chrome")
-        self.adapter._exec("pkill -9 -f chromium")
-        self.adapter._exec("pkill -9 -f terminal")
-        time.sleep(1)
+        print(f"Cleaning up desktop ({self.reset_strategy.name})...")
+        elapsed = self.reset_strategy.timed_reset(self.adapter)
+        print(f"Desktop reset in {elapsed:.2f}s")
 
     def _get_human_log(self, action_code: str) -> str:
         """Convert pyautogui code to human-readable description."""
@@ -320,3 +618,37 @@ class AgentService:
         self.cleanup_desktop()
         self.vnc_url = None
         # Don't stop container, just cleanup apps
+
+    def grounding_stats(self) -> list[dict]:
+        """Per-replica routing and latency stats for the grounding endpoints."""
+        return self.ground_pool.stats()
+
+
+_agent_service: AgentService | None = None
+_agent_service_lock = threading.Lock()
+
+
+def get_agent_service() -> AgentService:
+    """Process-wide AgentService, constructed on first use (not at import)."""
+    global _agent_service
+    with _agent_service_lock:
+        if _agent_service is None:
+            start = time.perf_counter()
+            _agent_service = AgentService()
+            metrics.observe("agent_service_init_seconds", time.perf_counter() - start)
+        return _agent_service
+
+
+def shutdown_sandbox_pools():
+    """Stop the idle branch and batch sandboxes of this worker (on app shutdown)."""
+    with _agent_service_lock:
+        service = _agent_service
+    if service is not None:
+        service.branch_pool.shutdown()
+        service.batch_pool.shutdown()
+
+
+def warm_up():
+    """Construct the service and import the GUI agent stack ahead of the first request."""
+    get_agent_service()
+    load_gui_agents()
@@ -0,0 +1,167 @@
+"""
+Batch Runner - Headless bulk execution of scripted tasks.
+
+Reads tasks as JSONL (`{"id": ..., "instruction": ...}` or one plain
+instruction per line), runs them across a pool of leased sandboxes with
+configurable concurrency and emits one structured result record per task
+as it finishes: status, steps, tokens, wall time and a content-addressed
+final screenshot. A summary record with aggregate throughput (tasks/hour)
+closes the stream.
+
+    python -m backend.services.batch tasks.jsonl -o results.jsonl --concurrency 4
+
+The same runner backs `POST /batch`.
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from backend.services.blobs import blobs
+from backend.services.metrics import metrics
+from backend.services.sandbox import SCREENSHOTS_DIR
+from backend.services.sessions import get_session_registry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchTask:
+    id: str
+    instruction: str
+
+
+def parse_tasks(lines: Iterable[str]) -> list[BatchTask]:
+    """JSONL objects with an `instruction` (and optional `id`), or plain-text instructions."""
+    tasks = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            record = json.loads(line)
+            if not record.get("instruction"):
+                raise ValueError(f"Line {number}: missing 'instruction'")
+            tasks.append(BatchTask(str(record.get("id", number)), record["instruction"]))
+        else:
+            tasks.append(BatchTask(str(number), line))
+    return tasks
+
+
+class BatchRunner:
+    """Schedules tasks over `concurrency` sandboxes and yields result records as they complete."""
+
+    def __init__(self, agent_service, concurrency: int = 2, screenshots_dir: str | None = None):
+        self.agent_service = agent_service
+        self.registry = get_session_registry()
+        # The worker's shared batch pool bounds the sandboxes of all concurrent batches
+        self.pool = agent_service.batch_pool
+        self.concurrency = max(1, min(concurrency, self.pool.max_size))
+        self.screenshots_dir = Path(screenshots_dir or Path(SCREENSHOTS_DIR) / "batch")
+
+    def _run_one(self, task: BatchTask) -> dict:
+        run = self.registry.create_run(task.instruction, kind="batch")
+        try:
+            result = self.agent_service.run_leased(self.pool, task.instruction, final_screenshot=True,
+                                                   cancel_check=lambda: self.registry.cancel_requested(run.run_id),
+                                                   run_id=run.run_id)
+        except Exception:
+            self.registry.update_run(run.run_id, status="error")
+            raise
+        report = result.get("report") or {}
+        usage = report.get("usage") or {}
+        record = {
+            "id": task.id,
+            "run_id": run.run_id,
+            "instruction": task.instruction,
+            "status": result["status"],
+            "summary": result["summary"],
+            "steps": report.get("steps", 0),
+            "planner_calls": report.get("planner_calls", 0),
+            "tokens": usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0),
+            "wall_seconds": result["wall_seconds"],
+            "sandbox": result["sandbox"],
+            "screenshot": result.get("screenshot"),
+            "screenshot_path": self._persist_screenshot(result.get("screenshot")),
+            "recording": (report.get("recording") or {}).get("dir"),
+        }
+        self.registry.update_run(run.run_id, status=record["status"], sandbox=record["sandbox"],
+                                 result={k: record[k] for k in ("steps", "tokens", "wall_seconds", "screenshot")})
+        metrics.inc("batch_tasks_total", status=record["status"])
+        return record
+
+    def _persist_screenshot(self, ref) -> str | None:
+        """Write the final frame to `<screenshots_dir>/<digest>.png` and return the path."""
+        data = blobs.get(ref) if ref else None
+        if not data:
+            return None
+        self.screenshots_dir.mkdir(parents=True, exist_ok=True)
+        path = self.screenshots_dir / f"{ref.digest}.png"
+        if not path.exists():
+            path.write_bytes(data)
+        blobs.release(ref)  # the file is the durable copy
+        return str(path)
+
+    def run(self, tasks: list[BatchTask]) -> Iterator[dict]:
+        """Yield one record per task in completion order, then a summary record."""
+        start = time.perf_counter()
+        counts: dict[str, int] = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+            futures = {executor.submit(self._run_one, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    logger.error(f"Batch task {task.id} crashed: {e}")
+                    record = {"id": task.id, "instruction": task.instruction, "status": "error", "summary": str(e)}
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+                yield record
+
+        wall = time.perf_counter() - start
+        tasks_per_hour = round(len(tasks) * 3600 / wall, 1) if wall > 0 else 0.0
+        metrics.set("batch_tasks_per_hour", tasks_per_hour)
+        yield {
+            "summary": True,
+            "tasks": len(tasks),
+            "statuses": counts,
+            "concurrency": self.concurrency,
+            "wall_seconds": round(wall, 2),
+            "tasks_per_hour": tasks_per_hour,
+        }
+
+    def shutdown(self, stop_sandboxes: bool = False):
+        if stop_sandboxes:
+            self.pool.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from backend.services.agent_service import get_agent_service
+
+    parser = argparse.ArgumentParser(description="Run a JSONL file of instructions headlessly.")
+    parser.add_argument("tasks", help="JSONL file ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file ('-' for stdout)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", 2)))
+    parser.add_argument("--screenshots-dir", default=None)
+    parser.add_argument("--stop-sandboxes", action="store_true", help="Remove batch sandboxes when done")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    source = sys.stdin if args.tasks == "-" else open(args.tasks)
+    batch_tasks = parse_tasks(source)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+
+    runner = BatchRunner(get_agent_service(), args.concurrency, args.screenshots_dir)
+    try:
+        for out in runner.run(batch_tasks):
+            output.write(json.dumps(out) + "\n")
+            output.flush()
+    finally:
+        runner.shutdown(args.stop_sandboxes)
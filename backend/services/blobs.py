@@ -0,0 +1,156 @@
+"""
+Blob Store - Content-addressed, in-process storage for screenshots and images.
+
+Graph state, observations and caches pass small `BlobRef` strings instead of
+PNG bytes or base64 text; bytes are materialised with `blobs.get(ref)` only
+where they leave the process (LLM/grounding requests). Identical images
+(e.g. an unchanged screen) are stored once. Every `put` of bytes takes a
+reference that its holder gives back with `release(ref)` once nothing uses the
+blob any more (the grounder's previous frame, a finished run's attached image);
+a blob is dropped when its last reference is released. Memory is additionally
+bounded by an LRU byte budget (BLOB_MEMORY_MB); only with BLOB_SPILL_DIR set
+are evicted blobs written to disk and read back through mmap instead of being
+dropped.
+"""
+
+import os
+import mmap
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BlobRef(str):
+    """Reference to a stored blob: 'blob:<digest>'."""
+    PREFIX = "blob:"
+
+    @property
+    def digest(self) -> str:
+        return self[len(self.PREFIX):]
+
+    @classmethod
+    def is_ref(cls, value) -> bool:
+        return isinstance(value, str) and value.startswith(cls.PREFIX)
+
+
+class BlobStore:
+    """Thread-safe LRU of blobs keyed by content hash, with optional disk spill."""
+
+    def __init__(self, max_memory_bytes: int = 64 * 2**20, spill_dir: str | None = None):
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+        self.memory: OrderedDict[str, bytes] = OrderedDict()
+        self.memory_bytes = 0
+        self.spilled: set[str] = set()
+        self.refs: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "BlobStore":
+        return cls(int(float(os.getenv("BLOB_MEMORY_MB", 64)) * 2**20), os.getenv("BLOB_SPILL_DIR") or None)
+
+    def put(self, data: bytes | BlobRef | None) -> BlobRef | None:
+        """
+        Store `data` and return its reference, owned by the caller until `release`
+        (refs and None pass through unchanged and take no reference).
+        """
+        if data is None or BlobRef.is_ref(data):
+            return data
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self.lock:
+            self.refs[digest] = self.refs.get(digest, 0) + 1
+            if digest in self.memory:
+                self.memory.move_to_end(digest)
+                metrics.inc("blob_dedup_total")
+            elif digest not in self.spilled:
+                self.memory[digest] = bytes(data)
+                self.memory_bytes += len(data)
+                self._evict()
+        return BlobRef(BlobRef.PREFIX + digest)
+
+    def put_base64(self, text: str | None) -> BlobRef | None:
+        """Decode a base64 string or data URL once and store the bytes."""
+        if not text or BlobRef.is_ref(text):
+            return text or None
+        if text.startswith("data:") and "," in text:
+            text = text.split(",", 1)[1]
+        try:
+            return self.put(base64.b64decode("".join(text.split()), validate=True))
+        except ValueError as e:
+            logger.warning(f"Ignoring undecodable base64 image: {e}")
+            return None
+
+    def get(self, ref) -> bytes | None:
+        """Materialise a reference (raw bytes pass through); None if it was evicted without spill."""
+        if not BlobRef.is_ref(ref):
+            return ref
+        digest = BlobRef(ref).digest
+        with self.lock:
+            data = self.memory.get(digest)
+            if data is not None:
+                self.memory.move_to_end(digest)
+                return data
+            if digest not in self.spilled:
+                return None
+        with open(self.spill_dir / digest, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+
+    def release(self, ref):
+        """Give back a reference taken by `put`; the blob is dropped when none are left."""
+        if not BlobRef.is_ref(ref):
+            return
+        digest = BlobRef(ref).digest
+        with self.lock:
+            count = self.refs.get(digest, 0) - 1
+            if count > 0:
+                self.refs[digest] = count
+                return
+            self.refs.pop(digest, None)
+            data = self.memory.pop(digest, None)
+            if data is not None:
+                self.memory_bytes -= len(data)
+            spilled = digest in self.spilled
+            self.spilled.discard(digest)
+        if spilled:
+            try:
+                (self.spill_dir / digest).unlink()
+            except OSError:
+                pass
+        metrics.set("blob_memory_bytes", self.memory_bytes)
+
+    def get_base64(self, ref) -> str | None:
+        data = self.get(ref)
+        return base64.b64encode(data).decode() if data is not None else None
+
+    def _evict(self):
+        while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+            digest, data = self.memory.popitem(last=False)
+            self.memory_bytes -= len(data)
+            if self.spill_dir:
+                try:
+                    (self.spill_dir / digest).write_bytes(data)
+                    self.spilled.add(digest)
+                except OSError as e:
+                    logger.warning(f"Blob spill failed: {e}")
+            metrics.inc("blob_evictions_total", spilled=str(bool(self.spill_dir)).lower())
+        metrics.set("blob_memory_bytes", self.memory_bytes)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"blobs": len(self.memory), "memory_bytes": self.memory_bytes, "spilled": len(self.spilled),
+                    "referenced": len(self.refs)}
+
+
+blobs = BlobStore.from_env()
@@ -0,0 +1,240 @@
+"""
+Planner Cascade - Route each planner step to a fast or a strong model.
+
+Most steps ("press Enter", "click Save") do not need high-effort reasoning.
+The cascade holds two planners that share one grounder. The fast tier
+(PLANNER_FAST_MODEL, or the same model with PLANNER_FAST_THINKING) handles
+steps by default. A step goes to the strong tier (the configured LLM_MODEL)
+when:
+
+- first_step: it is the opening step of a run (PLANNER_FIRST_STEP=strong).
+- failures: the last PLANNER_ESCALATE_FAILURES steps reported action errors.
+- repeats: the same actions were issued PLANNER_ESCALATE_REPEATS times in a row.
+- complex_screen: the screen has more than PLANNER_ESCALATE_ELEMENTS
+  accessibility elements, or its PNG is over PLANNER_ESCALATE_PNG_KB.
+- low_confidence: the fast answer was empty, FAIL, not executable, or hedged.
+  The same step is then re-planned on the strong tier.
+
+After an escalation the strong tier keeps the next PLANNER_ESCALATE_HOLD steps.
+Each planner keeps its own trajectory, so when a tier takes over it is told
+which actions the other tier executed since it last planned.
+Per-tier calls, latency and tokens are reported per run (`planner_tiers`).
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+
+from backend.services.metrics import metrics
+from backend.services.usage import RunUsage, track_usage, current_usage
+
+logger = logging.getLogger(__name__)
+
+_HEDGE = re.compile(r"\b(?:not sure|unsure|unclear|cannot (?:find|locate|see)|can't (?:find|locate|see)|unable to)\b",
+                    re.IGNORECASE)
+_EXECUTABLE = re.compile(r"\b(?:agent|pyautogui)\.\w+\(|^(?:DONE|WAIT)$")
+
+
+class ForwardingUsage(RunUsage):
+    """Per-tier token counters that also feed the run's totals."""
+
+    def __init__(self, parent: RunUsage | None):
+        super().__init__()
+        self.parent = parent
+
+    def add(self, endpoint, prompt, completion, cached):
+        super().add(endpoint, prompt, completion, cached)
+        if self.parent is not None:
+            self.parent.add(endpoint, prompt, completion, cached)
+
+
+class EscalationPolicy:
+    """Decides the tier of each step from the run's recent history and the current screen."""
+
+    def __init__(self, failures: int = 2, repeats: int = 2, elements: int = 150, png_kb: int = 900,
+                 hold: int = 2, first_step_strong: bool = True):
+        self.failures = failures
+        self.repeats = repeats
+        self.elements = elements
+        self.png_kb = png_kb
+        self.hold = hold
+        self.first_step_strong = first_step_strong
+        self.reset()
+
+    @classmethod
+    def from_env(cls) -> "EscalationPolicy":
+        return cls(
+            failures=int(os.getenv("PLANNER_ESCALATE_FAILURES", 2)),
+            repeats=int(os.getenv("PLANNER_ESCALATE_REPEATS", 2)),
+            elements=int(os.getenv("PLANNER_ESCALATE_ELEMENTS", 150)),
+            png_kb=int(os.getenv("PLANNER_ESCALATE_PNG_KB", 900)),
+            hold=int(os.getenv("PLANNER_ESCALATE_HOLD", 2)),
+            first_step_strong=os.getenv("PLANNER_FIRST_STEP", "strong").lower() == "strong",
+        )
+
+    def reset(self):
+        self.steps = 0
+        self.failed_streak = 0
+        self.last_actions = None
+        self.repeat_streak = 0
+        self.hold_left = 0
+        self.forced = None
+
+    def choose(self, observation: dict, element_count: int | None) -> tuple[str, str | None]:
+        """(tier, escalation reason) for the next step."""
+        feedback = str(observation.get("last_action_result") or "")
+        self.failed_streak = self.failed_streak + 1 if "Action error" in feedback else 0
+        screenshot = observation.get("screenshot") or b""
+
+        reason = None
+        if self.forced:
+            reason = self.forced
+        elif self.steps == 0 and self.first_step_strong:
+            reason = "first_step"
+        elif self.failures and self.failed_streak >= self.failures:
+            reason = "failures"
+        elif self.repeats and self.repeat_streak >= self.repeats:
+            reason = "repeats"
+        elif (element_count or 0) > self.elements or len(screenshot) > self.png_kb * 1024:
+            reason = "complex_screen"
+        self.forced = None
+        self.steps += 1
+
+        if reason:
+            self.hold_left = self.hold
+            return "strong", reason
+        if self.hold_left > 0:
+            self.hold_left -= 1
+            return "strong", None
+        return "fast", None
+
+    @staticmethod
+    def low_confidence(info, actions) -> bool:
+        """The fast answer should not be trusted as-is."""
+        if not actions:
+            return True
+        if len(actions) == 1 and actions[0].strip().upper() == "FAIL":
+            return True
+        if not any(_EXECUTABLE.search(str(a).strip()) for a in actions):
+            return True
+        plan = str((info or {}).get("plan", "")) if isinstance(info, dict) else ""
+        return bool(_HEDGE.search(plan))
+
+    def observe(self, actions):
+        """Track repeated identical actions (a stuck loop worth a stronger model)."""
+        key = tuple(actions or ())
+        self.repeat_streak = self.repeat_streak + 1 if key and key == self.last_actions else 0
+        self.last_actions = key
+
+
+class PlannerCascade:
+    """Planner facade over a fast and a strong agent; drop-in for the single AgentS3."""
+
+    TIERS = ("fast", "strong")
+    HANDOVER_STEPS = 10
+
+    def __init__(self, fast, strong, policy: EscalationPolicy | None = None):
+        self.agents = {"fast": fast, "strong": strong}
+        self.policy = policy or EscalationPolicy.from_env()
+        self.lock = threading.Lock()
+        self.history: list[str] = []
+        self.seen = {tier: 0 for tier in self.TIERS}
+        self.reset_stats()
+
+    @property
+    def grounding_agent(self):
+        return self.agents["strong"].grounding_agent
+
+    def reset(self):
+        for agent in self.agents.values():
+            if hasattr(agent, "reset"):
+                agent.reset()
+        self.policy.reset()
+        self.history = []
+        self.seen = {tier: 0 for tier in self.TIERS}
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {tier: {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+                          for tier in self.TIERS}
+            self.escalations: dict[str, int] = {}
+
+    def escalate(self, reason: str):
+        """Send the next step to the strong tier (e.g. the progress monitor detected a stall)."""
+        self.policy.forced = reason
+
+    def _element_count(self) -> int | None:
+        accessibility = getattr(self.grounding_agent, "accessibility", None)
+        if accessibility is None:
+            return None
+        try:
+            return len(accessibility.snapshot())
+        except Exception:
+            return None
+
+    def _handover(self, tier: str, instruction: str) -> str:
+        """Append the actions this tier missed while the other one was planning."""
+        missed = self.history[self.seen[tier]:][-self.HANDOVER_STEPS:]
+        if not missed:
+            return instruction
+        return instruction + "\n\nActions already executed since your last step:\n" + "\n".join(missed)
+
+    def _call(self, tier: str, instruction: str, observation: dict):
+        instruction = self._handover(tier, instruction)
+        self.seen[tier] = len(self.history)
+        usage = ForwardingUsage(current_usage())
+        start = time.perf_counter()
+        try:
+            with track_usage(usage):
+                return self.agents[tier].predict(instruction=instruction, observation=observation)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                bucket = self.stats[tier]
+                bucket["calls"] += 1
+                bucket["seconds"] += elapsed
+                bucket["prompt_tokens"] += usage.prompt_tokens
+                bucket["completion_tokens"] += usage.completion_tokens
+            metrics.observe("planner_tier_latency_seconds", elapsed, tier=tier)
+            metrics.inc("planner_tier_tokens_total", usage.total_tokens, tier=tier)
+
+    def _escalated(self, reason: str):
+        with self.lock:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        metrics.inc("planner_escalations_total", reason=reason)
+
+    def predict(self, instruction: str, observation: dict):
+        tier, reason = self.policy.choose(observation, self._element_count())
+        if reason:
+            self._escalated(reason)
+            logger.info(f"Planner: strong tier ({reason})")
+        info, actions = self._call(tier, instruction, observation)
+        if tier == "fast" and self.policy.low_confidence(info, actions):
+            self._escalated("low_confidence")
+            logger.info("Planner: fast answer not confident, re-planning on the strong tier")
+            self.policy.hold_left = self.policy.hold
+            tier = "strong"
+            info, actions = self._call(tier, instruction, observation)
+        self.policy.observe(actions)
+        self.history.append("; ".join(str(a) for a in actions or ()) or "(no action)")
+        self.seen[tier] = len(self.history)
+        if isinstance(info, dict):
+            info = {**info, "planner_tier": tier}
+        return info, actions
+
+    def tier_report(self) -> dict:
+        """Per-tier calls, latency and tokens (latency and tokens include grounding done within the step)."""
+        with self.lock:
+            tiers = {
+                tier: {
+                    "calls": b["calls"],
+                    "mean_latency_s": round(b["seconds"] / b["calls"], 3) if b["calls"] else None,
+                    "total_latency_s": round(b["seconds"], 2),
+                    "prompt_tokens": b["prompt_tokens"],
+                    "completion_tokens": b["completion_tokens"],
+                }
+                for tier, b in self.stats.items()
+            }
+            return {"tiers": tiers, "escalations": dict(self.escalations)}
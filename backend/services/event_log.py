@@ -0,0 +1,133 @@
+"""
+Run Event Log - Numbered, replayable SSE events so clients can resume a run's stream.
+
+The agent run of a chat request is driven by a producer task that appends each
+SSE event to the run's log with a monotonically increasing `id:`. HTTP
+responses only follow the log: the original POST starts at the beginning, and
+`GET /runs/{id}/events` with a `Last-Event-ID` header (or `?after=`) resumes
+after the last event the client saw. A disconnect therefore no longer loses the
+run. If nobody follows a run for RESUME_GRACE seconds, the run is cancelled.
+
+Each log keeps the last EVENT_BUFFER_SIZE events. A client that fell further
+behind gets a `gap` event with the number of missed events. Finished runs stay
+resumable for EVENT_BUFFER_TTL seconds. Logs live in the worker process that
+runs the agent, so resumes must reach that worker (see `X-Run-Owner`).
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RunEventLog:
+    """Ring buffer of one run's SSE events plus a notification for live followers."""
+
+    def __init__(self, capacity: int = 1000):
+        self.run_id: str | None = None
+        self.events: deque[tuple[int, str]] = deque(maxlen=capacity)
+        self.last_id = 0
+        self.closed = False
+        self.closed_at: float | None = None
+        self.followers = 0
+        self.detached_at = time.time()
+        self.producer: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+
+    def append(self, chunk: str) -> int:
+        """Number an SSE event (`event: ...\\ndata: ...\\n\\n`) and wake the followers."""
+        self.last_id += 1
+        self.events.append((self.last_id, f"id: {self.last_id}\n{chunk}"))
+        self._notify()
+        return self.last_id
+
+    def close(self):
+        self.closed = True
+        self.closed_at = time.time()
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def since(self, last_id: int) -> tuple[list[tuple[int, str]], int]:
+        """Buffered (id, event) pairs after `last_id`, and how many were evicted before the client got them."""
+        oldest = self.events[0][0] if self.events else self.last_id + 1
+        missed = max(0, oldest - last_id - 1)
+        return [event for event in self.events if event[0] > last_id], missed
+
+    def abandoned(self, grace: float) -> bool:
+        """Nobody has followed the run for `grace` seconds."""
+        return self.followers == 0 and time.time() - self.detached_at > grace
+
+    async def follow(self, last_id: int = 0):
+        """Yield the events after `last_id`, then live ones until the run's stream ends."""
+        self.followers += 1
+        try:
+            while True:
+                changed = self._changed
+                events, missed = self.since(last_id)
+                if missed:
+                    metrics.inc("event_log_gaps_total")
+                    yield f"event: gap\ndata: {json.dumps({'missed': missed})}\n\n"
+                for last_id, chunk in events:
+                    yield chunk
+                if last_id < self.last_id:
+                    continue  # appended while we were sending
+                if self.closed:
+                    return
+                await changed.wait()
+        finally:
+            self.followers -= 1
+            if self.followers == 0:
+                self.detached_at = time.time()
+
+
+class EventLogRegistry:
+    """Event logs of this worker's runs, kept EVENT_BUFFER_TTL seconds after they finish."""
+
+    def __init__(self, capacity: int = 1000, ttl: float = 300.0, grace: float = 120.0):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.grace = grace
+        self.logs: dict[str, RunEventLog] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "EventLogRegistry":
+        return cls(
+            capacity=int(os.getenv("EVENT_BUFFER_SIZE", 1000)),
+            ttl=float(os.getenv("EVENT_BUFFER_TTL", 300)),
+            grace=float(os.getenv("RESUME_GRACE", 120)),
+        )
+
+    def create(self) -> RunEventLog:
+        self.purge()
+        return RunEventLog(self.capacity)
+
+    def bind(self, run_id: str, log: RunEventLog):
+        log.run_id = run_id
+        with self.lock:
+            self.logs[run_id] = log
+
+    def get(self, run_id: str) -> RunEventLog | None:
+        with self.lock:
+            return self.logs.get(run_id)
+
+    def purge(self):
+        now = time.time()
+        with self.lock:
+            expired = [run_id for run_id, log in self.logs.items()
+                       if log.closed and now - log.closed_at > self.ttl]
+            for run_id in expired:
+                del self.logs[run_id]
+
+
+event_logs = EventLogRegistry.from_env()
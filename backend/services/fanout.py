@@ -0,0 +1,173 @@
+"""
+Fan-out Execution - Run independent sub-goals of one instruction in parallel.
+
+`split_instruction` only fans out when independence is explicit: one shared
+task applied to a list of targets ("<task> on these sites: a, b and c", or a
+"<task> for each of these:" preamble over a bulleted list of targets). Numbered
+lists, imperative step lists and anything with sequencing words are ordered
+steps and run serially, as does anything the splitter is unsure about. It
+returns one self-contained sub-goal per target. The LangGraph agent fans these out to a `branch` node per
+sub-goal; each branch leases its own sandbox from a `SandboxPool`, runs a full
+agent on it, and a reducer merges the results and reports the speedup over
+running the same branches one after another.
+"""
+
+import re
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+
+from backend.services.local_adapter import LocalDockerAdapter
+from backend.services.sandbox import get_provisioner
+from backend.services.desktop_reset import get_reset_strategy
+
+logger = logging.getLogger(__name__)
+
+_BULLET = re.compile(r"^\s*[-*•]\s+(.+?)\s*$")
+_NUMBERED = re.compile(r"^\s*\d+[.)]\s+")
+# A bullet list is a set of targets only under a preamble that says so ("... each of these sites:")
+_TARGET_PREAMBLE = re.compile(r"\b(?:each of|for each|for all|these|the following)\b.*:\s*$", re.IGNORECASE)
+_SEQUENCE = re.compile(r"\b(?:then|after that|afterwards|next|first|finally|once|steps?)\b", re.IGNORECASE)
+# Items starting with one of these are actions (ordered steps), not targets
+_STEP_VERBS = {
+    "open", "go", "navigate", "visit", "click", "type", "enter", "press", "log", "login", "sign", "select",
+    "choose", "export", "download", "upload", "save", "send", "email", "mail", "print", "close", "find",
+    "search", "copy", "paste", "create", "delete", "remove", "add", "fill", "submit", "install", "run",
+    "launch", "start", "check", "verify", "write", "read", "move", "rename", "attach", "share", "reply",
+}
+_ENUMERATION = re.compile(
+    r"^(?P<task>.+?)\s+(?P<prep>on|at|for|from|across|in)\s+"
+    r"(?:(?:these|the following|each of(?: these)?|all)\s+)?(?:\w+\s+)?"
+    r"(?:sites|websites|web sites|pages|urls|shops|stores|products|items|apps|files)\s*:\s*(?P<items>.+)$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _split_items(text: str) -> list[str]:
+    parts = re.split(r"\s*,\s*(?:and\s+)?|\s+and\s+", text.strip().rstrip("."))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _is_target(item: str) -> bool:
+    """A short noun-like item (site, product, file) rather than an action to perform."""
+    words = item.split()
+    return 0 < len(words) <= 6 and words[0].lower().strip(".,:;") not in _STEP_VERBS
+
+
+def split_instruction(instruction: str, max_subgoals: int = 10) -> list[str]:
+    """Independent sub-goals of `instruction`, or [] when it should run as a single task."""
+    lines = [line for line in instruction.splitlines() if line.strip()]
+    if any(_NUMBERED.match(line) for line in lines):
+        return []  # numbered lists are ordered steps
+    bullets = [m.group(1) for m in (_BULLET.match(line) for line in lines) if m]
+    if bullets:
+        preamble = " ".join(line.strip() for line in lines if not _BULLET.match(line)).strip()
+        if len(bullets) < 2 or not _TARGET_PREAMBLE.search(preamble) or _SEQUENCE.search(preamble):
+            return []
+        items, goals = bullets, [f"{preamble.rstrip(':').strip()}: {item}" for item in bullets]
+    else:
+        match = _ENUMERATION.match(instruction.strip())
+        if not match or _SEQUENCE.search(match.group("task")):
+            return []
+        items = _split_items(match.group("items"))
+        goals = [f"{match.group('task').strip()} {match.group('prep').lower()} {item}" for item in items]
+    if not all(_is_target(item) for item in items):
+        return []
+    if len(goals) < 2 or len(goals) > max_subgoals:
+        return []
+    return goals
+
+
+@dataclass
+class SandboxLease:
+    name: str
+    adapter: LocalDockerAdapter
+    leased_at: float = field(default_factory=time.time)
+
+
+class SandboxPool:
+    """
+    Bounded pool of extra desktop sandboxes for branches. Containers are started
+    on demand with ephemeral ports, reset on release and kept warm for reuse.
+    """
+
+    def __init__(self, profile: str | None = None, max_size: int = 3, prefix: str = "opencompx-branch"):
+        self.provisioner = get_provisioner(profile)
+        self.max_size = max_size
+        self.prefix = prefix
+        self.reset_strategy = get_reset_strategy()
+        self.idle: list[SandboxLease] = []
+        self.leased = 0
+        self.names: set[str] = set()  # sandboxes that exist (leased or idle)
+        self.cond = threading.Condition()
+
+    def lease(self, timeout: float = 600) -> SandboxLease:
+        """Block until a sandbox is free (or can be started) and return it."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.idle or self.leased + len(self.idle) < self.max_size, timeout):
+                raise TimeoutError("No branch sandbox became available")
+            if self.idle:
+                lease = self.idle.pop()
+                self.leased += 1
+                return lease
+            name = next(f"{self.prefix}-{i}" for i in range(self.max_size + 1) if f"{self.prefix}-{i}" not in self.names)
+            self.names.add(name)
+            self.leased += 1
+        try:
+            if not self.provisioner.start(name, ports={}):
+                raise RuntimeError(f"Failed to start branch sandbox {name}")
+            adapter = LocalDockerAdapter(name)
+            self._wait_ready(adapter)
+        except Exception:
+            with self.cond:
+                self.leased -= 1
+                self.names.discard(name)
+                self.cond.notify()
+            raise
+        return SandboxLease(name, adapter)
+
+    @staticmethod
+    def _wait_ready(adapter: LocalDockerAdapter, timeout: float = 60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if len(adapter.screenshot() or b"") > 10000:
+                return
+            time.sleep(1)
+        logger.warning(f"Branch sandbox {adapter.container_name} may not be fully ready, proceeding anyway")
+
+    def release(self, lease: SandboxLease):
+        try:
+            self.reset_strategy.reset(lease.adapter)
+        except Exception as e:
+            # A dirty sandbox must not be handed to the next task: drop it, a fresh one is started on demand
+            logger.error(f"Reset of {lease.name} failed, discarding the sandbox: {e}")
+            self.provisioner.stop(lease.name)
+            with self.cond:
+                self.leased -= 1
+                self.names.discard(lease.name)
+                self.cond.notify()
+            return
+        with self.cond:
+            self.leased -= 1
+            self.idle.append(lease)
+            self.cond.notify()
+
+    def shutdown(self):
+        with self.cond:
+            idle, self.idle = self.idle, []
+            self.names.difference_update(lease.name for lease in idle)
+        for lease in idle:
+            self.provisioner.stop(lease.name)
+
+
+def speedup_report(results: list[dict], parallel_seconds: float) -> dict:
+    """End-to-end fan-out time vs. the sum of branch times (serial estimate)."""
+    serial_seconds = sum(r.get("wall_seconds", 0.0) for r in results)
+    return {
+        "branches": len(results),
+        "succeeded": sum(1 for r in results if r.get("status") == "done"),
+        "parallel_seconds": round(parallel_seconds, 2),
+        "serial_seconds": round(serial_seconds, 2),
+        "speedup": round(serial_seconds / parallel_seconds, 2) if parallel_seconds > 0 else None,
+    }
@@ -0,0 +1,120 @@
+"""
+Grounding Broker - Micro-batches grounding calls from all active sessions.
+
+Each `GroundingProxy.generate_coords` is a single-image request, so with many sessions
+the vLLM server sees a trickle of tiny batches. The broker holds requests for a
+few milliseconds, then releases them together as concurrent in-flight requests
+capped at the server's batch size, so vLLM's continuous batching schedules them
+in the same forward passes. Results are returned to each caller's own future.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future", "enqueued", "context")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.context = contextvars.copy_context()  # Keeps per-run usage tracking bound
+
+
+class GroundingBroker:
+    """
+    Collects grounding jobs for up to `window_ms` (never holding any job longer
+    than `max_delay_ms`) and dispatches them with at most `max_batch` in flight.
+    """
+
+    def __init__(self, max_batch: int = 8, window_ms: float = 5.0, max_delay_ms: float = 25.0):
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000.0
+        self.max_delay = max(window_ms, max_delay_ms) / 1000.0
+        self.jobs: queue.Queue[_Job] = queue.Queue()
+        self.in_flight = threading.BoundedSemaphore(self.max_batch)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_batch, thread_name_prefix="grounding-batch")
+        self.batches = 0
+        self.dispatched = 0
+        self._thread = threading.Thread(target=self._dispatch_loop, name="grounding-broker", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue a grounding call and block until its result is available."""
+        job = _Job(fn, args, kwargs)
+        self.jobs.put(job)
+        return job.future.result()
+
+    def _collect(self) -> list[_Job]:
+        batch = [self.jobs.get()]
+        deadline = min(time.monotonic() + self.window, batch[0].enqueued + self.max_delay)
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, job: _Job):
+        try:
+            job.future.set_result(job.context.run(job.fn, *job.args, **job.kwargs))
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            self.in_flight.release()
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect()
+            now = time.monotonic()
+            self.batches += 1
+            self.dispatched += len(batch)
+            metrics.observe("grounding_broker_batch_size", len(batch))
+            for job in batch:
+                metrics.observe("grounding_broker_queue_wait_seconds", now - job.enqueued)
+                self.in_flight.acquire()  # Backpressure: never exceed the server's batch size
+                self.executor.submit(self._run, job)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "dispatched": self.dispatched,
+            "avg_batch_size": round(self.dispatched / self.batches, 2) if self.batches else 0.0,
+            "queued": self.jobs.qsize(),
+        }
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_grounding_broker() -> GroundingBroker | None:
+    """Shared broker for every session in this process, or None when VISION_BROKER is off."""
+    global _broker
+    if os.getenv("VISION_BROKER", "0").lower() not in ("1", "true", "yes"):
+        return None
+    with _broker_lock:
+        if _broker is None:
+            _broker = GroundingBroker(
+                max_batch=int(os.getenv("VISION_BROKER_MAX_BATCH", 8)),
+                window_ms=float(os.getenv("VISION_BROKER_WINDOW_MS", 5)),
+                max_delay_ms=float(os.getenv("VISION_BROKER_MAX_DELAY_MS", 25)),
+            )
+            logger.info(f"Grounding broker enabled (max_batch={_broker.max_batch}, "
+                        f"window={_broker.window * 1000:.0f}ms, cap={_broker.max_delay * 1000:.0f}ms)")
+        return _broker
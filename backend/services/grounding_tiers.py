@@ -0,0 +1,275 @@
+"""
+Tiered Grounding - CPU-local element location before the remote UI-TARS call.
+
+Tiers are tried in order on the cached screenshot; the first confident hit
+wins and only unresolved queries escalate to UI-TARS:
+
+1. a11y:     accessibility-tree lookup (when A11Y_OBSERVATION is enabled)
+2. template: normalised cross-correlation against crops of elements already
+             grounded for the same query in this session
+3. ocr:      word search over Tesseract output (needs pytesseract + tesseract)
+
+Hit rates and per-tier latency are exported on `/metrics` and `/grounding/tiers`.
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_QUOTED = re.compile(r"[\"'“‘]([^\"'”’]{2,})[\"'”’]")
+_STOPWORDS = {"the", "a", "an", "on", "in", "of", "to", "at", "click", "button", "field", "icon", "link",
+              "tab", "menu", "item", "box", "input", "text", "labeled", "labelled", "named", "called", "with",
+              "that", "says", "top", "bottom", "left", "right", "corner", "window", "bar", "area"}
+
+
+def _normalise(query: str) -> str:
+    return " ".join(_WORD.findall(query.lower()))
+
+
+def _inside(point, region) -> bool:
+    return not region or (region[0] <= point[0] < region[0] + region[2] and region[1] <= point[1] < region[1] + region[3])
+
+
+class TierStats:
+    """Process-wide attempts, hits and latency per tier (shared by all sessions)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tiers: dict[str, dict[str, float]] = {}
+
+    def record(self, tier: str, seconds: float, hit: bool):
+        with self.lock:
+            entry = self.tiers.setdefault(tier, {"attempts": 0, "hits": 0, "seconds": 0.0})
+            entry["attempts"] += 1
+            entry["hits"] += int(hit)
+            entry["seconds"] += seconds
+        metrics.observe("grounding_tier_seconds", seconds, tier=tier)
+        metrics.inc("grounding_tier_attempts_total", tier=tier)
+        if hit:
+            metrics.inc("grounding_tier_hits_total", tier=tier)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self.lock:
+            total = sum(e["hits"] for e in self.tiers.values()) or 1
+            return {
+                tier: {
+                    "attempts": e["attempts"],
+                    "hits": e["hits"],
+                    "hit_rate": round(e["hits"] / e["attempts"], 3) if e["attempts"] else 0.0,
+                    "share_of_resolutions": round(e["hits"] / total, 3),
+                    "mean_ms": round(1000 * e["seconds"] / e["attempts"], 1) if e["attempts"] else 0.0,
+                }
+                for tier, e in self.tiers.items()
+            }
+
+
+tier_stats = TierStats()
+
+
+class GroundingTier:
+    """Base class: `locate` returns screen (x, y) for a confident match, else None."""
+    name = "base"
+
+    def locate(self, query: str, screen: "ScreenImage", region=None) -> tuple[int, int] | None:
+        raise NotImplementedError
+
+    def remember(self, query: str, screen: "ScreenImage", point: tuple[int, int]):
+        """Called with every successful resolution (from any tier) so tiers can learn."""
+
+
+class ScreenImage:
+    """Lazily decoded grayscale view of one screenshot, shared by all tiers."""
+
+    def __init__(self, png: bytes):
+        self.png = png
+        self._gray = None
+
+    @property
+    def gray(self):
+        """Grayscale numpy array (cv2/numpy are imported on first decode, not at startup)."""
+        if self._gray is None and self.png:
+            import cv2
+            import numpy as np
+            self._gray = cv2.imdecode(np.frombuffer(self.png, np.uint8), cv2.IMREAD_GRAYSCALE)
+        return self._gray
+
+    def crop(self, region):
+        """(sub-image, x offset, y offset) for `region`, or the whole frame."""
+        gray = self.gray
+        if gray is None or not region:
+            return gray, 0, 0
+        x, y, w, h = (max(0, int(v)) for v in region)
+        return gray[y:y + h, x:x + w], x, y
+
+
+class AccessibilityTier(GroundingTier):
+    name = "a11y"
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def locate(self, query, screen, region=None):
+        return self.provider.resolve(query, region or None)
+
+
+class TemplateTier(GroundingTier):
+    """Matches crops of previously grounded elements (same normalised query)."""
+    name = "template"
+
+    def __init__(self, patch: tuple[int, int] = (96, 40), threshold: float = 0.92, max_templates: int = 256):
+        self.patch = patch
+        self.threshold = threshold
+        self.max_templates = max_templates
+        self.templates: dict[str, tuple] = {}  # query -> (patch, dx, dy to click point)
+
+    def locate(self, query, screen, region=None):
+        entry = self.templates.get(_normalise(query))
+        if entry is None:
+            return None
+        template, dx, dy = entry
+        haystack, ox, oy = screen.crop(region)
+        if haystack is None or haystack.shape[0] < template.shape[0] or haystack.shape[1] < template.shape[1]:
+            return None
+        import cv2
+        scores = cv2.matchTemplate(haystack, template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (x, y) = cv2.minMaxLoc(scores)
+        if best < self.threshold:
+            return None
+        # Reject ambiguous matches: a second strong peak away from the best one
+        scores[max(0, y - template.shape[0]):y + template.shape[0], max(0, x - template.shape[1]):x + template.shape[1]] = -1
+        if scores.max() >= self.threshold:
+            return None
+        return ox + x + dx, oy + y + dy
+
+    def remember(self, query, screen, point):
+        gray = screen.gray
+        if gray is None:
+            return
+        height, width = gray.shape
+        pw, ph = self.patch
+        x0 = min(max(0, int(point[0]) - pw // 2), max(0, width - pw))
+        y0 = min(max(0, int(point[1]) - ph // 2), max(0, height - ph))
+        patch = gray[y0:y0 + ph, x0:x0 + pw]
+        if patch.size == 0 or float(patch.std()) < 4.0:
+            return  # Flat patches (empty background) match everywhere
+        key = _normalise(query)
+        if key not in self.templates and len(self.templates) >= self.max_templates:
+            self.templates.pop(next(iter(self.templates)))
+        self.templates[key] = (patch.copy(), int(point[0]) - x0, int(point[1]) - y0)
+
+
+class OcrTier(GroundingTier):
+    """Finds the query's label words (quoted text preferred) in Tesseract output."""
+    name = "ocr"
+
+    def __init__(self, min_confidence: float = 70.0):
+        self.min_confidence = min_confidence
+        self._cache_key = None
+        self._words: list[tuple[str, int, int, int, int, float]] = []
+
+    @staticmethod
+    def available() -> bool:
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+            return True
+        except Exception:
+            return False
+
+    def _ocr(self, screen, region):
+        key = (id(screen.png), tuple(region) if region else None)
+        if key != self._cache_key:
+            import pytesseract
+            image, ox, oy = screen.crop(region)
+            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+            self._words = [
+                (text.lower(), ox + data["left"][i], oy + data["top"][i], data["width"][i], data["height"][i],
+                 float(data["conf"][i]))
+                for i, text in enumerate(data["text"])
+                if text.strip() and float(data["conf"][i]) >= 0
+            ]
+            self._cache_key = key
+        return self._words
+
+    def locate(self, query, screen, region=None):
+        quoted = _QUOTED.search(query)
+        label = _WORD.findall((quoted.group(1) if quoted else query).lower())
+        if not quoted:
+            label = [w for w in label if w not in _STOPWORDS]
+        if not label or len(label) > 6:
+            return None
+
+        words = self._ocr(screen, region)
+        matches = []
+        for i in range(len(words) - len(label) + 1):
+            run = words[i:i + len(label)]
+            if [_normalise(w[0]) for w in run] == label and min(w[5] for w in run) >= self.min_confidence:
+                x0, y0 = run[0][1], min(w[2] for w in run)
+                x1, y1 = run[-1][1] + run[-1][3], max(w[2] + w[4] for w in run)
+                matches.append(((x0 + x1) // 2, (y0 + y1) // 2))
+        # A label that appears more than once is ambiguous; let UI-TARS decide
+        return matches[0] if len(matches) == 1 else None
+
+
+class TieredGrounder:
+    """Runs the local tiers in order and feeds resolved points back to them."""
+
+    def __init__(self, tiers: list[GroundingTier]):
+        self.tiers = tiers
+        self._screen = ScreenImage(b"")
+
+    def _screen_for(self, png: bytes) -> ScreenImage:
+        if self._screen.png is not png:
+            self._screen = ScreenImage(png)
+        return self._screen
+
+    def locate(self, query: str, screenshot: bytes, region=None) -> tuple[int, int] | None:
+        screen = self._screen_for(screenshot)
+        for tier in self.tiers:
+            start = time.perf_counter()
+            try:
+                point = tier.locate(query, screen, region)
+            except Exception as e:
+                logger.debug(f"Grounding tier {tier.name} failed: {e}")
+                point = None
+            if point is not None and not _inside(point, region):
+                point = None
+            tier_stats.record(tier.name, time.perf_counter() - start, point is not None)
+            if point is not None:
+                self.remember(query, screenshot, point)
+                return int(point[0]), int(point[1])
+        return None
+
+    def remember(self, query: str, screenshot: bytes, point):
+        if not screenshot or not isinstance(point, (list, tuple)) or len(point) != 2:
+            return
+        screen = self._screen_for(screenshot)
+        for tier in self.tiers:
+            try:
+                tier.remember(query, screen, point)
+            except Exception as e:
+                logger.debug(f"Grounding tier {tier.name} could not learn from {point}: {e}")
+
+
+def build_tiered_grounder(accessibility=None) -> TieredGrounder | None:
+    """Tiers enabled by GROUNDING_TIERS (comma-separated, default 'a11y,template,ocr')."""
+    names = [n.strip() for n in os.getenv("GROUNDING_TIERS", "a11y,template,ocr").split(",") if n.strip()]
+    tiers = []
+    for name in names:
+        if name == "a11y" and accessibility is not None:
+            tiers.append(AccessibilityTier(accessibility))
+        elif name == "template":
+            tiers.append(TemplateTier(threshold=float(os.getenv("GROUNDING_TEMPLATE_THRESHOLD", 0.92))))
+        elif name == "ocr":
+            if OcrTier.available():
+                tiers.append(OcrTier(min_confidence=float(os.getenv("GROUNDING_OCR_MIN_CONFIDENCE", 70))))
+            else:
+                logger.info("OCR grounding tier disabled (pytesseract/tesseract not installed)")
+    return TieredGrounder(tiers) if tiers else None
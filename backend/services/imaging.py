@@ -0,0 +1,83 @@
+"""
+Imaging Helpers - PNG crop/downscale utilities shared by grounding and observation code.
+PIL is imported on first use to keep backend startup light.
+"""
+
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+Region = tuple[int, int, int, int]  # x, y, width, height in screen pixels
+
+
+def png_size(png: bytes) -> tuple[int, int] | None:
+    """Width/height read straight from the IHDR chunk (no decode)."""
+    if len(png) < 24 or png[:8] != b"\x89PNG\r\n\x1a\n":
+        return None
+    return int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big")
+
+
+def clamp_region(region: Region, width: int, height: int) -> Region:
+    x, y, w, h = (int(v) for v in region)
+    x = max(0, min(x, width - 1))
+    y = max(0, min(y, height - 1))
+    return x, y, max(1, min(w, width - x)), max(1, min(h, height - y))
+
+
+def crop_png(png: bytes, region: Region) -> bytes:
+    """Crop a PNG to `region`."""
+    if not png:
+        return png
+    from PIL import Image
+    with Image.open(io.BytesIO(png)) as img:
+        x, y, w, h = clamp_region(region, *img.size)
+        out = io.BytesIO()
+        img.crop((x, y, x + w, y + h)).save(out, format="PNG", compress_level=1)
+        return out.getvalue()
+
+
+def downscale_png(png: bytes, max_width: int) -> bytes:
+    """Downscale a PNG to at most `max_width` pixels wide (aspect preserved)."""
+    size = png_size(png)
+    if not png or not size or size[0] <= max_width:
+        return png
+    from PIL import Image
+    with Image.open(io.BytesIO(png)) as img:
+        ratio = max_width / img.width
+        resized = img.resize((max_width, max(1, round(img.height * ratio))), Image.BILINEAR)
+        out = io.BytesIO()
+        resized.save(out, format="PNG", compress_level=1)
+        return out.getvalue()
+
+
+def offset_point(result, region: Region):
+    """Translate a region-relative (x, y) grounding result back to screen space."""
+    x0, y0 = region[0], region[1]
+    if isinstance(result, (list, tuple)) and len(result) == 2 and all(isinstance(v, (int, float)) for v in result):
+        return type(result)((result[0] + x0, result[1] + y0))
+    return result
+
+
+def dhash(png: bytes, size: int = 8) -> int | None:
+    """Difference hash of a PNG (size*size bits); near-identical screens differ in few bits."""
+    if not png:
+        return None
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(png)) as img:
+            small = img.convert("L").resize((size + 1, size), Image.BILINEAR)
+    except Exception as e:
+        logger.debug(f"dhash failed: {e}")
+        return None
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
@@ -0,0 +1,191 @@
+"""
+Intent Fast-Path - Executes deterministic sub-goals without calling the planner.
+
+Instructions like "open firefox and go to example.com" are split into clauses;
+leading clauses that match a registered intent (launch app, open URL, focus
+window, type text, press key) are turned directly into LocalDockerAdapter
+calls. The planner takes over from the first clause no intent recognises, and
+it always gets the next step to check the result (the fast path never declares
+a task done on its own).
+"""
+
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Clause separators, most specific first
+CLAUSE_SPLIT = re.compile(r"\s*(?:,?\s+and then\s+|,?\s+then\s+|,?\s+and\s+|;\s*|,\s*)\s*", re.IGNORECASE)
+
+APP_ALIASES = {
+    "firefox": "firefox",
+    "firefox browser": "firefox",
+    "the browser": "firefox",
+    "browser": "firefox",
+    "chrome": "google-chrome",
+    "google chrome": "google-chrome",
+    "terminal": "terminal",
+    "a terminal": "terminal",
+    "the terminal": "terminal",
+    "files": "files",
+    "file manager": "files",
+    "the file manager": "files",
+}
+
+URL_PATTERN = r"(?P<url>(?:https?://)?(?:[\w-]+\.)+[a-z]{2,}(?::\d+)?(?:/\S*)?)"
+
+# Bare hosts (no scheme / www.) only count as URLs with one of these TLDs, so "notes.txt" stays a file
+KNOWN_TLDS = {
+    "com", "org", "net", "edu", "gov", "io", "dev", "app", "ai", "co", "info", "biz", "me", "tv", "us", "uk",
+    "de", "fr", "es", "it", "nl", "eu", "ca", "au", "jp", "cn", "in", "br", "ru", "ch", "se", "no", "pl",
+}
+FILE_EXTENSIONS = {
+    "txt", "md", "csv", "json", "xml", "yaml", "yml", "pdf", "doc", "docx", "xls", "xlsx", "ppt", "pptx", "odt",
+    "ods", "png", "jpg", "jpeg", "gif", "svg", "zip", "tar", "gz", "py", "js", "ts", "sh", "log", "html", "htm",
+}
+
+
+def looks_like_url(url: str) -> bool:
+    """A scheme, `www.`, or a bare host with a known TLD (and not a file name)."""
+    lower = url.lower().rstrip(".")
+    if lower.startswith(("http://", "https://", "www.")):
+        return True
+    host = lower.split("/", 1)[0].split(":", 1)[0]
+    tld = host.rsplit(".", 1)[-1]
+    return tld in KNOWN_TLDS and tld not in FILE_EXTENSIONS
+
+
+@dataclass
+class Intent:
+    """A deterministic sub-goal: a clause regex and a builder producing adapter code."""
+    name: str
+    pattern: re.Pattern
+    build: Callable[[re.Match], str | None]
+
+    def match(self, clause: str) -> str | None:
+        m = self.pattern.fullmatch(clause)
+        return self.build(m) if m else None
+
+
+@dataclass
+class FastPathPlan:
+    """Actions for the deterministic prefix of an instruction, plus what is left for the planner."""
+    actions: list[str] = field(default_factory=list)
+    intents: list[str] = field(default_factory=list)
+    residual: str | None = None
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.actions) and self.residual is None
+
+
+def _launch(m: re.Match) -> str | None:
+    app = APP_ALIASES.get(m.group("app").lower().strip())
+    return f"pyautogui.launch({app!r})" if app else None
+
+
+def _open_url(m: re.Match) -> str | None:
+    url = m.group("url").rstrip(".")
+    return f"pyautogui.open_url({url!r})" if looks_like_url(url) else None
+
+
+def _focus(m: re.Match) -> str:
+    return f"agent.focus_window({m.group('window').strip()!r})"
+
+
+def _type(m: re.Match) -> str:
+    return f"pyautogui.write({m.group('text')!r})"
+
+
+def _press(m: re.Match) -> str:
+    return f"pyautogui.press({m.group('key').lower()!r})"
+
+
+DEFAULT_INTENTS = [
+    Intent("launch_app", re.compile(r"(?:please\s+)?(?:open|launch|start|run)\s+(?:up\s+)?(?P<app>[\w\s]+?)(?:\s+app(?:lication)?)?",
+                                    re.IGNORECASE), _launch),
+    Intent("open_url", re.compile(r"(?:please\s+)?(?:go to|open|visit|navigate to|browse to|load)\s+" + URL_PATTERN,
+                                  re.IGNORECASE), _open_url),
+    Intent("focus_window", re.compile(r"(?:switch to|focus(?: on)?|activate)\s+(?:the\s+)?(?P<window>[\w\s.-]+?)\s+window",
+                                      re.IGNORECASE), _focus),
+    Intent("type_text", re.compile(r"(?:type|enter|write)\s+(?P<q>['\"])(?P<text>[^'\"]+)(?P=q)", re.IGNORECASE), _type),
+    Intent("press_key", re.compile(r"(?:press|hit)\s+(?P<key>enter|return|tab|escape|esc)(?:\s+key)?", re.IGNORECASE),
+           _press),
+]
+
+
+class IntentRouter:
+    """Pluggable registry of deterministic intents and code rewrite rules."""
+
+    def __init__(self, intents: list[Intent] | None = None):
+        self.intents = list(DEFAULT_INTENTS if intents is None else intents)
+        self.rewrites: list[Callable[[str], str | None]] = [_start_menu_launch]
+
+    def register(self, intent: Intent, first: bool = False):
+        """Add an intent; `first=True` gives it priority over the built-ins."""
+        if first:
+            self.intents.insert(0, intent)
+        else:
+            self.intents.append(intent)
+
+    def register_rewrite(self, rule: Callable[[str], str | None]):
+        """Add a rule that may replace planner-generated code (return None to leave it alone)."""
+        self.rewrites.append(rule)
+
+    def match_clause(self, clause: str) -> tuple[str, str] | None:
+        clause = clause.strip().rstrip(".!")
+        for intent in self.intents:
+            action = intent.match(clause)
+            if action:
+                return intent.name, action
+        return None
+
+    def plan(self, instruction: str) -> FastPathPlan:
+        """Resolve the longest deterministic prefix of the instruction."""
+        plan = FastPathPlan()
+        text = instruction.strip()
+        for clause, start in _clauses(text):
+            matched = self.match_clause(clause)
+            if not matched:
+                plan.residual = text[start:]
+                break
+            plan.intents.append(matched[0])
+            plan.actions.append(matched[1])
+
+        # open_url starts Firefox itself, so a preceding browser launch is redundant
+        for i in range(len(plan.actions) - 1, 0, -1):
+            if plan.intents[i] == "open_url" and plan.actions[i - 1] == "pyautogui.launch('firefox')":
+                del plan.actions[i - 1], plan.intents[i - 1]
+        return plan
+
+    def rewrite(self, code: str) -> str:
+        """Apply rewrite rules to planner-generated code."""
+        for rule in self.rewrites:
+            replaced = rule(code)
+            if replaced:
+                return replaced
+        return code
+
+
+def _clauses(text: str) -> list[tuple[str, int]]:
+    """Split on clause separators, keeping each clause's offset into `text`."""
+    clauses, start = [], 0
+    for sep in CLAUSE_SPLIT.finditer(text):
+        if text[start:sep.start()].strip():
+            clauses.append((text[start:sep.start()], start))
+        start = sep.end()
+    if text[start:].strip():
+        clauses.append((text[start:], start))
+    return clauses
+
+
+def _start_menu_launch(code: str) -> str | None:
+    """Catch flaky "Start Menu" launches (win key + typing the app name) and launch directly."""
+    lower = code.lower()
+    if "hotkey('win')" in lower and ("write('firefox')" in lower or "write('chrome')" in lower):
+        logger.info(">>> INTERCEPTING: Converting flaky 'Start Menu' launch to direct launch() <<<")
+        app_name = "firefox" if "firefox" in lower else "google-chrome"
+        return f"pyautogui.launch('{app_name}')"
+    return None
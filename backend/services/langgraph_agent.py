@@ -1,20 +1,36 @@
 
 import os
 import time
+import uuid
+import queue
 import logging
-from typing import TypedDict, Annotated, List, Dict, Any, Union
+import threading
+from typing import TypedDict, Annotated, List, Dict, Any, Union, Callable
 import operator
 
+# langgraph/langchain are heavy: AgentService imports this module lazily, on first sandbox init
 from langgraph.graph import StateGraph, END
+try:
+    from langgraph.types import Send
+except ImportError:
+    from langgraph.constants import Send
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
 # Import existing services
 from backend.services.local_adapter import LocalDockerAdapter
-# We assume AgentS3 matches the interface expected by existing agent_service
-try:
-    from gui_agents.s3.agents.agent_s import AgentS3
-except ImportError:
-    AgentS3 = None
+from backend.services.prompts import PromptAssembler
+from backend.services.intents import IntentRouter
+from backend.services.resources import RunQuota, ResourceMonitor
+from backend.services.usage import RunUsage, track_usage
+from backend.services.metrics import metrics
+from backend.services.imaging import png_size, downscale_png
+from backend.services.trajectories import TrajectoryStore, TrajectoryRecorder, ReplaySession, screen_signature
+from backend.services.plan_cache import get_plan_cache
+from backend.services.fanout import split_instruction, speedup_report
+from backend.services.blobs import blobs
+from backend.services.pacing import action_type
+from backend.services.recording import RunRecording
+from backend.services.progress import ProgressMonitor
 
 logger = logging.getLogger(__name__)
 
@@ -22,28 +38,84 @@ class AgentState(TypedDict):
     """The state of the agent in the LangGraph."""
     messages: Annotated[list[BaseMessage], operator.add]
     instruction: str
-    user_image: Union[str, None] # Base64 image from user
+    user_image: Union[str, None] # Blob ref of the image the user attached
     step_count: int
     executed_actions_count: int
     logs: Annotated[list[str], operator.add]
-    status: str # "running", "done", "fail", "error"
+    status: str # "running", "done", "fail", "error", "quota", "cancelled", "stalled"
     info: Dict[str, Any]
     latest_actions: List[str] # Actions to be executed by tool node
+    scratchpad: str # Feedback from the tool node for the next planner call
+    fast_path_actions: int # Deterministic actions issued without the planner
+    subgoals: List[str] # Independent sub-goals fanned out to parallel branches
+    branch_results: Annotated[list[dict], operator.add] # One entry per finished branch
+
+_STREAM_END = object()
 
 class LangGraphAgentService:
-    def __init__(self, agent_instance: Any, adapter: LocalDockerAdapter):
+    def __init__(self, agent_instance: Any, adapter: LocalDockerAdapter, prompts: PromptAssembler | None = None,
+                 intents: IntentRouter | None = None, quota: RunQuota | None = None,
+                 monitor: ResourceMonitor | None = None, branch_runner: Callable | None = None):
         self.agent = agent_instance
         self.adapter = adapter
+        self.quota = quota or RunQuota.from_env()
+        self.monitor = monitor
+        self.run_started = time.time()
+        self.quota_exceeded = None
+        self.cancel_check = None
+        self._stop = threading.Event()  # set when the consumer of the run's stream goes away
+        # How long an abandoned stream waits for the graph to finish its current step
+        self.stop_timeout = float(os.getenv("RUN_STOP_TIMEOUT", 300))
+        self.follow_up = False
+        self.recording = None  # RunRecording of the current run (audit trail, off the hot path)
+        # Loop / no-progress detection; stalled_at is the step a stuck run was stopped at
+        self.progress = ProgressMonitor.from_env()
+        self.stalled_at = None
+        self.prompts = prompts or PromptAssembler(os.getenv("LLM_PROVIDER", "google"))
+        self.intents = intents or IntentRouter()
+        self.fast_path_enabled = os.getenv("FAST_PATH", "1").lower() in ("1", "true", "yes")
+        # Ground on the active window when it covers less than this share of the screen (0 = off)
+        self.roi_max_area = float(os.getenv("ROI_MAX_AREA", 0.6))
+        # Downscale the planner's full frame to this width (0 = send full resolution)
+        self.planner_frame_width = int(os.getenv("PLANNER_FRAME_WIDTH", 0))
+        # Trajectories: off | record (persist successful runs) | replay (also re-execute known tasks)
+        self.replay_mode = os.getenv("REPLAY_MODE", "off").lower()
+        self.trajectories = TrajectoryStore()
+        self.recorder = None
+        self.replay = None
+        self._replay_screenshot = None
+        self._user_image = None
+        # Cross-session cache of the first planner outputs for similar instructions
+        self.plan_cache = get_plan_cache()
+        self.cached_plan = None
+        self._plan_lookup_done = False
+        self._plan_outputs = []
+        # Fan-out: branch_runner(index, instruction, emit) runs one sub-goal on its own sandbox
+        self.branch_runner = branch_runner
+        self.fanout_enabled = branch_runner is not None and os.getenv("FANOUT", "0").lower() in ("1", "true", "yes")
+        self.fanout_max_subgoals = int(os.getenv("FANOUT_MAX_SUBGOALS", 10))
+        self._fanout_started = 0.0
+        self._events: queue.Queue | None = None
+        self.run_usage = RunUsage()
+        self.run_stats = self._new_run_stats()
         self.workflow = self._build_graph()
         self.runner = self.workflow.compile()
         
     def _build_graph(self):
         workflow = StateGraph(AgentState)
         
+        workflow.add_node("split", self._split_node)
         workflow.add_node("agent", self._agent_node)
         workflow.add_node("tools", self._tool_node)
+        workflow.add_node("branch", self._branch_node)
+        workflow.add_node("reduce", self._reduce_node)
         
-        workflow.set_entry_point("agent")
+        workflow.set_entry_point("split")
+
+        # Decomposable instructions fan out to one branch per sub-goal; the rest run the agent loop
+        workflow.add_conditional_edges("split", self._route_split)
+        workflow.add_edge("branch", "reduce")
+        workflow.add_edge("reduce", END)
         
         workflow.add_conditional_edges(
             "agent",
@@ -51,7 +123,11 @@ class LangGraphAgentService:
             {
                 "continue": "tools",
                 "done": END,
-                "fail": END
+                "fail": END,
+                "error": END,
+                "quota": END,
+                "cancelled": END,
+                "stalled": END
             }
         )
         
@@ -59,50 +135,256 @@ class LangGraphAgentService:
         
         return workflow
 
+    def _new_run_stats(self) -> Dict[str, int]:
+        return {"steps": 0, "planner_calls": 0, "planner_calls_avoided": 0, "fast_path_actions": 0,
+                "replayed_steps": 0, "replay_diverged_at": None, "plan_cache_steps": 0, "fanout": None}
+
+    # --- Fan-out ---
+    def _split_node(self, state: AgentState) -> Dict[str, Any]:
+        """Split the instruction into independent sub-goals when fan-out is enabled."""
+        if not self.fanout_enabled or state.get("user_image") or self.follow_up:
+            return {"subgoals": []}
+        subgoals = split_instruction(state["instruction"], self.fanout_max_subgoals)
+        if not subgoals:
+            return {"subgoals": []}
+        self._fanout_started = time.time()
+        return {
+            "subgoals": subgoals,
+            "logs": [f"Running {len(subgoals)} independent sub-tasks in parallel: " + "; ".join(subgoals)]
+        }
+
+    def _route_split(self, state: AgentState):
+        if not state.get("subgoals"):
+            return "agent"
+        return [Send("branch", {"branch_index": i, "branch_instruction": goal})
+                for i, goal in enumerate(state["subgoals"])]
+
+    def _branch_node(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one sub-goal end to end on its own leased sandbox."""
+        index, goal = payload["branch_index"], payload["branch_instruction"]
+        result = self.branch_runner(index, goal, lambda event: self._emit({"branch_progress": event}),
+                                    cancel_check=self._cancelled)
+        return {"branch_results": [result]}
+
+    def _reduce_node(self, state: AgentState) -> Dict[str, Any]:
+        """Merge branch results into one outcome and report the parallel speedup."""
+        results = sorted(state.get("branch_results", []), key=lambda r: r["index"])
+        report = speedup_report(results, time.time() - self._fanout_started)
+        self.run_stats["fanout"] = report
+        for result in results:
+            branch = result.get("report") or {}
+            for key in ("steps", "planner_calls", "planner_calls_avoided"):
+                self.run_stats[key] += branch.get(key, 0)
+        metrics.observe("fanout_speedup", report["speedup"] or 0)
+
+        lines = [f"[{r['index'] + 1}] {r['instruction']}: {r['status']}" + (f" - {r['summary']}" if r.get("summary") else "")
+                 for r in results]
+        summary = (f"{report['succeeded']}/{report['branches']} sub-tasks succeeded in {report['parallel_seconds']}s "
+                   f"({report['speedup']}x faster than serial).")
+        return {
+            "step_count": state["step_count"] + 1,
+            "latest_actions": [],
+            "status": "done" if report["succeeded"] == report["branches"] else "fail",
+            "info": {"plan": summary},
+            "logs": lines
+        }
+
+    def _cancelled(self) -> bool:
+        """The run was cancelled (registry flag) or its stream was abandoned."""
+        return self._stop.is_set() or bool(self.cancel_check and self.cancel_check())
+
+    def _emit(self, output: Dict[str, Any]):
+        """Push an out-of-band update (e.g. branch progress) into the run's output stream."""
+        if self._events is not None:
+            self._events.put(output)
+
+    def _try_fast_path(self, state: AgentState) -> Dict[str, Any] | None:
+        """Serve deterministic sub-goals without the planner; None means ask the planner."""
+        step_num = state["step_count"]
+
+        if step_num == 0 and self.fast_path_enabled and not state.get("user_image"):
+            plan = self.intents.plan(state["instruction"])
+            if not plan.actions:
+                return None
+            # Each deterministic sub-goal would have cost at least one planner call; the planner
+            # still gets the next step, to verify the result (or to do the residual work)
+            self.run_stats["planner_calls_avoided"] += len(plan.actions)
+            self.run_stats["fast_path_actions"] += len(plan.actions)
+            logger.info(f"Fast path: {plan.intents} (residual: {plan.residual!r})")
+            return {
+                "step_count": step_num + 1,
+                "latest_actions": plan.actions,
+                "fast_path_actions": len(plan.actions),
+                "status": "running",
+                "info": {"plan": f"Fast path: {', '.join(plan.intents)}"},
+                "logs": [f"Fast path: executing {len(plan.actions)} deterministic action(s) without the planner."]
+            }
+        return None
+
+    def _try_replay(self, state: AgentState) -> Dict[str, Any] | None:
+        """Re-issue the next recorded step if the screen still matches; None hands over to the planner."""
+        if self.replay is None or self.replay.finished:
+            return None
+        matched, screenshot = self.replay.verify(lambda: self.adapter.screenshot(format="bytes"))
+        if not matched:
+            self.run_stats["replay_diverged_at"] = self.replay.cursor + 1
+            metrics.inc("replay_divergences_total")
+            self.replay = None
+            self._replay_screenshot = blobs.put(screenshot)
+            return None
+
+        index = self.replay.cursor + 1
+        total = len(self.replay.trajectory.steps)
+        step = self.replay.advance()
+        self.run_stats["replayed_steps"] += 1
+        self.run_stats["planner_calls_avoided"] += 1
+        done = step.actions == ["DONE"]
+        return self._record_step(state, {
+            "step_count": state["step_count"] + 1,
+            "latest_actions": [] if done else step.actions,
+            "status": "done" if done else "running",
+            "info": {"plan": f"Replay: step {index}/{total}"},
+            "logs": ["Task completed!"] if done else [f"Replaying recorded step {index}/{total} (screen verified)."]
+        }, screenshot)
+
+    def _cached_plan_actions(self, instruction: str, user_image, screenshot: bytes) -> List[str] | None:
+        """Planner output served from the plan cache while the screen matches the cached run."""
+        if not self.plan_cache or user_image:
+            return None
+        if not self._plan_lookup_done:
+            self._plan_lookup_done = True
+            self.cached_plan = self.plan_cache.lookup(instruction, screenshot)
+            if self.cached_plan:
+                logger.info(f"Plan cache hit (similarity {self.cached_plan.score:.2f}, {len(self.cached_plan.steps)} steps)")
+                metrics.inc("plan_cache_hits_total")
+        if self.cached_plan is None:
+            return None
+        actions = self.cached_plan.next_actions(screenshot)
+        if actions is None:
+            self.cached_plan = None
+        return actions
+
+    def _record_step(self, state: AgentState, result: Dict[str, Any], screenshot: bytes | None = None) -> Dict[str, Any]:
+        """Append the step to the run's trajectory; persist trajectory and plan cache when the run succeeds."""
+        done = result["status"] == "done"
+        if self.recording is not None:
+            self.recording.frame(screenshot, state["step_count"])
+            self.recording.event("plan", state["step_count"], status=result["status"],
+                                 actions=result.get("latest_actions") or [],
+                                 plan=str((result.get("info") or {}).get("plan", ""))[:200])
+        if self.recorder is not None:
+            self.recorder.add(["DONE"] if done else result.get("latest_actions") or [], screenshot)
+            if done:
+                self._save_trajectory()
+        if done and self.plan_cache and not self.follow_up and self._plan_outputs and self.run_stats["planner_calls"]:
+            try:
+                self.plan_cache.store(state["instruction"], self._plan_outputs)
+            except Exception as e:
+                logger.warning(f"Could not store plan cache entry: {e}")
+        return result
+
+    def _save_trajectory(self):
+        try:
+            if self.run_stats["replayed_steps"] and self.run_stats["replay_diverged_at"] is None:
+                trajectory = self.trajectories.load(self.recorder.instruction)
+                if trajectory:
+                    trajectory.replays += 1
+            else:
+                trajectory = self.recorder.to_trajectory()
+            if trajectory:
+                self.trajectories.save(trajectory)
+        except OSError as e:
+            logger.warning(f"Could not persist trajectory: {e}")
+
     def _agent_node(self, state: AgentState) -> Dict[str, Any]:
         """Node for the AI Agent to think and decide actions."""
         step_num = state["step_count"]
         instruction = state["instruction"]
         user_image = state.get("user_image")
+
+        # Cancellation (requested on any worker through the session registry)
+        if self._cancelled():
+            logger.info("Run cancelled")
+            return {
+                "step_count": step_num,
+                "latest_actions": [],
+                "status": "cancelled",
+                "info": {},
+                "logs": ["Stopped: cancelled."]
+            }
+
+        # 0. Enforce run quotas (steps, tokens, wall time, sandbox memory)
+        violation = self.quota.violation(
+            steps=step_num,
+            tokens=self.run_usage.total_tokens,
+            wall_seconds=time.time() - self.run_started,
+            memory_mb=self.monitor.memory_mb if self.monitor else None,
+        )
+        if violation:
+            self.quota_exceeded = violation
+            logger.warning(f"Stopping run: {violation}")
+            return {
+                "step_count": step_num,
+                "latest_actions": [],
+                "status": "quota",
+                "info": {},
+                "logs": [f"Stopped: {violation}."]
+            }
+
+        self.run_stats["steps"] += 1
+
+        # Known tasks re-issue their recorded actions while the screen matches
+        replayed = self._try_replay(state)
+        if replayed is not None:
+            return replayed
+
+        # Deterministic intents bypass the planner entirely
+        fast = self._try_fast_path(state)
+        if fast is not None:
+            return self._record_step(state, fast)
         
         # 1. Prepare Environment & Observation
         # (Similar to agent_service logic)
         
-        # Taking screenshot
-        screenshot_bytes = self.adapter.screenshot(format="bytes")
+        # Taking screenshot (reuse the one a diverged replay just captured)
+        screenshot_bytes = blobs.get(self._replay_screenshot) or self.adapter.screenshot(format="bytes")
+        blobs.release(self._replay_screenshot)
+        self._replay_screenshot = None
+        screenshot_ref = blobs.put(screenshot_bytes)
         obs = {"screenshot": screenshot_bytes}
+        if self.planner_frame_width:
+            # Low-res full frame for planner context; grounding keeps full resolution
+            obs["screenshot"] = downscale_png(screenshot_bytes, self.planner_frame_width)
         
-        # Augment instruction if needed
-        current_instruction = instruction
-        
+        # Stuck runs (same actions on an unchanged screen) are corrected, then stopped before the next planner call
+        stall = self.progress.observe(screenshot_bytes, state.get("latest_actions"), step_num)
+        if stall is not None:
+            if self.recording is not None:
+                self.recording.event("stall", step_num, pattern=stall.kind, detail=stall.detail,
+                                     intervention=stall.intervention)
+            if stall.intervention == "abort":
+                self.stalled_at = step_num
+                return self._record_step(state, {
+                    "step_count": step_num + 1,
+                    "latest_actions": [],
+                    "status": "stalled",
+                    "info": {},
+                    "logs": [f"Stopped: no progress ({stall.kind}: {stall.detail})."]
+                }, screenshot_bytes)
+            if stall.intervention == "escalate" and hasattr(self.agent, "escalate"):
+                self.agent.escalate("stall")
+
         # 2. Predict
         logger.info(f"LangGraph Agent Step {step_num}")
         try:
-            # Simple augmented instruction for V0.1
-            if step_num == 0:
-                 current_instruction = (
-                    f"{instruction}\n\n"
-                    "# MISSION & IDENTITY\n"
-                    "You are an advanced autonomous AI agent capable of controlling a computer to accomplish complex tasks. "
-                    "Your goal is to complete the user's request efficiently and accurately. \n"
-                    "IMPORTANT: You are in a restricted environment.\n"
-                    "1. OUTPUT RAW PYTHON CODE ONLY. DO NOT USE MARKDOWN.\n"
-                    "2. Standard Agent S3 format is allowed (imports will be handled): \n"
-                    "   - `import pyautogui; pyautogui.click(x, y)`\n"
-                    "   - `import pyautogui; pyautogui.typewrite('text')`\n"
-                    "   - `agent.launch('firefox')` or `pyautogui.launch('firefox')`\n"
-                    "3. DO NOT use `computer.wait()`. Use `import time; time.sleep(seconds)`.\n"
-                    "Start by launching Firefox: `agent.launch('firefox')`"
-                 )
-                 
-                 if user_image:
-                     current_instruction = f"[USER PROVIDED AN IMAGE/SCREENSHOT AS CONTEXT]\n\n" + current_instruction
-            
             # Cost Optimization: Update Grounding Proxy with real screenshot
             # But hide it from the Planner LLM to save tokens/cost
             # Cost Optimization: Update Grounding Proxy with real screenshot
             if hasattr(self.agent, "grounding_agent") and hasattr(self.agent.grounding_agent, "update_screenshot"):
-                self.agent.grounding_agent.update_screenshot(screenshot_bytes)
+                # The proxy now owns the frame's reference and releases it on the next update
+                self.agent.grounding_agent.update_screenshot(screenshot_ref, self._focus_region(screenshot_bytes))
+            else:
+                blobs.release(screenshot_ref)
                 # obs["screenshot"] = b""  <-- DISABLED: User requested full vision for Planner
             
             # CRITICAL LOOP FIX: Provide explicit text feedback since we removed the screenshot
@@ -110,13 +392,36 @@ class LangGraphAgentService:
             if last_result:
                  # Inject previous action result into the observation so the planner knows it happened
                  obs["last_action_result"] = last_result[-1] if isinstance(last_result, list) else last_result
-                 # Also append to instruction for good measure (some agents ignore obs keys)
-                 current_instruction += f"\n\n[SYSTEM FEEDBACK FROM PREVIOUS ACTION]:\n{obs['last_action_result']}"
+            if stall is not None:
+                obs["last_action_result"] = f"{obs.get('last_action_result') or ''}\n{stall.feedback}".strip()
 
-            info, action = self.agent.predict(instruction=current_instruction, observation=obs)
+            # Optional accessibility channel: full tree on the first step, then only the diff
+            accessibility = getattr(getattr(self.agent, "grounding_agent", None), "accessibility", None)
+            if accessibility:
+                accessibility.invalidate()
+                obs["accessibility_tree"] = accessibility.observation()
+
+            # The MISSION block goes out with the run's first planner call only (AgentS3 keeps it in its
+            # trajectory); the task and per-step feedback (some agents ignore obs keys) go every step
+            prompt = self.prompts.build(instruction, user_image=bool(user_image),
+                                        feedback=obs.get("last_action_result"),
+                                        elements=obs.get("accessibility_tree"),
+                                        first_step=not self.run_stats["planner_calls"] and not self.follow_up)
+
+            cached_actions = self._cached_plan_actions(instruction, user_image, screenshot_bytes)
+            if cached_actions is not None:
+                info, action = {"plan": "Plan cache"}, cached_actions
+                self.run_stats["plan_cache_steps"] += 1
+                self.run_stats["planner_calls_avoided"] += 1
+            else:
+                with track_usage(self.run_usage):
+                    info, action = self.agent.predict(instruction=prompt.text, observation=obs)
+                self.run_stats["planner_calls"] += 1
+            if self.plan_cache and len(self._plan_outputs) < self.plan_cache.max_steps:
+                self._plan_outputs.append((screen_signature(screenshot_bytes), list(action or [])))
             
             # 3. Process Result
-            logs = []
+            logs = [f"Not making progress ({stall.kind}), trying a different approach."] if stall else []
             status = "running"
             
             if not action or len(action) == 0:
@@ -132,13 +437,13 @@ class LangGraphAgentService:
                 status = "fail"
                 logs.append("Task failed.")
             
-            return {
+            return self._record_step(state, {
                 "step_count": step_num + 1,
                 "latest_actions": action if status == "running" else [],
                 "status": status,
                 "info": info,
                 "logs": logs
-            }
+            }, screenshot_bytes)
             
         except Exception as e:
             logger.error(f"Agent prediction error: {e}")
@@ -189,29 +494,32 @@ class LangGraphAgentService:
 
                 logger.info(f"Executing Agent Code: {sanitized_act}")
 
-                # Interceptor: Catch "Start Menu" usage and convert to direct launch
-                lower_act = sanitized_act.lower()
-                if "hotkey('win')" in lower_act and ("write('firefox')" in lower_act or "write('chrome')" in lower_act):
-                    logger.info(">>> INTERCEPTING: Converting flaky 'Start Menu' launch to direct launch() <<<")
-                    app_name = "firefox" if "firefox" in lower_act else "google-chrome"
-                    sanitized_act = f"pyautogui.launch('{app_name}')"
+                # Interceptors: e.g. catch "Start Menu" usage and convert to direct launch
+                sanitized_act = self.intents.rewrite(sanitized_act)
                 
                 # Execute
                 import subprocess as _subprocess
                 exec_globals = {"agent": self.adapter, "pyautogui": self.adapter, "time": time, "subprocess": _subprocess}
                 
                 logger.info(f"Executing: {sanitized_act}")
+                settles_before = getattr(self.adapter, "settle_count", 0)
                 exec(sanitized_act, exec_globals)
+
+                # Wait for the screen to settle (learned per action type) unless the adapter already did
+                if hasattr(self.adapter, "settle") and self.adapter.settle_count == settles_before:
+                    self.adapter.settle(action_type(sanitized_act))
                 
                 executed_count += 1
                 logs.append(self._get_human_log(act))
+                if self.recording is not None:
+                    self.recording.event("action", state["step_count"], code=sanitized_act)
                 
             except Exception as e:
                 logger.error(f"Action failed: {e}")
                 logs.append(f"Action error: {str(e)[:100]}")
-            
-            # Turbo Mode V2: Fast sleep
-            time.sleep(0.1) 
+                if self.recording is not None:
+                    self.recording.event("error", state["step_count"], code=clean_act, error=str(e)[:200])
+
             
         # Feedback for Agent Node
         feedback = f"Actions executed ({executed_count})."
@@ -224,14 +532,28 @@ class LangGraphAgentService:
             "scratchpad": feedback # Provide feedback to agent
         }
 
+    def _focus_region(self, screenshot_bytes: bytes):
+        """Active window geometry if it is a dialog/pane worth grounding on alone, else None."""
+        if not self.roi_max_area or not hasattr(self.adapter, "window_geometry"):
+            return None
+        size = png_size(screenshot_bytes)
+        region = self.adapter.window_geometry()
+        if not size or not region:
+            return None
+        x, y, w, h = region
+        if w * h >= self.roi_max_area * size[0] * size[1] or w < 32 or h < 32:
+            return None
+        if x < 0 or y < 0 or x + w > size[0] or y + h > size[1]:
+            return None
+        metrics.inc("grounding_roi_total")
+        return region
+
     def _should_continue(self, state: AgentState) -> str:
         """Decide next node based on status."""
-        if state["status"] in ["done", "fail", "error"]:
+        if state["status"] in ["done", "fail", "error", "quota", "cancelled", "stalled"]:
             return state["status"] # Maps to END in the graph definition if done/fail
-        
-        if state["step_count"] >= 50:
-            return "done" # Force stop
-            
+        # The step limit is enforced by the agent node's quota check on the next step,
+        # so the run ends as "quota" with the limit in its report
         return "continue"
 
     def _get_human_log(self, action_code: str) -> str:
@@ -242,14 +564,102 @@ class LangGraphAgentService:
         elif "open_url(" in action_code:
             url = action_code.split("open_url(")[1].split(")")[0].strip("'\"")
             return f"Navigating to {url}..."
+        elif "focus_window(" in action_code:
+            window = action_code.split("focus_window(")[1].split(")")[0].strip("'\"")
+            return f"Switching to {window}..."
         return "Performing action..."
 
-    def run(self, instruction: str, user_image: str | None = None):
-        """Run the graph for the given instruction."""
+    def run_report(self) -> Dict[str, Any]:
+        """Per-run statistics, emitted with the SSE `done` event."""
+        usage = self.run_usage.to_dict()
+        usage["cache_mode"] = self.prompts.cache_mode
+        usage["prefix_hash"] = self.prompts.prefix_hash
+        return {
+            "usage": usage,
+            **self.run_stats,
+            "wall_seconds": round(time.time() - self.run_started, 2),
+            "quota": {**self.quota.to_dict(), "exceeded": self.quota_exceeded},
+            "resources": self.monitor.to_dict() if self.monitor else None,
+            "recording": self.recording.report() if self.recording else None,
+            "planner_tiers": self.agent.tier_report() if hasattr(self.agent, "tier_report") else None,
+            "stall": self.progress.report(self.stalled_at, self.quota.max_steps,
+                                          self.run_usage.total_tokens / max(1, self.run_stats["planner_calls"])),
+        }
+
+    def _finish_run(self):
+        """Log and export the per-run report; release the run's blobs."""
+        blobs.release(self._user_image)
+        blobs.release(self._replay_screenshot)
+        self._user_image = self._replay_screenshot = None
+        if self.recording is not None:
+            self.recording.close()
+        report = self.run_report()
+        usage = report["usage"]
+        metrics.set("last_run_cached_token_ratio", usage["cached_ratio"])
+        metrics.observe("run_wall_seconds", report["wall_seconds"])
+        metrics.observe("run_steps", report["steps"])
+        metrics.observe("run_tokens", usage["prompt_tokens"] + usage["completion_tokens"])
+        if self.quota_exceeded:
+            metrics.inc("run_quota_exceeded_total", reason=self.quota_exceeded.split(" (")[0])
+        metrics.inc("planner_calls_total", report["planner_calls"])
+        metrics.inc("planner_calls_avoided_total", report["planner_calls_avoided"])
+        metrics.inc("replayed_steps_total", report["replayed_steps"])
+        metrics.inc("plan_cache_steps_total", report["plan_cache_steps"])
+        if report["stall"]["aborted"]:
+            metrics.inc("stall_aborts_total")
+            metrics.inc("stall_steps_saved_total", report["stall"]["steps_saved"])
+            metrics.inc("stall_tokens_saved_total", report["stall"]["tokens_saved_est"])
+        logger.info(f"Run usage: {usage['prompt_tokens']} prompt / {usage['completion_tokens']} completion tokens, "
+                    f"cached ratio {usage['cached_ratio']:.1%}, planner calls {report['planner_calls']} "
+                    f"(avoided {report['planner_calls_avoided']})")
+
+    def run(self, instruction: str, user_image: str | None = None, cancel_check: Callable[[], bool] | None = None,
+            follow_up: bool = False, run_id: str | None = None):
+        """
+        Run the graph for the given instruction (`user_image`: blob ref or base64/data URL).
+        `cancel_check` is polled before every step; returning True stops the run as "cancelled".
+        `follow_up` continues the previous turn of a conversation: the inner agent keeps its
+        trajectory, and context-dependent shortcuts (replay, plan cache, fan-out) are skipped.
+        `run_id` names the run's recording (RECORDING_DIR/<run_id>).
+        """
+        self.cancel_check = cancel_check
+        self._stop = threading.Event()
+        self.follow_up = follow_up
         # Clean state for new run if agent supports it
-        if hasattr(self.agent, "reset"):
+        if follow_up:
+            logger.info("Follow-up turn: keeping inner agent state.")
+        elif hasattr(self.agent, "reset"):
             logger.info("Resetting inner agent state for new run.")
             self.agent.reset()
+        if hasattr(self.agent, "reset_stats"):
+            self.agent.reset_stats()
+        self.run_usage = RunUsage()
+        self.run_stats = self._new_run_stats()
+        self.run_started = time.time()
+        self.quota_exceeded = None
+        self.progress.reset()
+        self.stalled_at = None
+        self.recording = RunRecording.from_env(run_id or f"{int(self.run_started)}-{uuid.uuid4().hex[:8]}")
+        if self.recording is not None:
+            self.recording.event("start", 0, instruction=instruction, follow_up=follow_up)
+        if self.monitor:
+            self.monitor.start()
+            self.monitor.reset_peaks()
+        self.recorder = None
+        if self.replay_mode in ("record", "replay") and not follow_up:
+            self.recorder = TrajectoryRecorder(instruction)
+        self.replay = None
+        self._replay_screenshot = None
+        user_image = blobs.put_base64(user_image)
+        self._user_image = user_image
+        self.cached_plan = None
+        self._plan_lookup_done = follow_up
+        self._plan_outputs = []
+        if self.replay_mode == "replay" and not user_image and not follow_up:
+            trajectory = self.trajectories.load(instruction)
+            if trajectory:
+                logger.info(f"Replaying recorded trajectory ({len(trajectory.steps)} steps)")
+                self.replay = ReplaySession(trajectory, max_distance=int(os.getenv("REPLAY_MAX_DISTANCE", 12)))
 
         initial_state = {
             "messages": [],
@@ -260,11 +670,50 @@ class LangGraphAgentService:
             "logs": [],
             "status": "running",
             "info": {},
-            "latest_actions": []
+            "latest_actions": [],
+            "scratchpad": "",
+            "fast_path_actions": 0,
+            "subgoals": [],
+            "branch_results": []
         }
         
         # Use stream=True to yield updates if we want, but for now blocking run is fine
         # Or better, we return the generator so chat.py can iterate it
         # config dictionary with recursion_limit to allow long tasks (default is usually 25)
-        config = {"recursion_limit": 100} 
-        return self.runner.stream(initial_state, config=config)
+        config = {"recursion_limit": 2 * self.quota.max_steps + 10} # agent + tools per step
+        return self._stream(initial_state, config)
+
+    def _stream(self, initial_state: Dict[str, Any], config: Dict[str, Any]):
+        # The graph runs on a worker thread so branch progress can be interleaved with node updates
+        events = queue.Queue()
+        self._events = events
+
+        def pump():
+            try:
+                for output in self.runner.stream(initial_state, config=config):
+                    events.put(output)
+            except Exception as e:
+                events.put(e)
+            finally:
+                events.put(_STREAM_END)
+
+        worker = threading.Thread(target=pump, name="langgraph-run", daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = events.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self._events = None
+            if worker.is_alive():
+                # Consumer gone before the graph ended: stop it before its next step and wait, so the
+                # desktop (or leased sandbox) is not handed to another run while this one still acts on it
+                self._stop.set()
+                worker.join(self.stop_timeout)
+                if worker.is_alive():
+                    logger.error(f"Graph still running {self.stop_timeout:.0f}s after its stream was closed")
+            self._finish_run()
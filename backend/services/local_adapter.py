@@ -9,6 +9,9 @@ import logging
 import base64
 import os
 
+from backend.services.imaging import crop_png
+from backend.services.pacing import pacing
+
 logger = logging.getLogger(__name__)
 
 class LocalDockerAdapter:
@@ -20,8 +23,10 @@ class LocalDockerAdapter:
     CONTAINER_NAME = "opencompx-desktop"
     DISPLAY = ":1"  # VNC display
     
-    def __init__(self, container_name: str = None):
+    def __init__(self, container_name: str = None, pacer=None):
         self.container_name = container_name or self.CONTAINER_NAME
+        self.pacer = pacer or pacing
+        self.settle_count = 0
         self._check_container()
     
     def _check_container(self):
@@ -73,12 +78,24 @@ class LocalDockerAdapter:
         return result.stdout
     
     # --- Screenshot ---
-    def screenshot(self, format: str = "bytes") -> bytes:
-        """Capture screenshot from container. Prefer 'import' (stream) over 'scrot' (disk)."""
+    def screenshot(self, format: str = "bytes", region: tuple[int, int, int, int] = None,
+                   window_id: str = None) -> bytes:
+        """
+        Capture screenshot from container. Prefer 'import' (stream) over 'scrot' (disk).
+        `region` (x, y, width, height) or `window_id` capture only part of the screen.
+        """
+        if window_id:
+            source = f"import -window {window_id} png:-"
+        elif region:
+            x, y, w, h = (int(v) for v in region)
+            source = f"import -window root -crop {w}x{h}+{x}+{y} +repage png:-"
+        else:
+            source = "import -window root png:-"
+
         # 1. Try ImageMagick 'import' (fastest, memory stream)
         try:
-            result = self._exec_bytes("import -window root png:-", timeout=5)
-            if result and len(result) > 1000:
+            result = self._exec_bytes(source, timeout=5)
+            if result and len(result) > 100:
                 return result
         except Exception as e:
             logger.debug(f"ImageMagick screenshot failed: {e}")
@@ -88,11 +105,33 @@ class LocalDockerAdapter:
              # Use scrot to capture, output to stdout as PNG
             result = self._exec_bytes("scrot -o /tmp/screen.png && cat /tmp/screen.png", timeout=10)
             if result and len(result) > 1000:
-                return result
+                if window_id:
+                    region = self.window_geometry(window_id)
+                return crop_png(result, region) if region else result
         except Exception as e:
             logger.error(f"Scrot screenshot failed: {e}")
         
         return b""
+
+    def screen_fingerprint(self) -> str:
+        """Hash of a 96x54 grayscale thumbnail of the screen (cheap change detection)."""
+        result = self._exec("import -window root -scale '96x54!' gray:- 2>/dev/null | md5sum", timeout=5)
+        return result.stdout[:32]
+
+    def settle(self, kind: str) -> float:
+        """Wait until the screen settles after a `kind` action (see backend.services.pacing)."""
+        self.settle_count += 1
+        return self.pacer.settle(self, kind)
+
+    def window_geometry(self, window_id: str = None) -> tuple[int, int, int, int] | None:
+        """(x, y, width, height) of a window, or of the active window if no id is given."""
+        target = f"getwindowgeometry --shell {window_id}" if window_id else "getactivewindow getwindowgeometry --shell"
+        result = self._exec(f"xdotool {target}", timeout=5)
+        fields = dict(line.split("=", 1) for line in result.stdout.splitlines() if "=" in line)
+        try:
+            return int(fields["X"]), int(fields["Y"]), int(fields["WIDTH"]), int(fields["HEIGHT"])
+        except (KeyError, ValueError):
+            return None
     
     # --- Mouse Functions ---
     def click(self, x=None, y=None, clicks=1, interval=0.0, button='left', **kwargs):
@@ -126,9 +165,8 @@ class LocalDockerAdapter:
             
         direction = "4" if clicks > 0 else "5"
         count = abs(int(clicks))
-        for _ in range(count):
-            self._exec(f"xdotool click {direction}")
-            time.sleep(0.05)
+        if count:
+            self._exec(f"xdotool click --repeat {count} --delay 50 {direction}")
 
     # --- Keyboard / Text ---
     def hotkey(self, *args, **kwargs):
@@ -211,9 +249,8 @@ class LocalDockerAdapter:
         if x is not None and y is not None:
             self._exec(f"xdotool mousemove {int(x)} {int(y)}")
         
-        for _ in range(amount):
-            self._exec(f"xdotool click {direction}")
-            time.sleep(0.05) # Small delay for reliability
+        if amount:
+            self._exec(f"xdotool click --repeat {amount} --delay 50 {direction}")
 
     def vscroll(self, clicks, x=None, y=None, **kwargs):
         """Vertical scroll alias."""
@@ -228,9 +265,8 @@ class LocalDockerAdapter:
         if x is not None and y is not None:
             self._exec(f"xdotool mousemove {int(x)} {int(y)}")
         
-        for _ in range(amount):
-            self._exec(f"xdotool click {direction}")
-            time.sleep(0.05)
+        if amount:
+            self._exec(f"xdotool click --repeat {amount} --delay 50 {direction}")
     
     # --- App Management ---
     def launch(self, app_name: str, **kwargs):
@@ -239,7 +275,7 @@ class LocalDockerAdapter:
         # Use nohup and set DISPLAY to ensure it runs in background
         cmd = f"nohup {app_name} > /dev/null 2>&1 &"
         self._exec(cmd)
-        time.sleep(2) # Wait for app to appear
+        self.settle("launch") # Wait for app to appear
 
     # --- Keyboard Functions ---
     def write(self, message, interval=0.0, **kwargs):
@@ -322,7 +358,7 @@ class LocalDockerAdapter:
         
         actual_app = app_map.get(app.lower(), app)
         self._exec(f"nohup {actual_app} > /tmp/launch.log 2>&1 &")
-        time.sleep(1)  # Faster launch wait
+        self.settle("launch")
     
     def open_url(self, url):
         """Open URL in browser."""
@@ -331,8 +367,14 @@ class LocalDockerAdapter:
             url = f"https://{url}"
         
         self._exec(f"nohup firefox '{url}' > /tmp/browser.log 2>&1 &")
-        time.sleep(1.5)  # Faster browser wait
+        self.settle("open_url")
     
+    def focus_window(self, name: str):
+        """Raise and focus the first window whose title matches `name`."""
+        logger.info(f"Local Focus Window: {name}")
+        safe_name = name.replace("'", "'\\''")
+        self._exec(f"xdotool search --onlyvisible --name '{safe_name}' windowactivate --sync %1", timeout=10)
+
     # --- Utils ---
     def position(self):
         """Get current mouse position."""
@@ -376,6 +418,11 @@ class LocalDockerAdapter:
         """Get clipboard content."""
         return self._exec("xclip -selection clipboard -o", timeout=5).stdout
 
+    def start_vnc(self) -> bool:
+        """Start VNC/noVNC on demand (lightweight profile); no-op where VNC always runs."""
+        res = self._exec("command -v vnc-on >/dev/null && vnc-on || true", timeout=15)
+        return res.returncode == 0
+
     def wait_for_vnc(self, timeout: int = 15) -> bool:
         """Poll container to check if VNC port (6080) is listening."""
         logger.info(f"Waiting for VNC to be ready (timeout={timeout}s)...")
@@ -403,20 +450,18 @@ def is_container_running(container_name: str = "opencompx-desktop") -> bool:
         return False
 
 
-def start_container():
-    """Start the desktop container using docker compose."""
-    try:
-        subprocess.run(
-            ["docker", "compose", "-f", "docker-compose.desktop.yml", "up", "-d", "--build"],
-            check=True, timeout=300
-        )
-        time.sleep(2)
-        return True
-    except Exception as e:
-        logger.error(f"Failed to start container: {e}")
-        return False
+def start_container(container_name: str = "opencompx-desktop", profile: str | None = None,
+                    ports: dict[int, int | None] | None = None):
+    """
+    Start the desktop container from its content-hashed image (built only if missing).
+    VNC is published on the fixed ports 5901/6080 unless `ports` says otherwise.
+    """
+    from backend.services.sandbox import get_provisioner
+    return get_provisioner(profile).start(container_name, ports=ports or {5901: 5901, 6080: 6080})
 
 
 def get_novnc_url(port: int = 6080) -> str:
-    """Get the noVNC URL for the local container."""
+    """Get the noVNC URL for the local container (non-default ports are not behind the /vnc proxy)."""
+    if port != 6080:
+        return f"http://localhost:{port}/vnc.html?autoconnect=true&resize=scale&password=agent"
     return f"/vnc/vnc.html?autoconnect=true&resize=scale&password=agent&path=vnc/websockify"
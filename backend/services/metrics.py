@@ -0,0 +1,105 @@
+"""
+Metrics - Minimal in-process registry rendered in Prometheus text format on `/metrics`.
+
+Services record counters, gauges and summaries directly, or register a
+collector callback that is evaluated at scrape time for state they already own
+(e.g. replica latency stats).
+"""
+
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "opencompx_"
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in key]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe store of counters, gauges and summaries (count/sum/max)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[str, dict[tuple, float]] = {}
+        self.gauges: dict[str, dict[tuple, float]] = {}
+        self.summaries: dict[str, dict[tuple, list[float]]] = {}
+        self.collectors = []
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        with self.lock:
+            series = self.summaries.setdefault(name, {})
+            count, total, peak = series.get(_label_key(labels), [0, 0.0, 0.0])
+            series[_label_key(labels)] = [count + 1, total + value, max(peak, value)]
+
+    def register_collector(self, collector):
+        """Register `collector() -> iterable[(name, labels, value)]` evaluated at scrape time as gauges."""
+        with self.lock:
+            self.collectors.append(collector)
+
+    def _collected(self) -> dict[str, dict[tuple, float]]:
+        gauges: dict[str, dict[tuple, float]] = {}
+        for collector in list(self.collectors):
+            try:
+                for name, labels, value in collector():
+                    if value is not None:
+                        gauges.setdefault(name, {})[_label_key(labels)] = float(value)
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return gauges
+
+    def snapshot(self) -> dict:
+        """JSON-friendly view of every series."""
+        collected = self._collected()
+        with self.lock:
+            def flatten(store):
+                return {name: {_format_labels(k) or "_": v for k, v in series.items()}
+                        for name, series in store.items()}
+            return {
+                "counters": flatten(self.counters),
+                "gauges": {**flatten(self.gauges), **flatten(collected)},
+                "summaries": {name: {_format_labels(k) or "_": {"count": c, "sum": s, "max": m}
+                                     for k, (c, s, m) in series.items()}
+                              for name, series in self.summaries.items()},
+            }
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        collected = self._collected()
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines += [f"{PREFIX}{name}{_format_labels(k)} {v}" for k, v in series.items()]
+            for name, series in sorted({**self.gauges, **collected}.items()):
+                lines.append(f"# TYPE {PREFIX}{name} gauge")
+                lines += [f"{PREFIX}{name}{_format_labels(k)} {v}" for k, v in series.items()]
+            for name, series in sorted(self.summaries.items()):
+                lines.append(f"# TYPE {PREFIX}{name} summary")
+                for k, (count, total, peak) in series.items():
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(k)} {count}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(k)} {total}")
+                    lines.append(f"{PREFIX}{name}_max{_format_labels(k)} {peak}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
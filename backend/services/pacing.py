@@ -0,0 +1,158 @@
+"""
+Adaptive Pacing - Wait for the screen to settle after an action, learned per action type.
+
+Fixed sleeps were too long for keystrokes and too short for page loads. After
+each action the controller polls a cheap screen fingerprint (a 96x54 grayscale
+thumbnail hashed inside the container) until it has been unchanged for
+PACING_QUIET seconds. When no change is seen at all it waits at least the
+learned estimate for that action type, and never longer than PACING_MAX_WAIT.
+The quiet window shrinks to the learned estimate when that is shorter, and
+keystrokes (type/key) estimated below PACING_QUIET just sleep the estimate.
+The measured settle time (last change after the action) updates an EWMA and a
+recent-samples window per type. A wait that saw no change is censored (the
+change may simply not have started yet) and is not learned from. Estimates
+never drop below PACING_FLOOR times the starting value. The learned timings
+are exported on `/metrics` and `GET /pacing`.
+
+PACING=fixed restores constant per-type sleeps.
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from collections import deque
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Starting estimates (seconds) before anything is learned; also the PACING=fixed sleeps
+DEFAULT_SETTLE = {
+    "launch": 2.0,
+    "open_url": 1.5,
+    "click": 0.3,
+    "type": 0.1,
+    "key": 0.2,
+    "scroll": 0.2,
+    "drag": 0.3,
+    "other": 0.1,
+}
+
+_ACTION_TYPES = [
+    ("launch", re.compile(r"\.launch\(|gtk-launch|nohup ")),
+    ("open_url", re.compile(r"open_url\(")),
+    ("type", re.compile(r"\.(?:write|typewrite)\(")),
+    ("key", re.compile(r"\.(?:hotkey|press|keyDown|keyUp)\(")),
+    ("scroll", re.compile(r"\.(?:scroll|vscroll|hscroll)\(")),
+    ("drag", re.compile(r"\.(?:drag|dragTo|drag_rel|mouseDown|mouseUp)\(")),
+    ("click", re.compile(r"\.(?:click|doubleClick|tripleClick|rightClick|moveTo)\(")),
+]
+
+
+# Keystrokes whose estimate is below one quiet window are slept without polling the screen:
+# every poll is a `docker exec`, which would cost more than the keystroke takes to render
+_UNPOLLED = {"type", "key"}
+
+
+def action_type(code: str) -> str:
+    """Coarse action category of a pyautogui/agent code string."""
+    for name, pattern in _ACTION_TYPES:
+        if pattern.search(code):
+            return name
+    return "other"
+
+
+class PacingController:
+    """Per-action-type settle-time estimates and the adaptive wait loop."""
+
+    def __init__(self, mode: str = "adaptive", max_wait: float = 8.0, poll_interval: float = 0.1,
+                 alpha: float = 0.3, window: int = 50, quiet: float = 0.3, floor: float = 0.5):
+        self.mode = mode
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.alpha = alpha
+        self.quiet = quiet
+        self.floor = floor
+        self.estimates = dict(DEFAULT_SETTLE)
+        self.samples: dict[str, deque] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "PacingController":
+        return cls(
+            mode=os.getenv("PACING", "adaptive").lower(),
+            max_wait=float(os.getenv("PACING_MAX_WAIT", 8.0)),
+            poll_interval=float(os.getenv("PACING_POLL_INTERVAL", 0.1)),
+            quiet=float(os.getenv("PACING_QUIET", 0.3)),
+            floor=float(os.getenv("PACING_FLOOR", 0.5)),
+        )
+
+    def estimate(self, kind: str) -> float:
+        with self.lock:
+            return self.estimates.get(kind, DEFAULT_SETTLE["other"])
+
+    def settle(self, adapter, kind: str) -> float:
+        """Block until the screen settles after a `kind` action; returns the time waited."""
+        expected = min(self.estimate(kind), self.max_wait)
+        if (self.mode == "fixed" or not hasattr(adapter, "screen_fingerprint")
+                or (kind in _UNPOLLED and expected < self.quiet)):
+            time.sleep(expected)
+            return expected
+        # A short learned settle time also shortens the quiet window (never below one poll)
+        quiet = min(self.quiet, max(expected, self.poll_interval))
+
+        start = time.perf_counter()
+        previous = adapter.screen_fingerprint()
+        last_change = None
+        while True:
+            time.sleep(self.poll_interval)
+            elapsed = time.perf_counter() - start
+            current = adapter.screen_fingerprint()
+            if current != previous:
+                last_change, previous = elapsed, current
+            # Settled: unchanged for the quiet window after the last change; with no change
+            # seen yet, not before the learned estimate (slow loads start late)
+            quiet_for = elapsed - (last_change or 0.0)
+            if quiet_for >= quiet and (last_change is not None or elapsed >= expected):
+                break
+            if elapsed >= self.max_wait:
+                logger.debug(f"Screen still changing {elapsed:.1f}s after {kind}, giving up")
+                break
+
+        waited = time.perf_counter() - start
+        if last_change is not None:
+            self.record(kind, last_change)
+        else:
+            metrics.inc("pacing_censored_total", action=kind)
+        metrics.observe("pacing_wait_seconds", waited, action=kind)
+        return waited
+
+    def record(self, kind: str, settle_seconds: float):
+        """Learn one observed settle time (only waits that actually saw the screen change)."""
+        with self.lock:
+            previous = self.estimates.get(kind, DEFAULT_SETTLE["other"])
+            floor = self.floor * DEFAULT_SETTLE.get(kind, DEFAULT_SETTLE["other"])
+            self.estimates[kind] = max(floor, (1 - self.alpha) * previous + self.alpha * settle_seconds)
+            self.samples.setdefault(kind, deque(maxlen=50)).append(settle_seconds)
+            estimate = self.estimates[kind]
+        metrics.set("pacing_settle_estimate_seconds", round(estimate, 3), action=kind)
+        metrics.observe("pacing_settle_seconds", settle_seconds, action=kind)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Learned timings per action type (EWMA, p50/p90 of recent samples)."""
+        with self.lock:
+            result = {}
+            for kind, estimate in self.estimates.items():
+                recent = sorted(self.samples.get(kind, ()))
+                result[kind] = {
+                    "ewma_ms": round(estimate * 1000),
+                    "p50_ms": round(recent[len(recent) // 2] * 1000) if recent else None,
+                    "p90_ms": round(recent[int(len(recent) * 0.9)] * 1000) if recent else None,
+                    "samples": len(recent),
+                }
+            return {"mode": self.mode, "max_wait_s": self.max_wait, "actions": result}
+
+
+pacing = PacingController.from_env()
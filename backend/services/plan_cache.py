@@ -0,0 +1,181 @@
+"""
+Plan Cache - Cross-session cache of instruction -> first planner outputs.
+
+Near-identical instructions started from the same screen usually get the same
+first few planner answers. Successful runs store their first N planner
+outputs, each with the dHash of the screen it was planned on, keyed by the
+normalised instruction. A new run looks up the closest entry by character
+trigram similarity. Literals such as numbers, URLs and quoted text must match
+exactly, and the initial screen must match too. It is then served one step at a time
+while the observed screen keeps matching; the first mismatch invalidates the
+entry and hands over to the live planner.
+
+Stored in SQLite with a TTL and an LRU size bound. Entries hold the
+instruction and the raw action code, including typed text, in plaintext, so
+PLAN_CACHE defaults to off.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+from backend.services.imaging import hamming
+from backend.services.sandbox import REPO_ROOT
+from backend.services.trajectories import normalise_instruction, screen_signature
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_PATH = Path(os.getenv("PLAN_CACHE_PATH") or REPO_ROOT / "data" / "plan_cache.sqlite3")
+
+_LITERAL = re.compile(r"[\"'“‘][^\"'”’]+[\"'”’]|\S*[\d./@:]\S*")
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def literals(text: str) -> set[str]:
+    """Tokens that change the meaning of a task if they differ (numbers, URLs, paths, quoted text)."""
+    return {m.group(0).strip(".,;:!?()") for m in _LITERAL.finditer(text)}
+
+
+def similarity(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class CachedPlan:
+    """Cursor over one cache entry for the current run."""
+
+    def __init__(self, cache: "PlanCache", key: str, steps: list[dict], score: float):
+        self.cache = cache
+        self.key = key
+        self.steps = steps
+        self.score = score
+        self.cursor = 0
+
+    def next_actions(self, screenshot: bytes) -> list[str] | None:
+        """Cached actions for this step, or None (and invalidate) if the screen diverged."""
+        if self.cursor >= len(self.steps):
+            return None
+        step = self.steps[self.cursor]
+        observed = screen_signature(screenshot)
+        if observed is None or hamming(int(step["screen"], 16), int(observed, 16)) > self.cache.max_distance:
+            logger.info(f"Plan cache entry diverged at step {self.cursor + 1}, invalidating")
+            self.cache.invalidate(self.key)
+            self.steps = []
+            return None
+        self.cursor += 1
+        return list(step["actions"])
+
+
+class PlanCache:
+    """SQLite-backed, TTL- and size-bounded plan cache shared by all sessions."""
+
+    def __init__(self, path: Path = PLAN_CACHE_PATH, ttl: float = 7 * 86400, max_entries: int = 2000,
+                 max_steps: int = 5, min_similarity: float = 0.9, max_distance: int = 12):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_steps = max_steps
+        self.min_similarity = min_similarity
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS plans (
+                key TEXT PRIMARY KEY,
+                instruction TEXT NOT NULL,
+                screen TEXT NOT NULL,
+                steps TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )""")
+        self.db.commit()
+
+    def lookup(self, instruction: str, screenshot: bytes) -> CachedPlan | None:
+        """Closest fresh entry for a similar instruction started from the same screen."""
+        observed = screen_signature(screenshot)
+        if observed is None:
+            return None
+        norm = normalise_instruction(instruction)
+        grams, lits = trigrams(norm), literals(norm)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT key, screen, steps FROM plans WHERE created >= ?", (time.time() - self.ttl,)
+            ).fetchall()
+            best = None
+            for key, screen, steps in rows:
+                if literals(key) != lits or hamming(int(screen, 16), int(observed, 16)) > self.max_distance:
+                    continue
+                score = similarity(grams, trigrams(key))
+                if score >= self.min_similarity and (best is None or score > best[0]):
+                    best = (score, key, steps)
+            if best is None:
+                return None
+            self.db.execute("UPDATE plans SET hits = hits + 1, last_used = ? WHERE key = ?", (time.time(), best[1]))
+            self.db.commit()
+        return CachedPlan(self, best[1], json.loads(best[2]), best[0])
+
+    def store(self, instruction: str, steps: list[tuple[str, list[str]]]):
+        """Store the first planner outputs of a successful run as (screen signature, actions) pairs."""
+        steps = [{"screen": screen, "actions": actions} for screen, actions in steps[:self.max_steps] if screen]
+        if not steps:
+            return
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO plans (key, instruction, screen, steps, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (normalise_instruction(instruction), instruction, steps[0]["screen"], json.dumps(steps), now, now),
+            )
+            self._prune(now)
+            self.db.commit()
+
+    def invalidate(self, key: str):
+        with self.lock:
+            self.db.execute("DELETE FROM plans WHERE key = ?", (key,))
+            self.db.commit()
+
+    def _prune(self, now: float):
+        self.db.execute("DELETE FROM plans WHERE created < ?", (now - self.ttl,))
+        self.db.execute(
+            "DELETE FROM plans WHERE key NOT IN (SELECT key FROM plans ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries, hits = self.db.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM plans").fetchone()
+        return {"entries": entries, "hits": hits, "path": str(self.path)}
+
+
+_plan_cache: PlanCache | None = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache | None:
+    """Shared cache, or None when PLAN_CACHE is disabled or the store cannot be opened."""
+    global _plan_cache
+    if os.getenv("PLAN_CACHE", "0").lower() not in ("1", "true", "yes"):
+        return None
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            try:
+                _plan_cache = PlanCache(
+                    ttl=float(os.getenv("PLAN_CACHE_TTL_SECONDS", 7 * 86400)),
+                    max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", 2000)),
+                    max_steps=int(os.getenv("PLAN_CACHE_STEPS", 5)),
+                    min_similarity=float(os.getenv("PLAN_CACHE_MIN_SIMILARITY", 0.9)),
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Plan cache disabled: {e}")
+                return None
+        return _plan_cache
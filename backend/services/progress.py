@@ -0,0 +1,193 @@
+"""
+Progress Monitor - Detect stuck runs (action loops, no-progress streaks) and stop them early.
+
+Before each planner call the monitor records the transition of the last step:
+the screen before it (a dHash), a fingerprint of the actions executed and
+whether the screen changed afterwards. Two patterns count as a stall:
+
+- cycle: the same (screen, actions) pattern repeats. A period-1 loop (the same
+  click on an unchanged screen) needs STALL_REPEATS occurrences; longer
+  periods up to STALL_MAX_PERIOD need two full cycles.
+- no_progress: STALL_NO_PROGRESS consecutive steps executed actions without
+  changing the screen. Steps that type or press keys do not count: a few
+  typed characters or a moved caret are below the hash's resolution.
+
+Keyboard steps only match each other in a cycle when the screen hash is
+identical, and only pointer coordinates are snapped in the fingerprint, so
+typed strings such as '1234' are compared verbatim.
+
+Interventions escalate: the first stall injects corrective feedback into the
+planner prompt, the next one also moves the step to the strong planner tier
+(when the cascade is on), and a stall after STALL_MAX_INTERVENTIONS ends the
+run with status "stalled". Aborted runs report the steps and (estimated)
+tokens the remaining step budget would have burned.
+
+STALL_DETECTION=0 disables the monitor.
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass
+
+from backend.services.imaging import dhash, hamming
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 16
+_IDLE_ACTIONS = {"WAIT", "DONE", "FAIL", "SCREENSHOT"}
+# Pointer calls and the positional arguments that are screen coordinates
+_POINTER_CALL = re.compile(r"\b(click|doubleClick|tripleClick|rightClick|middleClick|moveTo|dragTo|mouseDown|mouseUp"
+                           r"|scroll|hscroll|vscroll)\(([^()]*)\)")
+_SCROLL_CALLS = {"scroll", "hscroll", "vscroll"}
+_COORDINATE = re.compile(r"^(\s*(?:[xy]\s*=\s*)?)(\d+)(\s*)$")
+_KEYBOARD_CALL = re.compile(r"\b(write|typewrite|type|press|hotkey|keyDown|keyUp)\(")
+
+
+def _snap_coordinates(match: re.Match) -> str:
+    name, args = match.group(1), match.group(2).split(",")
+    positions = (1, 2) if name in _SCROLL_CALLS else (0, 1)
+    for i, arg in enumerate(args):
+        if i in positions or re.match(r"\s*[xy]\s*=", arg):
+            args[i] = _COORDINATE.sub(lambda m: f"{m.group(1)}{int(m.group(2)) // 20 * 20}{m.group(3)}", arg)
+    return f"{name}({','.join(args)})"
+
+
+def action_fingerprint(actions: list[str] | None) -> str:
+    """Actions with whitespace collapsed and pointer coordinates snapped to a 20px grid (grounding jitter)."""
+    parts = []
+    for action in actions or ():
+        code = re.sub(r"\s+", " ", str(action).replace("```python", "").replace("```", "")).strip()
+        parts.append(_POINTER_CALL.sub(_snap_coordinates, code))
+    return " | ".join(parts)
+
+
+def is_keyboard(actions: list[str]) -> bool:
+    """The step types text or presses keys; its effect (a few characters, a caret) may be invisible to the dHash."""
+    return any(_KEYBOARD_CALL.search(str(action)) for action in actions)
+
+
+@dataclass
+class Stall:
+    kind: str  # "cycle" | "no_progress"
+    detail: str
+    intervention: str  # "feedback" | "escalate" | "abort"
+    step: int
+
+    @property
+    def feedback(self) -> str:
+        if self.kind == "cycle":
+            problem = f"You are repeating the same action(s) without effect ({self.detail})."
+        else:
+            problem = f"Your last {self.detail} steps did not change the screen."
+        return (f"WARNING: {problem} This approach is not working. Do not repeat it: try a different "
+                "element, a keyboard shortcut, scrolling, or closing a dialog. If the task cannot be "
+                "completed, answer FAIL.")
+
+    def to_dict(self) -> dict:
+        return {"step": self.step, "kind": self.kind, "detail": self.detail, "intervention": self.intervention}
+
+
+class ProgressMonitor:
+    """Per-run loop and no-progress detector with an escalating intervention ladder."""
+
+    def __init__(self, enabled: bool = True, repeats: int = 3, no_progress: int = 4, max_period: int = 3,
+                 screen_distance: int = 6, max_interventions: int = 2):
+        self.enabled = enabled
+        self.repeats = max(2, repeats)
+        self.no_progress = no_progress
+        self.max_period = max(1, max_period)
+        self.screen_distance = screen_distance
+        self.max_interventions = max_interventions
+        self.reset()
+
+    @classmethod
+    def from_env(cls) -> "ProgressMonitor":
+        return cls(
+            enabled=os.getenv("STALL_DETECTION", "1").lower() in ("1", "true", "yes"),
+            repeats=int(os.getenv("STALL_REPEATS", 3)),
+            no_progress=int(os.getenv("STALL_NO_PROGRESS", 4)),
+            max_period=int(os.getenv("STALL_MAX_PERIOD", 3)),
+            screen_distance=int(os.getenv("STALL_SCREEN_DISTANCE", 6)),
+            max_interventions=int(os.getenv("STALL_MAX_INTERVENTIONS", 2)),
+        )
+
+    def reset(self):
+        self.history: list[tuple[int | None, str, bool]] = []  # (screen before, actions, keyboard) per step
+        self.last_screen: int | None = None
+        self.still_streak = 0
+        self.stalls: list[Stall] = []
+
+    def _same_screen(self, a: int | None, b: int | None) -> bool:
+        return a is not None and b is not None and hamming(a, b) <= self.screen_distance
+
+    def _same_step(self, a: tuple[int | None, str, bool], b: tuple[int | None, str, bool]) -> bool:
+        if a[1] != b[1]:
+            return False
+        return a[0] == b[0] if a[2] else self._same_screen(a[0], b[0])
+
+    def _cycle(self) -> tuple[int, int] | None:
+        """(period, repetitions) of a loop at the end of the history."""
+        for period in range(1, self.max_period + 1):
+            span = period * (self.repeats if period == 1 else 2)
+            if len(self.history) < span:
+                continue
+            tail = self.history[-span:]
+            if all(self._same_step(tail[i], tail[i - period]) for i in range(period, span)):
+                return period, span // period
+        return None
+
+    def observe(self, screenshot: bytes | None, actions: list[str] | None, step: int) -> Stall | None:
+        """
+        Record the last step (`actions`, executed on the previous screen) given the screen
+        now visible; returns the stall and chosen intervention when one is detected.
+        """
+        if not self.enabled:
+            return None
+        screen = dhash(screenshot, HASH_SIZE) if screenshot else None
+        previous, self.last_screen = self.last_screen, screen
+        executed = [a for a in actions or () if str(a).strip().upper() not in _IDLE_ACTIONS]
+        if previous is None or not executed:
+            return None
+
+        keyboard = is_keyboard(executed)
+        self.history.append((previous, action_fingerprint(executed), keyboard))
+        if not self._same_screen(previous, screen):
+            self.still_streak = 0
+        elif not keyboard:
+            self.still_streak += 1
+
+        kind, detail = None, None
+        cycle = self._cycle()
+        if cycle:
+            period, count = cycle
+            shown = "; ".join(str(a).strip() for a in executed)
+            shown = shown if len(shown) <= 80 else shown[:77] + "..."
+            kind, detail = "cycle", f"{count}x {shown}" if period == 1 else f"{count}x a {period}-step cycle"
+        elif self.no_progress and self.still_streak >= self.no_progress:
+            kind, detail = "no_progress", str(self.still_streak)
+        if kind is None:
+            return None
+
+        ladder = ("feedback", "escalate")
+        index = len(self.stalls)
+        intervention = "abort" if index >= self.max_interventions else ladder[min(index, len(ladder) - 1)]
+        stall = Stall(kind, detail, intervention, step)
+        self.stalls.append(stall)
+        # The next detection needs fresh evidence gathered after this intervention
+        self.history.clear()
+        self.still_streak = 0
+        metrics.inc("stall_detections_total", kind=kind, intervention=intervention)
+        logger.warning(f"Stall at step {step}: {kind} ({detail}) -> {intervention}")
+        return stall
+
+    def report(self, aborted_at: int | None, max_steps: int, tokens_per_step: float) -> dict:
+        """Detections, interventions and what an early abort saved against the step budget."""
+        steps_saved = max(0, max_steps - aborted_at) if aborted_at is not None else 0
+        return {
+            "detections": [s.to_dict() for s in self.stalls],
+            "aborted": aborted_at is not None,
+            "steps_saved": steps_saved,
+            "tokens_saved_est": round(steps_saved * tokens_per_step),
+        }
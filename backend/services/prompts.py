@@ -0,0 +1,77 @@
+"""
+Prompt Assembly - Planner instruction: static MISSION block on the first step, per-step dynamic tail.
+
+AgentS3 embeds the instruction we pass in its own prompt template, so nothing
+we build here reaches the provider as a byte-identical prompt prefix and no
+prefix caching is relied on. To keep per-call tokens down, the MISSION block
+is only sent on a run's first step (AgentS3 keeps it in its trajectory); later
+steps carry the task, the user-image note and previous-action feedback only.
+Whatever the providers cache implicitly (AgentS3's own static system prompt)
+is still reported through the cached-token counters.
+"""
+
+import hashlib
+from dataclasses import dataclass
+
+# --- Static instructions (never interpolate per-run values into these) ---
+SYSTEM_PREFIX = (
+    "# MISSION & IDENTITY\n"
+    "You are an advanced autonomous AI agent capable of controlling a computer to accomplish complex tasks. "
+    "Your goal is to complete the user's request efficiently and accurately. \n"
+    "IMPORTANT: You are in a restricted environment.\n"
+    "1. OUTPUT RAW PYTHON CODE ONLY. DO NOT USE MARKDOWN.\n"
+    "2. Standard Agent S3 format is allowed (imports will be handled): \n"
+    "   - `import pyautogui; pyautogui.click(x, y)`\n"
+    "   - `import pyautogui; pyautogui.typewrite('text')`\n"
+    "   - `agent.launch('firefox')` or `pyautogui.launch('firefox')`\n"
+    "3. DO NOT use `computer.wait()`. Use `import time; time.sleep(seconds)`.\n"
+    "Start by launching Firefox: `agent.launch('firefox')`"
+)
+
+TASK_HEADER = "\n\n# TASK\n"
+USER_IMAGE_NOTE = "[USER PROVIDED AN IMAGE/SCREENSHOT AS CONTEXT]\n\n"
+FEEDBACK_HEADER = "\n\n[SYSTEM FEEDBACK FROM PREVIOUS ACTION]:\n"
+ELEMENTS_HEADER = "\n\n[ACCESSIBILITY TREE]:\n"
+
+# Providers that cache prompt prefixes implicitly (no explicit breakpoint API on
+# their OpenAI-compatible endpoints); only AgentS3's own static template benefits.
+# Fireworks additionally routes requests that share a session-affinity key to the
+# same replica, which keeps its cache warm.
+IMPLICIT_CACHE_PROVIDERS = {"google", "openai", "fireworks"}
+CACHE_AFFINITY_HEADERS = {"api.fireworks.ai": "x-session-affinity"}
+
+
+@dataclass
+class AssembledPrompt:
+    """A planner instruction: static MISSION block (first step only) and per-step tail."""
+    prefix: str
+    tail: str
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.tail
+
+
+class PromptAssembler:
+    """Builds planner instructions; the static MISSION block is only sent on the first step."""
+
+    def __init__(self, provider: str, prefix: str = SYSTEM_PREFIX):
+        self.provider = provider
+        self.prefix = prefix
+        self.prefix_hash = hashlib.sha256(prefix.encode()).hexdigest()[:16]
+
+    @property
+    def cache_mode(self) -> str:
+        return "implicit" if self.provider in IMPLICIT_CACHE_PROVIDERS else "none"
+
+    def build(self, instruction: str, user_image: bool = False, feedback: str | None = None,
+              elements: str | None = None, first_step: bool = True) -> AssembledPrompt:
+        tail = TASK_HEADER
+        if user_image:
+            tail += USER_IMAGE_NOTE
+        tail += instruction
+        if feedback:
+            tail += FEEDBACK_HEADER + feedback
+        if elements:
+            tail += ELEMENTS_HEADER + elements
+        return AssembledPrompt(self.prefix if first_step else "", tail)
@@ -0,0 +1,322 @@
+"""
+Run Recording - Audit trail of every run (frames and action timeline), written off the hot path.
+
+The agent loop only hands the latest screenshot (already-encoded PNG bytes,
+no copy) to a bounded queue. When the queue is full the frame is dropped,
+so the agent never waits on the encoder. A worker thread encodes frames
+into a compact container in `RECORDING_DIR/<run_id>/`:
+
+    frames.bin  concatenated images. A keyframe is the full frame (every
+                RECORDING_KEYFRAME_INTERVAL frames or on a resize). A delta
+                is only the changed tiles (RECORDING_TILE px), packed side by
+                side into one strip. Unchanged frames store no bytes.
+    index.json  frame table (time, step, type, byte range, tile positions),
+                the action timeline (plans, executed actions, errors) and stats.
+
+Recording is off by default (RECORDING=1 enables it). Before each new
+recording, runs older than RECORDING_RETENTION_DAYS are deleted, then the
+oldest ones until the directory fits in RECORDING_MAX_MB.
+
+WebP is used when PIL supports it, otherwise PNG. `python -m
+backend.services.recording <dir> --export run.mp4` rebuilds the frames and
+pipes them to ffmpeg when it is installed.
+"""
+
+import os
+import io
+import json
+import time
+import queue
+import shutil
+import logging
+import threading
+import subprocess
+from pathlib import Path
+
+from backend.services.metrics import metrics
+from backend.services.sandbox import REPO_ROOT
+
+logger = logging.getLogger(__name__)
+
+RECORDING_DIR = Path(os.getenv("RECORDING_DIR") or REPO_ROOT / "data" / "recordings")
+
+_END = object()
+
+
+def _image_format() -> str:
+    from PIL import features
+    return "WEBP" if features.check("webp") else "PNG"
+
+
+def _encode(image, fmt: str) -> bytes:
+    out = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(out, format="WEBP", quality=80, method=4)
+    else:
+        image.save(out, format="PNG", compress_level=6)
+    return out.getvalue()
+
+
+def prune_recordings(directory: Path = RECORDING_DIR, retention: float = 7 * 86400, max_bytes: int = 0) -> int:
+    """Delete recordings older than `retention` seconds, then the oldest until the rest fit in `max_bytes`."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return 0
+    runs = []
+    for run_dir in directory.iterdir():
+        if run_dir.is_dir():
+            files = [f.stat() for f in run_dir.iterdir() if f.is_file()]
+            runs.append((max([f.st_mtime for f in files], default=run_dir.stat().st_mtime),
+                         sum(f.st_size for f in files), run_dir))
+    runs.sort()
+    total = sum(size for _, size, _ in runs)
+    now, removed = time.time(), 0
+    for modified, size, run_dir in runs:
+        if now - modified <= retention and (not max_bytes or total <= max_bytes):
+            break
+        shutil.rmtree(run_dir, ignore_errors=True)
+        total -= size
+        removed += 1
+    if removed:
+        metrics.inc("recording_pruned_total", removed)
+        logger.info(f"Pruned {removed} old recording(s) from {directory}")
+    return removed
+
+
+class RunRecording:
+    """Recorder for one run: non-blocking capture on the agent thread, encoding on a worker."""
+
+    def __init__(self, run_id: str, directory: Path = RECORDING_DIR, queue_size: int = 16, tile: int = 64,
+                 keyframe_interval: int = 30):
+        self.run_id = run_id
+        self.dir = Path(directory) / run_id
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.tile = tile
+        self.keyframe_interval = keyframe_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.events: list[dict] = []
+        self.frames: list[dict] = []
+        self.dropped = 0
+        self.bytes_written = 0
+        self.overhead_seconds = 0.0
+        self.steps = 0
+        self.closed = False
+        self.worker = threading.Thread(target=self._encode_loop, name=f"recording-{run_id}", daemon=True)
+        self.worker.start()
+
+    @classmethod
+    def from_env(cls, run_id: str) -> "RunRecording | None":
+        """Recorder for `run_id`, or None when RECORDING is off or the directory is unusable."""
+        if os.getenv("RECORDING", "0").lower() not in ("1", "true", "yes"):
+            return None
+        try:
+            prune_recordings(
+                retention=float(os.getenv("RECORDING_RETENTION_DAYS", 7)) * 86400,
+                max_bytes=int(float(os.getenv("RECORDING_MAX_MB", 2048)) * 1024 * 1024),
+            )
+            return cls(
+                run_id,
+                queue_size=int(os.getenv("RECORDING_QUEUE", 16)),
+                tile=int(os.getenv("RECORDING_TILE", 64)),
+                keyframe_interval=int(os.getenv("RECORDING_KEYFRAME_INTERVAL", 30)),
+            )
+        except OSError as e:
+            logger.warning(f"Run recording disabled: {e}")
+            return None
+
+    # --- Agent thread (must stay cheap) ---
+    def frame(self, png: bytes | None, step: int):
+        """Queue a screenshot for encoding; dropped (never blocks) when the encoder is behind."""
+        if not png or self.closed:
+            return
+        start = time.perf_counter()
+        try:
+            self.queue.put_nowait((time.time() - self.started, step, png))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            metrics.inc("recording_frames_dropped_total")
+        self._account(start, step)
+
+    def event(self, kind: str, step: int, **data):
+        """Append an entry to the action timeline."""
+        start = time.perf_counter()
+        with self.lock:
+            self.events.append({"t": round(time.time() - self.started, 3), "step": step, "kind": kind, **data})
+        self._account(start, step)
+
+    def _account(self, start: float, step: int):
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.overhead_seconds += elapsed
+            self.steps = max(self.steps, step)
+        metrics.observe("recording_overhead_seconds", elapsed)
+
+    def close(self):
+        """Stop accepting frames; the worker drains the queue and writes the index (non-blocking)."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put_nowait(_END)
+        except queue.Full:
+            pass  # the worker notices `closed` once the queue runs empty
+
+    def report(self) -> dict:
+        with self.lock:
+            encoded = len(self.frames)
+            return {
+                "dir": str(self.dir),
+                "frames": encoded,
+                "keyframes": sum(1 for f in self.frames if f["type"] == "key"),
+                "dropped": self.dropped,
+                "bytes": self.bytes_written,
+                "bytes_per_frame": round(self.bytes_written / encoded) if encoded else 0,
+                "overhead_ms_per_step": round(self.overhead_seconds * 1000 / max(1, self.steps), 3),
+            }
+
+    # --- Worker thread ---
+    def _encode_loop(self):
+        try:
+            from PIL import Image, ImageChops
+            fmt = _image_format()
+        except ImportError as e:
+            logger.warning(f"Run recording disabled: {e}")
+            self.closed = True
+            return
+        previous = None
+        since_key = 0
+        with open(self.dir / "frames.bin", "ab") as out:
+            while True:
+                try:
+                    item = self.queue.get(timeout=1.0)
+                except queue.Empty:
+                    if self.closed:
+                        break
+                    continue
+                if item is _END:
+                    break
+                t, step, png = item
+                start = time.perf_counter()
+                try:
+                    with Image.open(io.BytesIO(png)) as img:
+                        current = img.convert("RGB")
+                    entry, payload = {"t": round(t, 3), "step": step}, b""
+                    if previous is None or previous.size != current.size or since_key >= self.keyframe_interval:
+                        entry["type"], payload, since_key = "key", _encode(current, fmt), 0
+                    else:
+                        tiles = self._changed_tiles(ImageChops.difference(previous, current))
+                        if tiles:
+                            strip = Image.new("RGB", (len(tiles) * self.tile, self.tile))
+                            for i, (col, row) in enumerate(tiles):
+                                box = (col * self.tile, row * self.tile, (col + 1) * self.tile, (row + 1) * self.tile)
+                                strip.paste(current.crop(box), (i * self.tile, 0))
+                            entry["type"], entry["tiles"], payload = "delta", tiles, _encode(strip, fmt)
+                        else:
+                            entry["type"] = "same"
+                        since_key += 1
+                    entry["offset"], entry["length"] = out.tell(), len(payload)
+                    out.write(payload)
+                    previous = current
+                    with self.lock:
+                        self.frames.append(entry)
+                        self.bytes_written += len(payload)
+                    metrics.observe("recording_encode_seconds", time.perf_counter() - start, type=entry["type"])
+                except Exception as e:
+                    logger.warning(f"Recording {self.run_id}: could not encode frame: {e}")
+        self._write_index(fmt, previous.size if previous is not None else None)
+
+    def _changed_tiles(self, diff) -> list[list[int]]:
+        bbox = diff.getbbox()
+        if bbox is None:
+            return []
+        tiles = []
+        for row in range(bbox[1] // self.tile, (bbox[3] - 1) // self.tile + 1):
+            for col in range(bbox[0] // self.tile, (bbox[2] - 1) // self.tile + 1):
+                box = (col * self.tile, row * self.tile, (col + 1) * self.tile, (row + 1) * self.tile)
+                if diff.crop(box).getbbox():
+                    tiles.append([col, row])
+        return tiles
+
+    def _write_index(self, fmt: str, size):
+        report = self.report()
+        with self.lock:
+            index = {
+                "run_id": self.run_id,
+                "started": self.started,
+                "format": fmt,
+                "tile": self.tile,
+                "size": list(size) if size else None,
+                "frames": self.frames,
+                "events": self.events,
+                "stats": report,
+            }
+        (self.dir / "index.json").write_text(json.dumps(index))
+        metrics.observe("recording_bytes", report["bytes"])
+        logger.info(f"Recording {self.run_id}: {report['frames']} frames ({report['dropped']} dropped), "
+                    f"{report['bytes'] / 1024:.0f} KiB, {report['overhead_ms_per_step']} ms/step overhead")
+
+
+def iter_frames(run_dir: str | Path):
+    """Rebuild (t, step, PIL.Image) for every recorded frame of a run."""
+    from PIL import Image
+    run_dir = Path(run_dir)
+    index = json.loads((run_dir / "index.json").read_text())
+    tile = index["tile"]
+    current = None
+    with open(run_dir / "frames.bin", "rb") as data:
+        for entry in index["frames"]:
+            data.seek(entry["offset"])
+            payload = data.read(entry["length"])
+            if entry["type"] == "key":
+                with Image.open(io.BytesIO(payload)) as img:
+                    current = img.convert("RGB")
+            elif entry["type"] == "delta" and current is not None:
+                current = current.copy()
+                with Image.open(io.BytesIO(payload)) as strip:
+                    for i, (col, row) in enumerate(entry["tiles"]):
+                        patch = strip.crop((i * tile, 0, (i + 1) * tile, tile))
+                        current.paste(patch, (col * tile, row * tile))
+            if current is not None:
+                yield entry["t"], entry["step"], current
+
+
+def export_video(run_dir: str | Path, output: str, fps: int = 2) -> bool:
+    """Re-encode a recording as a constant-frame-rate video with ffmpeg (False if unavailable)."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        logger.error("ffmpeg not found on PATH")
+        return False
+    frames = list(iter_frames(run_dir))
+    if not frames:
+        return False
+    width, height = frames[0][2].size
+    proc = subprocess.Popen([ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                             "-s", f"{width}x{height}", "-r", str(fps), "-i", "-", "-pix_fmt", "yuv420p", output],
+                            stdin=subprocess.PIPE)
+    for i, (t, _, image) in enumerate(frames):
+        until = frames[i + 1][0] if i + 1 < len(frames) else t + 1.0 / fps
+        for _ in range(max(1, round((until - t) * fps))):
+            proc.stdin.write(image.resize((width, height)).tobytes())
+    proc.stdin.close()
+    return proc.wait() == 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or export a run recording.")
+    parser.add_argument("run_dir", help="RECORDING_DIR/<run_id>")
+    parser.add_argument("--export", help="Write a video (e.g. run.mp4 / run.webm) via ffmpeg")
+    parser.add_argument("--fps", type=int, default=2)
+    args = parser.parse_args()
+
+    if args.export:
+        raise SystemExit(0 if export_video(args.run_dir, args.export, args.fps) else 1)
+    info = json.loads((Path(args.run_dir) / "index.json").read_text())
+    print(json.dumps(info["stats"], indent=2))
+    for event in info["events"]:
+        print(f"{event['t']:8.2f}s  step {event['step']:3d}  {event['kind']:8s}  "
+              f"{json.dumps({k: v for k, v in event.items() if k not in ('t', 'step', 'kind')})}")
@@ -0,0 +1,252 @@
+"""
+Grounding Replicas - Least-outstanding-requests routing across UI-TARS vLLM instances.
+
+Replicas are health-checked by probing the OpenAI-compatible `/models` endpoint.
+Failing replicas and replicas much slower than their peers are ejected for a
+cool-down period and re-admitted once a probe succeeds again.
+"""
+
+import os
+import time
+import json
+import logging
+import threading
+import urllib.request
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    """Routing and latency state for one grounding endpoint."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ewma_latency = None  # seconds
+        self.last_latency = None
+        self.probe_latency = None
+        self.healthy = True
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def record(self, latency: float, ok: bool, alpha: float = 0.2):
+        self.requests += 1
+        self.last_latency = latency
+        if ok:
+            self.consecutive_failures = 0
+            self.ewma_latency = latency if self.ewma_latency is None else (
+                alpha * latency + (1 - alpha) * self.ewma_latency)
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ejected": time.monotonic() < self.ejected_until,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+            "probe_latency_ms": round(self.probe_latency * 1000, 1) if self.probe_latency is not None else None,
+        }
+
+
+class ReplicaPool:
+    """Thread-safe pool of grounding replicas with background health checks."""
+
+    def __init__(self, urls: list[str], probe_interval: float = 10.0, eject_seconds: float = 30.0,
+                 failure_threshold: int = 3, slow_factor: float = 3.0, api_key: str = "empty"):
+        self.replicas = [Replica(u) for u in urls]
+        self.probe_interval = probe_interval
+        self.eject_seconds = eject_seconds
+        self.failure_threshold = failure_threshold
+        self.slow_factor = slow_factor
+        self.api_key = api_key
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if len(self.replicas) > 1 and probe_interval > 0:
+            self._thread = threading.Thread(target=self._probe_loop, name="replica-health", daemon=True)
+            self._thread.start()
+
+    # --- Routing ---
+    def ranked(self) -> list[Replica]:
+        """Available replicas ordered by outstanding requests, then latency."""
+        now = time.monotonic()
+        with self.lock:
+            candidates = [r for r in self.replicas if r.available(now)]
+            if not candidates:
+                # Everything ejected: fail open rather than refusing all grounding
+                candidates = list(self.replicas)
+            return sorted(candidates, key=lambda r: (r.outstanding, r.ewma_latency or 0.0))
+
+    def acquire(self, exclude: Replica | None = None) -> Replica:
+        candidates = [r for r in self.ranked() if r is not exclude]
+        if not candidates:
+            candidates = [r for r in self.replicas if r is not exclude]
+        if not candidates:
+            raise RuntimeError("No grounding replica available")
+        replica = candidates[0]
+        with self.lock:
+            replica.outstanding += 1
+        return replica
+
+    def release(self, replica: Replica, latency: float, ok: bool):
+        with self.lock:
+            replica.outstanding = max(0, replica.outstanding - 1)
+            replica.record(latency, ok)
+            if replica.consecutive_failures >= self.failure_threshold:
+                self._eject(replica, f"{replica.consecutive_failures} consecutive failures")
+            elif ok and self._is_slow(replica):
+                self._eject(replica, f"ewma latency {replica.ewma_latency * 1000:.0f}ms")
+
+    def _is_slow(self, replica: Replica) -> bool:
+        peers = [r.ewma_latency for r in self.replicas
+                 if r is not replica and r.ewma_latency is not None and r.available(time.monotonic())]
+        if not peers or replica.ewma_latency is None or replica.requests < 5:
+            return False
+        return replica.ewma_latency > self.slow_factor * (sum(peers) / len(peers))
+
+    def _eject(self, replica: Replica, reason: str):
+        replica.ejected_until = time.monotonic() + self.eject_seconds
+        logger.warning(f"Ejecting grounding replica {replica.url} for {self.eject_seconds:.0f}s: {reason}")
+
+    # --- Health Checks ---
+    def probe(self, replica: Replica, timeout: float = 3.0) -> bool:
+        """Probe `{url}/models`; returns True if the replica answered with a model list."""
+        request = urllib.request.Request(f"{replica.url}/models",
+                                         headers={"Authorization": f"Bearer {self.api_key}"})
+        start = time.monotonic()
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                ok = response.status == 200 and "data" in json.loads(response.read() or b"{}")
+        except Exception as e:
+            logger.debug(f"Probe failed for {replica.url}: {e}")
+            ok = False
+        with self.lock:
+            replica.probe_latency = time.monotonic() - start
+            if ok and not replica.healthy:
+                logger.info(f"Grounding replica {replica.url} is healthy again")
+            if ok and replica.ejected_until and time.monotonic() >= replica.ejected_until:
+                replica.ejected_until = 0.0
+                replica.consecutive_failures = 0
+            replica.healthy = ok
+        return ok
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            for replica in list(self.replicas):
+                self.probe(replica)
+
+    def stats(self) -> list[dict]:
+        with self.lock:
+            return [r.stats() for r in self.replicas]
+
+    def close(self):
+        self._stop.set()
+
+
+_pools: dict[tuple, ReplicaPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_replica_pool(urls: list[str]) -> ReplicaPool:
+    """Return the shared pool for a set of replica URLs (one health checker per set)."""
+    key = tuple(u.rstrip("/") for u in urls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ReplicaPool(
+                list(key),
+                probe_interval=float(os.getenv("VISION_PROBE_INTERVAL", 10)),
+                eject_seconds=float(os.getenv("VISION_EJECT_SECONDS", 30)),
+                failure_threshold=int(os.getenv("VISION_FAILURE_THRESHOLD", 3)),
+                slow_factor=float(os.getenv("VISION_SLOW_FACTOR", 3.0)),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def all_replica_stats() -> dict[str, list[dict]]:
+    """Stats for every pool, keyed by the primary replica URL."""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {key[0]: pool.stats() for key, pool in pools}
+
+
+def _replica_samples():
+    for stats in all_replica_stats().values():
+        for replica in stats:
+            labels = {"replica": replica["url"]}
+            yield "grounding_replica_outstanding", labels, replica["outstanding"]
+            yield "grounding_replica_requests", labels, replica["requests"]
+            yield "grounding_replica_failures", labels, replica["failures"]
+            yield "grounding_replica_healthy", labels, int(replica["healthy"] and not replica["ejected"])
+            yield "grounding_replica_ewma_latency_ms", labels, replica["ewma_latency_ms"]
+
+
+metrics.register_collector(_replica_samples)
+
+
+def serve_stub(port: int, delay: float = 0.0, fail_rate: float = 0.0):
+    """
+    Minimal OpenAI-compatible stub (`/v1/models`, `/v1/chat/completions`) for
+    exercising routing and ejection locally without a GPU.
+    """
+    import random
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._reply(200, {"object": "list", "data": [{"id": "stub-ui-tars", "object": "model"}]})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay)
+            if random.random() < fail_rate:
+                self._reply(503, {"error": "stub failure"})
+                return
+            self._reply(200, {
+                "id": "stub", "object": "chat.completion", "model": "stub-ui-tars",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "(960,540)"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Stub grounding replica on http://localhost:{port}/v1 (delay={delay}s, fail_rate={fail_rate})")
+    ThreadingHTTPServer(("0.0.0.0", port), StubHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a stub UI-TARS replica for load-balancer testing.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    serve_stub(args.port, args.delay, args.fail_rate)
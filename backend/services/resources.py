@@ -0,0 +1,127 @@
+"""
+Resource Accounting - Container stats sampling and per-run quotas.
+
+A ResourceMonitor samples `docker stats` for a leased sandbox in the
+background; RunQuota bounds each run by steps, tokens, wall time and sandbox
+memory. Violations stop the run with status "quota" and a clear reason.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import subprocess
+from dataclasses import dataclass, asdict
+
+from backend.services.metrics import metrics
+from backend.services.sandbox import _parse_size
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunQuota:
+    """Per-run limits; 0 disables a limit (except max_steps)."""
+    max_steps: int = 50
+    max_tokens: int = 0
+    max_wall_seconds: float = 0.0
+    max_memory_mb: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "RunQuota":
+        return cls(
+            max_steps=int(os.getenv("RUN_MAX_STEPS", cls.max_steps)),
+            max_tokens=int(os.getenv("RUN_MAX_TOKENS", cls.max_tokens)),
+            max_wall_seconds=float(os.getenv("RUN_MAX_WALL_SECONDS", cls.max_wall_seconds)),
+            max_memory_mb=float(os.getenv("SANDBOX_MAX_MEMORY_MB", cls.max_memory_mb)),
+        )
+
+    def violation(self, steps: int, tokens: int, wall_seconds: float, memory_mb: float | None) -> str | None:
+        """Return a human-readable reason if any limit is exceeded."""
+        if steps >= self.max_steps:
+            return f"step limit reached ({steps}/{self.max_steps})"
+        if self.max_tokens and tokens >= self.max_tokens:
+            return f"token limit reached ({tokens}/{self.max_tokens})"
+        if self.max_wall_seconds and wall_seconds >= self.max_wall_seconds:
+            return f"wall time limit reached ({wall_seconds:.0f}s/{self.max_wall_seconds:.0f}s)"
+        if self.max_memory_mb and memory_mb is not None and memory_mb >= self.max_memory_mb:
+            return f"sandbox memory limit reached ({memory_mb:.0f}/{self.max_memory_mb:.0f} MiB)"
+        return None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class ResourceMonitor:
+    """Samples CPU and memory of one sandbox container every `interval` seconds."""
+
+    def __init__(self, container_name: str, interval: float = 5.0):
+        self.container_name = container_name
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.latest: dict | None = None
+        self.peak_memory_mb = 0.0
+        self.peak_cpu_percent = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name=f"stats-{self.container_name}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def sample(self) -> dict | None:
+        """Take one `docker stats` sample and update gauges."""
+        try:
+            result = subprocess.run(
+                ["docker", "stats", "--no-stream", "--format", "{{json .}}", self.container_name],
+                capture_output=True, text=True, timeout=15
+            )
+            raw = json.loads(result.stdout.strip().splitlines()[0])
+        except Exception as e:
+            logger.debug(f"docker stats failed for {self.container_name}: {e}")
+            return None
+
+        used, _, limit = raw.get("MemUsage", "0B / 0B").partition("/")
+        sample = {
+            "cpu_percent": float(raw.get("CPUPerc", "0%").rstrip("%") or 0),
+            "memory_mb": round(_parse_size(used), 1),
+            "memory_limit_mb": round(_parse_size(limit), 1),
+            "pids": int(raw.get("PIDs", 0) or 0),
+            "timestamp": time.time(),
+        }
+        with self.lock:
+            self.latest = sample
+            self.peak_memory_mb = max(self.peak_memory_mb, sample["memory_mb"])
+            self.peak_cpu_percent = max(self.peak_cpu_percent, sample["cpu_percent"])
+        metrics.set("sandbox_cpu_percent", sample["cpu_percent"], sandbox=self.container_name)
+        metrics.set("sandbox_memory_mb", sample["memory_mb"], sandbox=self.container_name)
+        return sample
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def reset_peaks(self):
+        with self.lock:
+            self.peak_memory_mb = self.latest["memory_mb"] if self.latest else 0.0
+            self.peak_cpu_percent = self.latest["cpu_percent"] if self.latest else 0.0
+
+    @property
+    def memory_mb(self) -> float | None:
+        with self.lock:
+            return self.latest["memory_mb"] if self.latest else None
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "sandbox": self.container_name,
+                "latest": dict(self.latest) if self.latest else None,
+                "peak_memory_mb": self.peak_memory_mb,
+                "peak_cpu_percent": self.peak_cpu_percent,
+            }
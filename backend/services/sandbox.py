@@ -0,0 +1,277 @@
+"""
+Sandbox Provisioning - Content-hashed desktop images and resource-limited containers.
+
+`docker compose up --build` on the request path could rebuild the whole desktop
+image on a user's first request, and depended on the backend's CWD. Images are
+now tagged with a hash of their Dockerfile, built once in the background when
+the hash changes, and containers are started directly with the profile's
+shm size and optional CPU/memory caps. Start and boot times are exported on `/metrics`.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+# Overridable when the backend itself runs in a container (paths are resolved by the host daemon)
+DOCKER_DIR = Path(os.getenv("SANDBOX_DOCKER_DIR", REPO_ROOT / "docker"))
+SCREENSHOTS_DIR = os.getenv("SANDBOX_SCREENSHOTS_DIR", str(REPO_ROOT / "screenshots"))
+IMAGE_REPO = "opencompx-desktop"
+
+
+@dataclass
+class SandboxLimits:
+    """Per-container resource limits (docker run --cpus / --memory / --shm-size); empty means uncapped."""
+    cpus: str = ""
+    memory: str = ""
+    shm_size: str = "4g"
+
+    @classmethod
+    def from_env(cls, defaults: "SandboxLimits | None" = None) -> "SandboxLimits":
+        defaults = defaults or cls()
+        return cls(
+            cpus=os.getenv("SANDBOX_CPUS") or defaults.cpus,
+            memory=os.getenv("SANDBOX_MEMORY") or defaults.memory,
+            shm_size=os.getenv("SANDBOX_SHM_SIZE") or defaults.shm_size,
+        )
+
+    def docker_args(self) -> list[str]:
+        args = ["--shm-size", self.shm_size] if self.shm_size else []
+        if self.cpus:
+            args += ["--cpus", self.cpus]
+        if self.memory:
+            args += ["--memory", self.memory]
+        return args
+
+
+@dataclass
+class SandboxProfile:
+    """A desktop flavour: which image to build, its default limits and how VNC is served."""
+    name: str
+    dockerfile: str
+    limits: SandboxLimits
+    vnc_on_demand: bool = False
+
+
+PROFILES = {
+    # Xfce + TigerVNC at 24-bit, VNC always on; same limits as docker-compose.desktop.yml (4 GB shm, no caps)
+    "full": SandboxProfile("full", "Dockerfile.desktop", SandboxLimits()),
+    # Xvfb + Openbox at 16-bit, VNC/noVNC started only when a human watches
+    "lite": SandboxProfile("lite", "Dockerfile.desktop-lite", SandboxLimits("1", "1536m", "512m"),
+                           vnc_on_demand=True),
+}
+
+
+def get_profile(name: str | None = None) -> SandboxProfile:
+    """Resolve a profile by name (default: SANDBOX_PROFILE env, then 'full')."""
+    name = (name or os.getenv("SANDBOX_PROFILE", "full")).lower()
+    if name not in PROFILES:
+        logger.warning(f"Unknown SANDBOX_PROFILE '{name}', using full")
+        name = "full"
+    return PROFILES[name]
+
+
+def _docker(*args, timeout: int = 60, check: bool = False) -> subprocess.CompletedProcess:
+    return subprocess.run(["docker", *args], capture_output=True, text=True, timeout=timeout, check=check)
+
+
+class SandboxProvisioner:
+    """Builds (when needed) and starts desktop sandboxes from a content-hashed image."""
+
+    def __init__(self, profile: SandboxProfile | None = None, env: dict[str, str] | None = None):
+        self.profile = profile or get_profile()
+        self.dockerfile = DOCKER_DIR / self.profile.dockerfile
+        self.env = env or {}
+        self.tag = f"{IMAGE_REPO}:{self.content_hash()}"
+        self._build_thread = None
+        self._build_ok = None
+        self._lock = threading.Lock()
+
+    def content_hash(self) -> str:
+        """Hash of the Dockerfile and the files it COPYs, so the tag changes only when the image definition does."""
+        if not self.dockerfile.exists():
+            logger.warning(f"{self.dockerfile} not found, expecting a pre-built '{IMAGE_REPO}:latest'")
+            return "latest"
+        digest = hashlib.sha256(self.dockerfile.read_bytes())
+        for line in self.dockerfile.read_text().splitlines():
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].upper() == "COPY" and not parts[1].startswith("--"):
+                for source in parts[1:-1]:
+                    path = DOCKER_DIR / source
+                    if path.is_file():
+                        digest.update(path.read_bytes())
+        return f"{self.profile.name}-{digest.hexdigest()[:12]}"
+
+    def image_exists(self) -> bool:
+        try:
+            return _docker("image", "inspect", self.tag, timeout=10).returncode == 0
+        except Exception:
+            return False
+
+    def _build(self):
+        start = time.perf_counter()
+        logger.info(f"Building sandbox image {self.tag} from {self.dockerfile.name}...")
+        try:
+            _docker("build", "-f", str(self.dockerfile), "-t", self.tag, str(DOCKER_DIR), timeout=1800, check=True)
+            self._build_ok = True
+            metrics.observe("sandbox_image_build_seconds", time.perf_counter() - start, image=self.tag)
+            logger.info(f"Sandbox image {self.tag} built in {time.perf_counter() - start:.0f}s")
+        except Exception as e:
+            self._build_ok = False
+            logger.error(f"Sandbox image build failed: {e}")
+
+    def prebuild(self):
+        """Start a background build if the current tag is missing (no-op otherwise)."""
+        with self._lock:
+            if self._build_thread is not None or not self.dockerfile.exists() or self.image_exists():
+                return
+            self._build_thread = threading.Thread(target=self._build, name="sandbox-build", daemon=True)
+            self._build_thread.start()
+
+    def ensure_image(self, timeout: float = 1800) -> bool:
+        """Block until the image exists, building it if nobody has started to."""
+        if self.image_exists():
+            return True
+        if not self.dockerfile.exists():
+            return False
+        self.prebuild()
+        if self._build_thread is not None:
+            self._build_thread.join(timeout)
+        return bool(self._build_ok) or self.image_exists()
+
+    def _container_image(self, name: str) -> str | None:
+        result = _docker("inspect", "-f", "{{.Config.Image}}|{{.State.Running}}", name, timeout=10)
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def start(self, name: str, ports: dict[int, int | None] | None = None,
+              limits: SandboxLimits | None = None) -> bool:
+        """
+        Start (or reuse) a sandbox container. `ports` maps container port to host
+        port; None publishes on an ephemeral host port.
+        """
+        start = time.perf_counter()
+        limits = limits or SandboxLimits.from_env(self.profile.limits)
+        try:
+            existing = self._container_image(name)
+            if existing:
+                image, running = existing.split("|")
+                if image == self.tag:
+                    if running != "true":
+                        _docker("start", name, check=True)
+                    self._record_start(start, name, reused=True)
+                    return True
+                logger.info(f"Sandbox {name} runs outdated image {image}, recreating")
+                _docker("rm", "-f", name, timeout=30)
+
+            if not self.ensure_image():
+                return False
+
+            cmd = ["run", "-d", "--name", name, "--restart", "unless-stopped", *limits.docker_args(),
+                   "-v", f"{SCREENSHOTS_DIR}:/home/agent/screenshots"]
+            for container_port, host_port in (ports or {}).items():
+                cmd += ["-p", f"{host_port}:{container_port}" if host_port else f"127.0.0.1::{container_port}"]
+            for key, value in self.env.items():
+                cmd += ["-e", f"{key}={value}"]
+            _docker(*cmd, self.tag, check=True)
+            self._record_start(start, name, reused=False)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to start sandbox {name}: {e}")
+            return False
+
+    def _record_start(self, start: float, name: str, reused: bool):
+        elapsed = time.perf_counter() - start
+        metrics.observe("sandbox_start_seconds", elapsed, reused=str(reused).lower())
+        logger.info(f"Sandbox {name} {'reused' if reused else 'started'} in {elapsed:.2f}s")
+
+    @staticmethod
+    def host_port(name: str, container_port: int) -> int | None:
+        """Host port published for `container_port` (for ephemeral mappings)."""
+        result = _docker("port", name, str(container_port), timeout=10)
+        for line in result.stdout.splitlines():
+            if ":" in line:
+                return int(line.rsplit(":", 1)[1])
+        return None
+
+    @staticmethod
+    def stop(name: str):
+        _docker("rm", "-f", name, timeout=30)
+
+
+_provisioners: dict[str, SandboxProvisioner] = {}
+
+
+def get_provisioner(profile: str | None = None) -> SandboxProvisioner:
+    """Shared provisioner per profile."""
+    resolved = get_profile(profile)
+    if resolved.name not in _provisioners:
+        _provisioners[resolved.name] = SandboxProvisioner(resolved)
+    return _provisioners[resolved.name]
+
+
+def _parse_size(text: str) -> float:
+    """'512.3MiB' / '1.2GiB' -> MiB."""
+    units = {"b": 1 / 2**20, "kib": 1 / 1024, "kb": 1 / 1024, "mib": 1, "mb": 1, "gib": 1024, "gb": 1024}
+    text = text.strip().lower()
+    for unit in sorted(units, key=len, reverse=True):
+        if text.endswith(unit):
+            return float(text[: -len(unit)]) * units[unit]
+    return float(text or 0)
+
+
+def measure_profile(profile: str, idle_seconds: float = 15.0, samples: int = 5) -> dict:
+    """
+    Boot a throwaway sandbox of `profile` and measure time-to-display, idle RAM
+    and idle CPU. Use the numbers to size how many sessions fit per node.
+    """
+    provisioner = get_provisioner(profile)
+    name = f"opencompx-measure-{profile}"
+    provisioner.stop(name)
+    if not provisioner.ensure_image():
+        raise RuntimeError(f"Image for profile {profile} is not available")
+
+    start = time.perf_counter()
+    if not provisioner.start(name, ports={}):
+        raise RuntimeError(f"Failed to start {name}")
+    while time.perf_counter() - start < 120:
+        probe = _docker("exec", name, "bash", "-c", "DISPLAY=:1 xdpyinfo >/dev/null 2>&1", timeout=10)
+        if probe.returncode == 0:
+            break
+        time.sleep(0.2)
+    boot_seconds = time.perf_counter() - start
+
+    time.sleep(idle_seconds)
+    mem, cpu = [], []
+    for _ in range(samples):
+        stats = _docker("stats", "--no-stream", "--format", "{{.MemUsage}}|{{.CPUPerc}}", name, timeout=30)
+        usage, percent = stats.stdout.strip().split("|")
+        mem.append(_parse_size(usage.split("/")[0]))
+        cpu.append(float(percent.rstrip("%") or 0))
+    provisioner.stop(name)
+
+    return {
+        "profile": profile,
+        "boot_seconds": round(boot_seconds, 2),
+        "idle_memory_mib": round(sum(mem) / len(mem), 1),
+        "idle_cpu_percent": round(sum(cpu) / len(cpu), 2),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Measure boot time, idle RAM and idle CPU per sandbox profile.")
+    parser.add_argument("--profiles", default="full,lite")
+    parser.add_argument("--idle-seconds", type=float, default=15.0)
+    args = parser.parse_args()
+    print(json.dumps([measure_profile(p, args.idle_seconds) for p in args.profiles.split(",")], indent=2))
@@ -0,0 +1,383 @@
+"""
+Session Registry - Which worker owns which run and sandbox, in a store shared by all workers.
+
+Each chat/batch run gets a run id. Its record (owner worker, sandbox, status,
+cancel flag) lives in a pluggable store so that any uvicorn worker or backend
+replica can answer `GET /runs/{id}` and accept a cancel. The owning worker
+polls the cancel flag between steps. Sandboxes are claimed with a lease
+that the owner renews by heartbeat. When a worker dies its claims expire and
+another worker can take the sandbox over.
+
+SESSION_STORE selects the backend:
+- memory: a single process (default).
+- sqlite: several workers on one host (SESSION_DB_PATH).
+- redis: several nodes (REDIS_URL; any Redis-compatible server).
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from backend.services.metrics import metrics
+from backend.services.sandbox import REPO_ROOT
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+# Base URL other replicas/the load balancer can use to reach this worker (for run-id routing)
+WORKER_URL = os.getenv("BACKEND_PUBLIC_URL", "")
+
+SESSION_DB_PATH = Path(os.getenv("SESSION_DB_PATH") or REPO_ROOT / "data" / "sessions.sqlite3")
+
+TERMINAL_STATUSES = {"done", "fail", "error", "quota", "cancelled", "stalled"}
+
+
+@dataclass
+class RunRecord:
+    run_id: str
+    worker: str
+    instruction: str
+    status: str = "running"
+    sandbox: str | None = None
+    kind: str = "chat"
+    conversation: str | None = None
+    cancel_requested: bool = False
+    result: dict | None = None
+    created: float = field(default_factory=time.time)
+    updated: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class SessionRegistry:
+    """Interface shared by the store backends."""
+
+    def __init__(self, lease_ttl: float = 60.0):
+        self.lease_ttl = lease_ttl
+        self._heartbeat: threading.Thread | None = None
+
+    # --- Runs ---
+    def create_run(self, instruction: str, sandbox: str | None = None, kind: str = "chat",
+                   conversation: str | None = None) -> RunRecord:
+        record = RunRecord(uuid.uuid4().hex[:16], WORKER_ID, instruction, sandbox=sandbox, kind=kind,
+                           conversation=conversation)
+        self._put_run(record)
+        metrics.inc("runs_started_total", kind=kind)
+        return record
+
+    def update_run(self, run_id: str, **fields) -> RunRecord | None:
+        record = self.get_run(run_id)
+        if record is None:
+            return None
+        for key, value in fields.items():
+            setattr(record, key, value)
+        record.updated = time.time()
+        self._put_run(record)
+        if fields.get("status") in TERMINAL_STATUSES:
+            metrics.inc("runs_finished_total", kind=record.kind, status=record.status)
+        return record
+
+    def request_cancel(self, run_id: str) -> RunRecord | None:
+        record = self.get_run(run_id)
+        if record is None or record.status in TERMINAL_STATUSES:
+            return record
+        return self.update_run(run_id, cancel_requested=True)
+
+    def cancel_requested(self, run_id: str) -> bool:
+        record = self.get_run(run_id)
+        return bool(record and record.cancel_requested)
+
+    def get_run(self, run_id: str) -> RunRecord | None:
+        raise NotImplementedError
+
+    def list_runs(self, limit: int = 50, worker: str | None = None) -> list[RunRecord]:
+        raise NotImplementedError
+
+    def _put_run(self, record: RunRecord):
+        raise NotImplementedError
+
+    # --- Sandbox leases and worker liveness ---
+    def claim_sandbox(self, name: str) -> bool:
+        """Claim `name` for this worker (or renew the claim); False if another live worker holds it."""
+        raise NotImplementedError
+
+    def release_sandbox(self, name: str):
+        raise NotImplementedError
+
+    def sandbox_owner(self, name: str) -> str | None:
+        raise NotImplementedError
+
+    def touch_worker(self):
+        """Record that this worker is alive (and its URL) and renew its sandbox claims."""
+        raise NotImplementedError
+
+    def worker_info(self, worker: str) -> dict | None:
+        """{"url", "last_seen", "alive"} for a worker, or None if never seen."""
+        raise NotImplementedError
+
+    def start_heartbeat(self):
+        if self._heartbeat is not None:
+            return
+
+        def beat():
+            while True:
+                try:
+                    self.touch_worker()
+                except Exception as e:
+                    logger.warning(f"Session registry heartbeat failed: {e}")
+                time.sleep(self.lease_ttl / 3)
+
+        self.touch_worker()
+        self._heartbeat = threading.Thread(target=beat, name="session-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+
+class MemorySessionRegistry(SessionRegistry):
+    """Single-process store."""
+
+    def __init__(self, lease_ttl: float = 60.0, max_runs: int = 1000):
+        super().__init__(lease_ttl)
+        self.max_runs = max_runs
+        self.runs: dict[str, RunRecord] = {}
+        self.sandboxes: dict[str, tuple[str, float]] = {}  # name -> (worker, expires)
+        self.workers: dict[str, tuple[str, float]] = {}  # worker -> (url, last_seen)
+        self.lock = threading.Lock()
+
+    def get_run(self, run_id):
+        with self.lock:
+            record = self.runs.get(run_id)
+            return RunRecord(**record.to_dict()) if record else None
+
+    def list_runs(self, limit=50, worker=None):
+        with self.lock:
+            records = [r for r in self.runs.values() if worker is None or r.worker == worker]
+        return sorted(records, key=lambda r: r.created, reverse=True)[:limit]
+
+    def _put_run(self, record):
+        with self.lock:
+            self.runs[record.run_id] = RunRecord(**record.to_dict())
+            while len(self.runs) > self.max_runs:
+                self.runs.pop(next(iter(self.runs)))
+
+    def claim_sandbox(self, name):
+        now = time.time()
+        with self.lock:
+            owner = self.sandboxes.get(name)
+            if owner and owner[0] != WORKER_ID and owner[1] > now:
+                return False
+            self.sandboxes[name] = (WORKER_ID, now + self.lease_ttl)
+            return True
+
+    def release_sandbox(self, name):
+        with self.lock:
+            if self.sandboxes.get(name, (None,))[0] == WORKER_ID:
+                del self.sandboxes[name]
+
+    def sandbox_owner(self, name):
+        with self.lock:
+            owner = self.sandboxes.get(name)
+            return owner[0] if owner and owner[1] > time.time() else None
+
+    def touch_worker(self):
+        now = time.time()
+        with self.lock:
+            self.workers[WORKER_ID] = (WORKER_URL, now)
+            for name, (worker, _) in list(self.sandboxes.items()):
+                if worker == WORKER_ID:
+                    self.sandboxes[name] = (worker, now + self.lease_ttl)
+
+    def worker_info(self, worker):
+        with self.lock:
+            info = self.workers.get(worker)
+        if info is None:
+            return None
+        return {"url": info[0], "last_seen": info[1], "alive": time.time() - info[1] < self.lease_ttl}
+
+
+class SqliteSessionRegistry(SessionRegistry):
+    """Store shared by the workers of one host (WAL mode, one connection per process)."""
+
+    def __init__(self, path: Path = SESSION_DB_PATH, lease_ttl: float = 60.0, retention: float = 7 * 86400):
+        super().__init__(lease_ttl)
+        self.retention = retention
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                worker TEXT NOT NULL,
+                record TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sandboxes (
+                name TEXT PRIMARY KEY,
+                worker TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS workers (
+                worker TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                last_seen REAL NOT NULL
+            );
+        """)
+        self.db.commit()
+
+    def get_run(self, run_id):
+        with self.lock:
+            row = self.db.execute("SELECT record FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return RunRecord(**json.loads(row[0])) if row else None
+
+    def list_runs(self, limit=50, worker=None):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT record FROM runs WHERE ? IS NULL OR worker = ? ORDER BY created DESC LIMIT ?",
+                (worker, worker, limit),
+            ).fetchall()
+        return [RunRecord(**json.loads(row[0])) for row in rows]
+
+    def _put_run(self, record):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO runs (run_id, worker, record, created) VALUES (?, ?, ?, ?)",
+                (record.run_id, record.worker, json.dumps(record.to_dict()), record.created),
+            )
+            self.db.execute("DELETE FROM runs WHERE created < ?", (time.time() - self.retention,))
+            self.db.commit()
+
+    def claim_sandbox(self, name):
+        now = time.time()
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO sandboxes (name, worker, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET worker = excluded.worker, expires = excluded.expires "
+                "WHERE sandboxes.worker = excluded.worker OR sandboxes.expires < ?",
+                (name, WORKER_ID, now + self.lease_ttl, now),
+            )
+            self.db.commit()
+            return cursor.rowcount > 0
+
+    def release_sandbox(self, name):
+        with self.lock:
+            self.db.execute("DELETE FROM sandboxes WHERE name = ? AND worker = ?", (name, WORKER_ID))
+            self.db.commit()
+
+    def sandbox_owner(self, name):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT worker FROM sandboxes WHERE name = ? AND expires >= ?", (name, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def touch_worker(self):
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO workers (worker, url, last_seen) VALUES (?, ?, ?)",
+                            (WORKER_ID, WORKER_URL, now))
+            self.db.execute("UPDATE sandboxes SET expires = ? WHERE worker = ?", (now + self.lease_ttl, WORKER_ID))
+            self.db.commit()
+
+    def worker_info(self, worker):
+        with self.lock:
+            row = self.db.execute("SELECT url, last_seen FROM workers WHERE worker = ?", (worker,)).fetchone()
+        if row is None:
+            return None
+        return {"url": row[0], "last_seen": row[1], "alive": time.time() - row[1] < self.lease_ttl}
+
+
+class RedisSessionRegistry(SessionRegistry):
+    """Store shared across nodes through a Redis-compatible server."""
+
+    PREFIX = "opencompx:"
+
+    def __init__(self, url: str, lease_ttl: float = 60.0, retention: float = 7 * 86400):
+        import redis  # optional dependency, only needed for SESSION_STORE=redis
+        super().__init__(lease_ttl)
+        self.retention = retention
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.redis.ping()
+
+    def get_run(self, run_id):
+        raw = self.redis.get(f"{self.PREFIX}run:{run_id}")
+        return RunRecord(**json.loads(raw)) if raw else None
+
+    def list_runs(self, limit=50, worker=None):
+        ids = self.redis.zrevrange(f"{self.PREFIX}runs", 0, -1 if worker else limit - 1)
+        records = [r for r in (self.get_run(run_id) for run_id in ids) if r and (worker is None or r.worker == worker)]
+        return records[:limit]
+
+    def _put_run(self, record):
+        pipe = self.redis.pipeline()
+        pipe.set(f"{self.PREFIX}run:{record.run_id}", json.dumps(record.to_dict()), ex=int(self.retention))
+        pipe.zadd(f"{self.PREFIX}runs", {record.run_id: record.created})
+        pipe.zremrangebyscore(f"{self.PREFIX}runs", 0, time.time() - self.retention)
+        pipe.execute()
+
+    def claim_sandbox(self, name):
+        key = f"{self.PREFIX}sandbox:{name}"
+        if self.redis.set(key, WORKER_ID, nx=True, ex=int(self.lease_ttl)):
+            return True
+        if self.redis.get(key) == WORKER_ID:
+            self.redis.expire(key, int(self.lease_ttl))
+            return True
+        return False
+
+    def release_sandbox(self, name):
+        key = f"{self.PREFIX}sandbox:{name}"
+        if self.redis.get(key) == WORKER_ID:
+            self.redis.delete(key)
+
+    def sandbox_owner(self, name):
+        return self.redis.get(f"{self.PREFIX}sandbox:{name}")
+
+    def touch_worker(self):
+        now = time.time()
+        self.redis.hset(f"{self.PREFIX}worker:{WORKER_ID}", mapping={"url": WORKER_URL, "last_seen": now})
+        self.redis.expire(f"{self.PREFIX}worker:{WORKER_ID}", int(self.retention))
+        for key in self.redis.scan_iter(f"{self.PREFIX}sandbox:*"):
+            if self.redis.get(key) == WORKER_ID:
+                self.redis.expire(key, int(self.lease_ttl))
+
+    def worker_info(self, worker):
+        info = self.redis.hgetall(f"{self.PREFIX}worker:{worker}")
+        if not info:
+            return None
+        last_seen = float(info["last_seen"])
+        return {"url": info.get("url", ""), "last_seen": last_seen, "alive": time.time() - last_seen < self.lease_ttl}
+
+
+_registry: SessionRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_session_registry() -> SessionRegistry:
+    """Shared registry selected by SESSION_STORE; falls back to memory if the store is unavailable."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            store = os.getenv("SESSION_STORE", "memory").lower()
+            ttl = float(os.getenv("SESSION_LEASE_TTL", 60))
+            try:
+                if store == "sqlite":
+                    _registry = SqliteSessionRegistry(lease_ttl=ttl)
+                elif store == "redis":
+                    _registry = RedisSessionRegistry(os.getenv("REDIS_URL", "redis://localhost:6379/0"), lease_ttl=ttl)
+            except Exception as e:
+                logger.warning(f"Session store '{store}' unavailable ({e}), using in-memory registry")
+            if _registry is None:
+                if int(os.getenv("BACKEND_WORKERS", 1)) > 1:
+                    logger.warning("BACKEND_WORKERS > 1 with an in-memory session registry: runs are not shared")
+                _registry = MemorySessionRegistry(lease_ttl=ttl)
+            _registry.start_heartbeat()
+            logger.info(f"Session registry: {type(_registry).__name__} (worker {WORKER_ID})")
+        return _registry
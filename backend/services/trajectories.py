@@ -0,0 +1,161 @@
+"""
+Trajectory Replay - Record successful runs and re-execute them without the LLM.
+
+Every step of a run is recorded as the actions issued plus a dHash of the
+screen the planner saw and the time until the next observation. Successful
+runs are persisted per normalised instruction. In replay mode a known task
+re-issues the recorded actions directly, checking the screen hash before each
+step (polling for up to the recorded settle time); the first step whose screen
+diverges hands control back to live planning.
+
+Trajectories store the raw action code, including any text the agent typed
+(`agent.type('...')`), in plaintext JSON, so REPLAY_MODE defaults to off.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from backend.services.imaging import dhash, hamming
+from backend.services.sandbox import REPO_ROOT
+
+logger = logging.getLogger(__name__)
+
+TRAJECTORY_DIR = Path(os.getenv("TRAJECTORY_DIR") or REPO_ROOT / "data" / "trajectories")
+HASH_SIZE = 16  # 256-bit dHash: sensitive enough to notice a dialog, blind to a blinking cursor
+
+
+def normalise_instruction(instruction: str) -> str:
+    return re.sub(r"\s+", " ", instruction.strip().lower())
+
+
+def screen_signature(png: bytes) -> str | None:
+    value = dhash(png, HASH_SIZE)
+    return None if value is None else f"{value:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+@dataclass
+class TrajectoryStep:
+    actions: list[str]
+    screen: str | None  # signature of the screen before the step; None = not verified
+    seconds: float = 0.0  # time from this observation to the next
+
+
+@dataclass
+class Trajectory:
+    instruction: str
+    steps: list[TrajectoryStep]
+    created: float = field(default_factory=time.time)
+    replays: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Trajectory":
+        steps = [TrajectoryStep(**step) for step in data.get("steps", [])]
+        return cls(data["instruction"], steps, data.get("created", 0.0), data.get("replays", 0))
+
+
+class TrajectoryStore:
+    """One JSON file per normalised instruction."""
+
+    def __init__(self, directory: Path = TRAJECTORY_DIR):
+        self.directory = Path(directory)
+
+    def path(self, instruction: str) -> Path:
+        key = hashlib.sha256(normalise_instruction(instruction).encode()).hexdigest()[:24]
+        return self.directory / f"{key}.json"
+
+    def load(self, instruction: str) -> Trajectory | None:
+        path = self.path(instruction)
+        if not path.exists():
+            return None
+        try:
+            trajectory = Trajectory.from_dict(json.loads(path.read_text()))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable trajectory {path.name}: {e}")
+            return None
+        if normalise_instruction(trajectory.instruction) != normalise_instruction(instruction):
+            return None
+        return trajectory
+
+    def save(self, trajectory: Trajectory):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(trajectory.instruction)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(trajectory.to_dict()))
+        tmp.replace(path)
+
+
+class TrajectoryRecorder:
+    """Accumulates the steps of the current run."""
+
+    def __init__(self, instruction: str):
+        self.instruction = instruction
+        self.steps: list[TrajectoryStep] = []
+        self._last = None
+
+    def add(self, actions: list[str], screenshot: bytes | None):
+        now = time.time()
+        if self.steps and self._last:
+            self.steps[-1].seconds = round(now - self._last, 2)
+        self.steps.append(TrajectoryStep(list(actions), screen_signature(screenshot) if screenshot else None))
+        self._last = now
+
+    def to_trajectory(self) -> Trajectory:
+        return Trajectory(self.instruction, self.steps)
+
+
+class ReplaySession:
+    """Cursor over a recorded trajectory for one run."""
+
+    def __init__(self, trajectory: Trajectory, max_distance: int = 12, max_wait: float = 10.0):
+        self.trajectory = trajectory
+        self.max_distance = max_distance
+        self.max_wait = max_wait
+        self.cursor = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.cursor >= len(self.trajectory.steps)
+
+    def current(self) -> TrajectoryStep:
+        return self.trajectory.steps[self.cursor]
+
+    def distance(self, screenshot: bytes) -> int | None:
+        expected = self.current().screen
+        observed = screen_signature(screenshot)
+        if expected is None or observed is None:
+            return None
+        return hamming(int(expected, 16), int(observed, 16))
+
+    def verify(self, capture) -> tuple[bool, bytes | None]:
+        """
+        Poll `capture()` until the screen matches the recorded one or the
+        recorded settle time (bounded by `max_wait`) runs out.
+        """
+        step = self.current()
+        if step.screen is None:
+            return True, None
+        previous_seconds = self.trajectory.steps[self.cursor - 1].seconds if self.cursor else 0.0
+        deadline = time.time() + min(max(previous_seconds, 1.0), self.max_wait)
+        while True:
+            screenshot = capture()
+            distance = self.distance(screenshot)
+            if distance is not None and distance <= self.max_distance:
+                return True, screenshot
+            if time.time() >= deadline:
+                logger.info(f"Replay diverged at step {self.cursor + 1} (distance {distance})")
+                return False, screenshot
+            time.sleep(0.3)
+
+    def advance(self) -> TrajectoryStep:
+        step = self.current()
+        self.cursor += 1
+        return step
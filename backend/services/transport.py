@@ -0,0 +1,361 @@
+"""
+Shared HTTP Transport - Pooled, keep-alive clients for LLM and UI-TARS endpoints.
+
+Every engine built by gui_agents lazily creates its own OpenAI client, so each
+session opened fresh connections with no retry, timeout or rate control.
+This module keeps one pooled httpx client per endpoint and config (HTTP/2
+when `h2` is installed) and wraps it with token-bucket rate limiting, jittered
+retries on 429/5xx, plus least-loaded routing and optional hedging across vLLM
+replicas.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+from backend.services.prompts import CACHE_AFFINITY_HEADERS
+from backend.services.usage import record_usage
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+GEMINI_OPENAI_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+OPENAI_URL = "https://api.openai.com/v1"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _origin(url: str) -> str:
+    """Normalise a base URL to scheme://host:port for pooling."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class TokenBucket:
+    """Thread-safe token bucket. rate <= 0 disables limiting."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst if burst else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+if httpx is not None:
+
+    class ResilientTransport(httpx.BaseTransport):
+        """Rate-limits requests and retries 429/5xx with jittered exponential backoff."""
+
+        def __init__(self, inner, bucket: TokenBucket, max_retries: int = 4,
+                     backoff_base: float = 0.5, backoff_cap: float = 8.0):
+            self.inner = inner
+            self.bucket = bucket
+            self.max_retries = max_retries
+            self.backoff_base = backoff_base
+            self.backoff_cap = backoff_cap
+
+        def _delay(self, attempt: int, response=None) -> float:
+            # Honour Retry-After when the server provides one
+            if response is not None:
+                retry_after = response.headers.get("retry-after")
+                if retry_after:
+                    try:
+                        return min(float(retry_after), self.backoff_cap)
+                    except ValueError:
+                        pass
+            # Full jitter: uniform(0, min(cap, base * 2^attempt))
+            return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+        def handle_request(self, request):
+            request.read()  # Buffer body so it can be replayed on retry
+            attempt = 0
+            while True:
+                self.bucket.acquire()
+                try:
+                    response = self.inner.handle_request(request)
+                except (httpx.ConnectError, httpx.ReadTimeout, httpx.RemoteProtocolError) as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = self._delay(attempt)
+                    logger.warning(f"Transport error on {request.url.host} ({e}), retry {attempt + 1} in {delay:.2f}s")
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        self._record_usage(request, response)
+                        return response
+                    delay = self._delay(attempt, response)
+                    logger.warning(f"HTTP {response.status_code} from {request.url.host}, retry {attempt + 1} in {delay:.2f}s")
+                    response.close()
+                attempt += 1
+                time.sleep(delay)
+
+        def _record_usage(self, request, response):
+            """Feed token usage (incl. cached prompt tokens) into per-run accounting."""
+            if response.status_code != 200 or "json" not in response.headers.get("content-type", ""):
+                return
+            try:
+                payload = json.loads(response.read())
+            except (ValueError, httpx.HTTPError):
+                return
+            if isinstance(payload, dict) and "usage" in payload:
+                record_usage(request.url.host, payload["usage"])
+
+        def close(self):
+            self.inner.close()
+
+    class ReplicaTransport(httpx.BaseTransport):
+        """
+        Routes each request to the least-loaded replica in a ReplicaPool.
+        With hedging enabled, a request that has not answered within
+        `hedge_delay` seconds is duplicated to the next-best replica; the
+        first response wins and the loser is closed.
+        """
+
+        def __init__(self, inner, base_url: str, pool, hedge_delay: float = 0.0):
+            self.inner = inner
+            self.base_url = base_url.rstrip("/")
+            self.pool = pool
+            self.hedge_delay = hedge_delay
+            self.executor = ThreadPoolExecutor(max_workers=max(4, 4 * len(pool.replicas)),
+                                               thread_name_prefix="replica")
+
+        def _rewrite(self, request, replica_url: str):
+            url = str(request.url)
+            if url.startswith(self.base_url):
+                url = replica_url + url[len(self.base_url):]
+            headers = [(k, v) for k, v in request.headers.raw if k.lower() != b"host"]
+            return httpx.Request(request.method, url, headers=headers,
+                                 content=request.content, extensions=request.extensions)
+
+        def _send(self, request, replica):
+            start = time.monotonic()
+            ok = False
+            try:
+                response = self.inner.handle_request(self._rewrite(request, replica.url))
+                response.read()  # Fully buffer so the winner can be returned after a race
+                ok = response.status_code < 500
+                return response
+            finally:
+                self.pool.release(replica, time.monotonic() - start, ok)
+
+        def handle_request(self, request):
+            request.read()
+            primary = self.pool.acquire()
+            if self.hedge_delay <= 0 or len(self.pool.replicas) < 2:
+                return self._send(request, primary)
+
+            pending = {self.executor.submit(self._send, request, primary)}
+            done, pending = wait(pending, timeout=self.hedge_delay, return_when=FIRST_COMPLETED)
+            if not done:
+                hedge = self.pool.acquire(exclude=primary)
+                logger.info(f"Hedging grounding request to {hedge.url} after {self.hedge_delay:.2f}s")
+                pending.add(self.executor.submit(self._send, request, hedge))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            winner = next(iter(done))
+            if winner.exception() is not None and pending:
+                # First finisher failed; fall back to whichever request is still running
+                return next(iter(wait(pending, return_when=FIRST_COMPLETED).done)).result()
+            for loser in pending:
+                loser.add_done_callback(_close_response)
+            return winner.result()
+
+        def close(self):
+            self.executor.shutdown(wait=False)
+            self.inner.close()
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+_clients: dict[tuple, "httpx.Client"] = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(base_url: str, rate_limit: float = 0.0, replica_pool=None):
+    """
+    Return the shared pooled client for an endpoint, creating it on first use.
+    Clients are keyed by origin and their effective config (rate limit, replicas,
+    timeouts, retries, pool limits), so every session with the same settings
+    reuses the same connections and a different config never gets a stale client.
+    """
+    if httpx is None:
+        return None
+
+    config = {
+        "rate_limit": rate_limit,
+        "max_connections": int(_env_float("HTTP_MAX_CONNECTIONS", 32)),
+        "max_keepalive": int(_env_float("HTTP_MAX_KEEPALIVE", 16)),
+        "keepalive_expiry": _env_float("HTTP_KEEPALIVE_EXPIRY", 60.0),
+        "max_retries": int(_env_float("HTTP_MAX_RETRIES", 4)),
+        "backoff_base": _env_float("HTTP_BACKOFF_BASE", 0.5),
+        "backoff_cap": _env_float("HTTP_BACKOFF_CAP", 8.0),
+        "timeout": _env_float("HTTP_TIMEOUT", 120.0),
+        "connect_timeout": _env_float("HTTP_CONNECT_TIMEOUT", 5.0),
+    }
+    if replica_pool is not None:
+        # ReplicaTransport rewrites requests below base_url onto the pool's replicas
+        config.update(base_url=base_url.rstrip("/"), replica_pool=id(replica_pool),
+                      hedge_delay=_env_float("VISION_HEDGE_DELAY_MS", 0) / 1000.0)
+    key = (_origin(base_url), *sorted(config.items()))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+
+        limits = httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive"],
+            keepalive_expiry=config["keepalive_expiry"],
+        )
+        transport = httpx.HTTPTransport(http2=HTTP2_AVAILABLE, limits=limits, retries=0)
+        if replica_pool is not None:
+            transport = ReplicaTransport(transport, base_url, replica_pool, config["hedge_delay"])
+        transport = ResilientTransport(
+            transport,
+            TokenBucket(rate_limit),
+            max_retries=config["max_retries"],
+            backoff_base=config["backoff_base"],
+            backoff_cap=config["backoff_cap"],
+        )
+        timeout = httpx.Timeout(config["timeout"], connect=config["connect_timeout"])
+        client = httpx.Client(transport=transport, timeout=timeout)
+        _clients[key] = client
+        logger.info(f"Created pooled client for {key[0]} (http2={HTTP2_AVAILABLE}, rps={rate_limit or 'unlimited'}, "
+                    f"replicas={len(replica_pool.replicas) if replica_pool else 1})")
+        return client
+
+
+def _iter_engines(root, max_depth: int = 6):
+    """Walk an agent object graph and yield LMM engines (objects owning an `llm_client`)."""
+    seen = set()
+    stack = [(root, 0)]
+    while stack:
+        obj, depth = stack.pop()
+        if obj is None or id(obj) in seen or depth > max_depth:
+            continue
+        seen.add(id(obj))
+
+        if isinstance(obj, (list, tuple)):
+            stack.extend((item, depth + 1) for item in obj)
+            continue
+        if isinstance(obj, dict):
+            stack.extend((item, depth + 1) for item in obj.values())
+            continue
+
+        module = type(obj).__module__ or ""
+        if not (module.startswith("gui_agents") or module.startswith("backend.")):
+            continue
+        if hasattr(obj, "llm_client") and hasattr(obj, "model"):
+            yield obj
+            continue
+        try:
+            attrs = vars(obj)
+        except TypeError:
+            continue
+        stack.extend((value, depth + 1) for value in attrs.values())
+
+
+def _engine_base_url(engine) -> str:
+    base_url = getattr(engine, "base_url", None)
+    if base_url:
+        return base_url
+    name = type(engine).__name__.lower()
+    if "gemini" in name:
+        return os.getenv("GEMINI_ENDPOINT_URL") or GEMINI_OPENAI_URL
+    if "openai" in name:
+        return OPENAI_URL
+    return ""
+
+
+def _engine_api_key(engine) -> str:
+    api_key = getattr(engine, "api_key", None)
+    if api_key:
+        return api_key
+    if "gemini" in type(engine).__name__.lower():
+        return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY") or "empty"
+    return os.getenv("OPENAI_API_KEY") or "empty"
+
+
+def attach_shared_clients(agent, vision_url: str, replica_pool=None, cache_affinity: str | None = None) -> int:
+    """
+    Pre-populate every engine's `llm_client` with an OpenAI client backed by
+    the shared pooled transport. Engines whose endpoint cannot be determined
+    are left alone and fall back to their own lazy client.
+
+    `cache_affinity` (the prompt-prefix hash) is sent as a session-affinity
+    header to providers that use it to route requests onto a warm prefix cache.
+    """
+    if httpx is None:
+        logger.warning("httpx not installed - engines will use their default clients.")
+        return 0
+    try:
+        from openai import OpenAI
+    except ImportError:
+        return 0
+
+    attached = 0
+    for engine in _iter_engines(agent):
+        base_url = _engine_base_url(engine)
+        if not base_url:
+            continue
+
+        is_vision = _origin(base_url) == _origin(vision_url)
+        http_client = get_http_client(
+            base_url,
+            rate_limit=_env_float("VISION_RATE_LIMIT_RPS" if is_vision else "LLM_RATE_LIMIT_RPS", 0.0),
+            replica_pool=replica_pool if is_vision else None,
+        )
+        headers = {}
+        affinity_header = CACHE_AFFINITY_HEADERS.get(urlsplit(base_url).hostname or "")
+        if cache_affinity and affinity_header:
+            headers[affinity_header] = cache_affinity
+        engine.llm_client = OpenAI(
+            base_url=base_url,
+            default_headers=headers or None,
+            api_key=_engine_api_key(engine),
+            http_client=http_client,
+            max_retries=0,  # Retries are owned by ResilientTransport
+        )
+        attached += 1
+    logger.info(f"Attached shared HTTP clients to {attached} engine(s).")
+    return attached
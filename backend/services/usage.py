@@ -0,0 +1,91 @@
+"""
+Token Usage - Per-run accounting of prompt, completion and cached tokens.
+
+The shared transport parses the `usage` block of every OpenAI-compatible
+response and records it into the run currently bound with `track_usage`,
+so each run can report its cached-token ratio without touching gui_agents.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from backend.services.metrics import metrics
+
+_current_usage: ContextVar["RunUsage | None"] = ContextVar("run_usage", default=None)
+
+
+class RunUsage:
+    """Thread-safe token counters for one agent run, split by endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.by_endpoint: dict[str, dict[str, int]] = {}
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def cached_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def add(self, endpoint: str, prompt: int, completion: int, cached: int):
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+            self.cached_tokens += cached
+            bucket = self.by_endpoint.setdefault(endpoint, {"requests": 0, "prompt_tokens": 0,
+                                                            "completion_tokens": 0, "cached_tokens": 0})
+            bucket["requests"] += 1
+            bucket["prompt_tokens"] += prompt
+            bucket["completion_tokens"] += completion
+            bucket["cached_tokens"] += cached
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": round(self.cached_ratio, 3),
+                "by_endpoint": {k: dict(v) for k, v in self.by_endpoint.items()},
+            }
+
+
+@contextmanager
+def track_usage(usage: RunUsage):
+    """Bind `usage` as the recipient of token counts for calls made in this context."""
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def current_usage() -> RunUsage | None:
+    return _current_usage.get()
+
+
+def record_usage(endpoint: str, usage: dict):
+    """Record an OpenAI-style `usage` payload globally and into the bound run."""
+    if not isinstance(usage, dict):
+        return
+    prompt = int(usage.get("prompt_tokens") or 0)
+    completion = int(usage.get("completion_tokens") or 0)
+    details = usage.get("prompt_tokens_details") or {}
+    cached = int(details.get("cached_tokens") or usage.get("cached_tokens") or 0)
+
+    metrics.inc("llm_prompt_tokens_total", prompt, endpoint=endpoint)
+    metrics.inc("llm_completion_tokens_total", completion, endpoint=endpoint)
+    metrics.inc("llm_cached_tokens_total", cached, endpoint=endpoint)
+
+    run_usage = _current_usage.get()
+    if run_usage is not None:
+        run_usage.add(endpoint, prompt, completion, cached)
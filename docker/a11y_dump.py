@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+a11y-dump - Print a compact accessibility tree of the desktop as JSON.
+
+Walks the AT-SPI registry (GTK apps, and Firefox pages since Firefox exposes
+its content tree over AT-SPI when accessibility is enabled) and prints one
+JSON array of [path, role, name, x, y, width, height] rows for visible nodes
+that have a name or are interactive. Installed as /usr/local/bin/a11y-dump.
+"""
+
+import sys
+import json
+
+import pyatspi
+
+INTERACTIVE_ROLES = {
+    "push button", "toggle button", "check box", "radio button", "menu item", "menu",
+    "combo box", "text", "entry", "password text", "link", "page tab", "list item",
+    "tree item", "table cell", "spin button", "slider", "icon", "tool bar", "heading",
+}
+
+
+def walk(node, path, rows, max_nodes, depth=0):
+    if len(rows) >= max_nodes or depth > 40:
+        return
+    try:
+        states = node.getState()
+        if not (states.contains(pyatspi.STATE_SHOWING) and states.contains(pyatspi.STATE_VISIBLE)):
+            return
+        role = node.getRoleName()
+        name = (node.name or "").strip()
+        if name or role in INTERACTIVE_ROLES:
+            ext = node.queryComponent().getExtents(pyatspi.DESKTOP_COORDS)
+            if ext.width > 0 and ext.height > 0:
+                rows.append([path, role, name[:120], ext.x, ext.y, ext.width, ext.height])
+        for index in range(min(node.childCount, 500)):
+            walk(node.getChildAtIndex(index), f"{path}.{index}", rows, max_nodes, depth + 1)
+    except Exception:
+        # Widgets vanish while we walk; skip the subtree
+        return
+
+
+def main():
+    max_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rows = []
+    desktop = pyatspi.Registry.getDesktop(0)
+    for index in range(desktop.childCount):
+        app = desktop.getChildAtIndex(index)
+        if app is None:
+            continue
+        for window_index in range(app.childCount):
+            walk(app.getChildAtIndex(window_index), f"{app.name}:{window_index}", rows, max_nodes)
+    json.dump(rows, sys.stdout, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    main()
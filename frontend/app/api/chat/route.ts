@@ -6,7 +6,7 @@ export const maxDuration = 600; // 10 minutes
 export async function POST(request: Request) {
   try {
     const body = await request.json();
-    const { messages, sandboxId, model, resolution, environment, image, selectedTool } = body;
+    const { messages, sandboxId, model, resolution, environment, image, selectedTool, conversationId } = body;
 
     // Forward request to Python Agent-S3 Backend
     const backendUrl = process.env.BACKEND_URL || "http://localhost:8000";
@@ -23,6 +23,7 @@ export async function POST(request: Request) {
         environment,
         image,
         selectedTool,
+        conversationId,
       }),
     });
 
@@ -47,3 +48,40 @@ export async function POST(request: Request) {
     return new Response("Internal Server Error", { status: 500 });
   }
 }
+
+// Resume a run's stream after a dropped connection: GET /api/chat?runId=...&after=<last event id>
+// (or a Last-Event-ID header). The backend replays the missed events, then streams live ones.
+export async function GET(request: Request) {
+  try {
+    const { searchParams } = new URL(request.url);
+    const runId = searchParams.get("runId");
+    if (!runId) {
+      return new Response("Missing runId", { status: 400 });
+    }
+    const lastEventId = searchParams.get("after") || request.headers.get("Last-Event-ID");
+
+    const backendUrl = process.env.BACKEND_URL || "http://localhost:8000";
+    const response = await fetch(`${backendUrl}/runs/${encodeURIComponent(runId)}/events`, {
+      headers: lastEventId ? { "Last-Event-ID": lastEventId } : {},
+      signal: request.signal,
+    });
+
+    if (!response.ok) {
+      const errorText = await response.text();
+      logError(`Backend Error (${response.status}):`, errorText || response.statusText);
+      return new Response(errorText || `Error resuming run: ${response.status}`, { status: response.status });
+    }
+
+    return new Response(response.body, {
+      headers: {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+      },
+    });
+
+  } catch (error) {
+    logError("Proxy Error:", error);
+    return new Response("Internal Server Error", { status: 500 });
+  }
+}
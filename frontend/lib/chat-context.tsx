@@ -39,6 +39,9 @@ interface ChatContextType extends ChatState {
   startTime: number | null;
 }
 
+// Reconnects to a run's event stream (GET /api/chat?runId=) after the connection drops
+const MAX_RESUME_ATTEMPTS = 3;
+
 const ChatContext = createContext<ChatContextType | undefined>(undefined);
 
 interface ChatProviderProps {
@@ -53,6 +56,9 @@ export function ChatProvider({ children }: ChatProviderProps) {
   const [image, setImage] = useState<string | null>(null);
   const [selectedTool, setSelectedTool] = useState<string | null>(null);
   const abortControllerRef = useRef<AbortController | null>(null);
+  const runIdRef = useRef<string | null>(null);
+  // Follow-up messages with the same id continue in the same desktop and agent context
+  const conversationIdRef = useRef<string>(crypto.randomUUID());
   const onSandboxCreatedRef = useRef<
     ((sandboxId: string, vncUrl: string) => void) | undefined
   >(undefined);
@@ -170,6 +176,7 @@ export function ChatProvider({ children }: ChatProviderProps) {
           model,
           image: imageArg || image,
           selectedTool: toolArg || selectedTool,
+          conversationId: conversationIdRef.current,
         }),
         signal: abortControllerRef.current.signal,
       });
@@ -182,7 +189,7 @@ export function ChatProvider({ children }: ChatProviderProps) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const reader = response.body?.getReader();
+      let reader = response.body?.getReader();
       if (!reader) throw new Error("Response body is null");
 
       setMessages((prev) => [
@@ -198,9 +205,20 @@ export function ChatProvider({ children }: ChatProviderProps) {
       let assistantMessage = "";
       let buffer = "";
       let responseCounter = 0; // Local counter to ensure unique IDs during rapid SSE updates
+      let lastEventId: string | null = null;
+      let finished = false;
+      let resumeAttempts = 0;
 
       while (true) {
-        const { done, value } = await reader.read();
+        let done: boolean;
+        let value: Uint8Array | undefined;
+        try {
+          ({ done, value } = await reader.read());
+        } catch (readError) {
+          if (abortControllerRef.current?.signal.aborted) throw readError;
+          logError("Stream interrupted:", readError);
+          done = true;
+        }
 
         if (done) {
           if (buffer.trim()) {
@@ -221,9 +239,27 @@ export function ChatProvider({ children }: ChatProviderProps) {
                   return [...prev, systemMessage];
                 });
                 setIsLoading(false);
+                finished = true;
               }
             }
           }
+
+          // Dropped before the run finished: the backend kept running it, so pick up where we left off
+          if (!finished && runIdRef.current && resumeAttempts < MAX_RESUME_ATTEMPTS) {
+            const runId = runIdRef.current;
+            resumeAttempts++;
+            await new Promise((resolve) => setTimeout(resolve, 1000 * resumeAttempts));
+            const resumed = await fetch(`/api/chat?runId=${encodeURIComponent(runId)}`, {
+              headers: lastEventId ? { "Last-Event-ID": lastEventId } : undefined,
+              signal: abortControllerRef.current?.signal,
+            });
+            if (resumed.ok && resumed.body) {
+              logDebug(`Resuming run ${runId} after event ${lastEventId}`);
+              reader = resumed.body.getReader();
+              buffer = "";
+              continue;
+            }
+          }
           break;
         }
 
@@ -237,6 +273,9 @@ export function ChatProvider({ children }: ChatProviderProps) {
         for (const event of events) {
           if (!event.trim()) continue;
 
+          const idMatch = event.match(/^id: ?(\d+)$/m);
+          if (idMatch) lastEventId = idMatch[1];
+
           const parsedEvent = parseSSEEvent(event);
           if (!parsedEvent) continue;
 
@@ -299,6 +338,7 @@ export function ChatProvider({ children }: ChatProviderProps) {
                 return [...prev, systemMessage];
               });
               setIsLoading(false);
+              finished = true;
               break;
 
             case SSEEventType.ERROR:
@@ -313,6 +353,33 @@ export function ChatProvider({ children }: ChatProviderProps) {
                 },
               ]);
               setIsLoading(false);
+              finished = true;
+              break;
+
+            case SSEEventType.BRANCH: {
+              const text = parsedEvent.final
+                ? `[Sub-task ${(parsedEvent.index ?? 0) + 1}] ${parsedEvent.status}: ${parsedEvent.summary || parsedEvent.instruction}`
+                : `[Sub-task ${(parsedEvent.index ?? 0) + 1} · step ${parsedEvent.step ?? 0}] ${parsedEvent.log || parsedEvent.status}`;
+              setMessages((prev) => {
+                const lastMsg = prev[prev.length - 1];
+                if (lastMsg && lastMsg.role === "assistant") {
+                  return [...prev.slice(0, -1), { ...lastMsg, content: lastMsg.content + "\n" + text }];
+                }
+                return [
+                  ...prev,
+                  {
+                    role: "assistant",
+                    id: `assistant-${Date.now()}-${responseCounter++}`,
+                    content: text,
+                    model,
+                  } as AssistantChatMessage,
+                ];
+              });
+              break;
+            }
+
+            case SSEEventType.RUN:
+              runIdRef.current = parsedEvent.runId ?? null;
               break;
 
             case SSEEventType.SANDBOX_CREATED:
@@ -363,6 +430,13 @@ export function ChatProvider({ children }: ChatProviderProps) {
   };
 
   const stopGeneration = useCallback(() => {
+    // Stop the run itself, not just this stream (the backend may be on another worker)
+    if (runIdRef.current) {
+      fetch(`/api/runs/${runIdRef.current}/cancel`, { method: "POST" }).catch((error) =>
+        logError("Error cancelling run:", error)
+      );
+      runIdRef.current = null;
+    }
     if (abortControllerRef.current) {
       try {
         abortControllerRef.current.abort(
@@ -383,6 +457,7 @@ export function ChatProvider({ children }: ChatProviderProps) {
   const clearMessages = useCallback(() => {
     setMessages([]);
     setError(null);
+    conversationIdRef.current = crypto.randomUUID();
   }, []);
 
   const handleSubmit = useCallback(
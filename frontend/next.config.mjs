@@ -16,6 +16,10 @@ const nextConfig = {
             {
                 source: '/api/chat_stream',
                 destination: 'http://127.0.0.1:8000/chat',
+            },
+            {
+                source: '/api/runs/:path*',
+                destination: 'http://127.0.0.1:8000/runs/:path*',
             }
         ];
     },
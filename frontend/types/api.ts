@@ -20,6 +20,8 @@ export enum SSEEventType {
   ERROR = "error",
   SANDBOX_CREATED = "sandbox_created",
   ACTION_COMPLETED = "action_completed",
+  BRANCH = "branch",
+  RUN = "run",
 }
 
 /**
@@ -79,6 +81,30 @@ export interface ActionCompletedEvent extends BaseSSEEvent {
   type: SSEEventType.ACTION_COMPLETED;
 }
 
+/**
+ * Progress of one parallel sub-task (fan-out mode)
+ */
+export interface BranchEvent extends BaseSSEEvent {
+  type: SSEEventType.BRANCH;
+  index: number;
+  instruction: string;
+  sandbox: string;
+  status: string;
+  step?: number;
+  log?: string;
+  summary?: string;
+  final?: boolean;
+}
+
+/**
+ * Run registration: id for status, cancel and re-attachment, and the owning worker
+ */
+export interface RunEvent extends BaseSSEEvent {
+  type: SSEEventType.RUN;
+  runId: string;
+  worker: string;
+}
+
 /**
  * Union type of all possible SSE events
  */
@@ -88,7 +114,9 @@ export type SSEEvent<T extends ComputerModel = ComputerModel> =
   | DoneEvent
   | ErrorEvent
   | SandboxCreatedEvent
-  | ActionCompletedEvent;
+  | ActionCompletedEvent
+  | BranchEvent
+  | RunEvent;
 
 /**
  * Response from action execution
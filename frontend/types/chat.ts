@@ -85,6 +85,17 @@ export interface ParsedSSEEvent<T extends ComputerModel> {
   callId?: string;
   sandboxId?: string;
   vncUrl?: string;
+  // Fan-out branch progress
+  index?: number;
+  instruction?: string;
+  status?: string;
+  step?: number;
+  log?: string;
+  summary?: string;
+  final?: boolean;
+  // Run registration
+  runId?: string;
+  worker?: string;
 }
 
 /**
@@ -3,4 +3,5 @@
 echo "Starting OpenCompX Backend..."
 pip install -r backend/requirements.txt
 bash backend/install_custom_deps.sh
+# Production entry point (no auto-reload); BACKEND_RELOAD=1 for development
 python -m backend.app.main
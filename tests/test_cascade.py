@@ -0,0 +1,57 @@
+from backend.services.cascade import EscalationPolicy
+
+
+def observation(**kwargs):
+    return {"screenshot": b"", **kwargs}
+
+
+def test_first_step_is_strong_then_held():
+    policy = EscalationPolicy(hold=1)
+    assert policy.choose(observation(), 0) == ("strong", "first_step")
+    assert policy.choose(observation(), 0) == ("strong", None)
+    assert policy.choose(observation(), 0) == ("fast", None)
+
+
+def test_first_step_fast_when_configured():
+    policy = EscalationPolicy(first_step_strong=False)
+    assert policy.choose(observation(), 0) == ("fast", None)
+
+
+def test_failure_streak_escalates():
+    policy = EscalationPolicy(failures=2, hold=0, first_step_strong=False)
+    failed = observation(last_action_result="Action error: element not found")
+    assert policy.choose(failed, 0) == ("fast", None)
+    assert policy.choose(failed, 0) == ("strong", "failures")
+    assert policy.choose(observation(), 0) == ("fast", None)
+
+
+def test_repeated_actions_escalate():
+    policy = EscalationPolicy(repeats=2, hold=0, first_step_strong=False)
+    for _ in range(3):
+        policy.observe(["pyautogui.click(10, 10)"])
+    assert policy.choose(observation(), 0) == ("strong", "repeats")
+    policy.observe(["pyautogui.press('enter')"])
+    assert policy.choose(observation(), 0) == ("fast", None)
+
+
+def test_complex_screen_escalates():
+    policy = EscalationPolicy(elements=100, png_kb=1, hold=0, first_step_strong=False)
+    assert policy.choose(observation(), 101) == ("strong", "complex_screen")
+    assert policy.choose(observation(screenshot=b"x" * 2048), 0) == ("strong", "complex_screen")
+    assert policy.choose(observation(), 100) == ("fast", None)
+
+
+def test_forced_escalation_applies_once():
+    policy = EscalationPolicy(hold=0, first_step_strong=False)
+    policy.forced = "stall"
+    assert policy.choose(observation(), 0) == ("strong", "stall")
+    assert policy.choose(observation(), 0) == ("fast", None)
+
+
+def test_low_confidence():
+    assert EscalationPolicy.low_confidence({}, [])
+    assert EscalationPolicy.low_confidence({}, ["FAIL"])
+    assert EscalationPolicy.low_confidence({}, ["I would click the button"])
+    assert EscalationPolicy.low_confidence({"plan": "I'm not sure where the menu is"}, ["pyautogui.click(1, 2)"])
+    assert not EscalationPolicy.low_confidence({"plan": "Click Save"}, ["pyautogui.click(1, 2)"])
+    assert not EscalationPolicy.low_confidence({}, ["DONE"])
@@ -0,0 +1,75 @@
+import asyncio
+
+from backend.services.event_log import EventLogRegistry, RunEventLog
+
+
+def event(name: str) -> str:
+    return f"event: {name}\ndata: {{}}\n\n"
+
+
+async def collect(log: RunEventLog, last_id: int = 0) -> list[str]:
+    return [chunk async for chunk in log.follow(last_id)]
+
+
+def test_events_are_numbered():
+    log = RunEventLog()
+    assert [log.append(event(name)) for name in ("a", "b")] == [1, 2]
+    events, missed = log.since(0)
+    assert missed == 0
+    assert events == [(1, "id: 1\n" + event("a")), (2, "id: 2\n" + event("b"))]
+
+
+def test_replay_after_last_event_id():
+    log = RunEventLog()
+    for name in ("a", "b", "c"):
+        log.append(event(name))
+    log.close()
+    chunks = asyncio.run(collect(log, last_id=1))
+    assert chunks == ["id: 2\n" + event("b"), "id: 3\n" + event("c")]
+
+
+def test_gap_when_buffer_evicted_events():
+    log = RunEventLog(capacity=2)
+    for name in ("a", "b", "c", "d"):
+        log.append(event(name))
+    log.close()
+    chunks = asyncio.run(collect(log, last_id=0))
+    assert chunks[0] == 'event: gap\ndata: {"missed": 2}\n\n'
+    assert chunks[1:] == ["id: 3\n" + event("c"), "id: 4\n" + event("d")]
+
+
+def test_follow_receives_live_events_until_close():
+    async def scenario():
+        log = RunEventLog()
+        log.append(event("a"))
+        follower = asyncio.create_task(collect(log))
+        await asyncio.sleep(0)
+        assert log.followers == 1
+        log.append(event("b"))
+        await asyncio.sleep(0)
+        log.close()
+        chunks = await follower
+        assert log.followers == 0
+        return chunks
+
+    assert asyncio.run(scenario()) == ["id: 1\n" + event("a"), "id: 2\n" + event("b")]
+
+
+def test_abandoned_after_grace():
+    log = RunEventLog()
+    log.detached_at -= 10
+    assert log.abandoned(grace=5)
+    log.followers = 1
+    assert not log.abandoned(grace=5)
+
+
+def test_registry_purges_expired_logs():
+    registry = EventLogRegistry(ttl=10)
+    live, done = registry.create(), registry.create()
+    registry.bind("live", live)
+    registry.bind("done", done)
+    done.close()
+    done.closed_at -= 60
+    registry.purge()
+    assert registry.get("live") is live
+    assert registry.get("done") is None
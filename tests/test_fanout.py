@@ -0,0 +1,46 @@
+from backend.services.fanout import split_instruction
+
+
+def test_enumerated_sites_fan_out():
+    goals = split_instruction("Find the price of a PS5 on these sites: amazon.com, bestbuy.com and walmart.com")
+    assert goals == [
+        "Find the price of a PS5 on amazon.com",
+        "Find the price of a PS5 on bestbuy.com",
+        "Find the price of a PS5 on walmart.com",
+    ]
+
+
+def test_bullets_under_target_preamble_fan_out():
+    instruction = "Check the opening hours for each of these stores:\n- Lidl Berlin\n- Aldi Munich\n* Rewe Hamburg"
+    assert split_instruction(instruction) == [
+        "Check the opening hours for each of these stores: Lidl Berlin",
+        "Check the opening hours for each of these stores: Aldi Munich",
+        "Check the opening hours for each of these stores: Rewe Hamburg",
+    ]
+
+
+def test_numbered_lists_are_ordered_steps():
+    assert split_instruction("Do the following:\n1. Open Firefox\n2. Go to gmail.com\n3. Send the report") == []
+
+
+def test_bullets_without_target_preamble_stay_serial():
+    assert split_instruction("Please do this:\n- amazon.com\n- ebay.com") == []
+
+
+def test_bullet_steps_stay_serial():
+    instruction = "Do the following:\n- open the report\n- export it as PDF\n- email it to Bob"
+    assert split_instruction(instruction) == []
+
+
+def test_sequence_words_stay_serial():
+    assert split_instruction("Log in first, then compare prices on these sites: amazon.com and ebay.com") == []
+
+
+def test_single_target_and_too_many_targets():
+    assert split_instruction("Search for shoes on these sites: amazon.com") == []
+    sites = ", ".join(f"site{i}.com" for i in range(12))
+    assert split_instruction(f"Search for shoes on these sites: {sites}", max_subgoals=10) == []
+
+
+def test_plain_instruction_is_not_split():
+    assert split_instruction("Open Firefox and search for the weather in Paris") == []
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+pytest.importorskip("dotenv")
+Image = pytest.importorskip("PIL.Image")
+
+from backend.services.agent_service import GroundingProxy  # noqa: E402
+
+
+def png(width: int, height: int) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height)).save(out, format="PNG")
+    return out.getvalue()
+
+
+class FakeGrounder:
+    """OSWorldACI stand-in that answers the centre of the image it is shown."""
+
+    width, height = 1920, 1080
+
+    def __init__(self, grounding_size=(1920, 1080), normalised=False):
+        self.engine_params_for_grounding = {"grounding_width": grounding_size[0],
+                                            "grounding_height": grounding_size[1]}
+        self.normalised = normalised
+        self.seen = None
+
+    def generate_coords(self, ref_expr, obs):
+        with Image.open(io.BytesIO(obs["screenshot"])) as img:
+            self.seen = img.size
+        params = self.engine_params_for_grounding
+        # A normalised model answers in its own space, a pixel-space one in pixels of what it saw
+        space = (params["grounding_width"], params["grounding_height"]) if self.normalised else self.seen
+        return [space[0] // 2, space[1] // 2]
+
+    def resize_coordinates(self, coords):
+        params = self.engine_params_for_grounding
+        return [round(coords[0] * self.width / params["grounding_width"]),
+                round(coords[1] * self.height / params["grounding_height"])]
+
+    def click(self, description):
+        return self.resize_coordinates(self.generate_coords(description, {}))
+
+
+def test_crop_click_lands_on_screen_pixel():
+    grounder = FakeGrounder()
+    proxy = GroundingProxy(grounder)
+    proxy.update_screenshot(png(1920, 1080), region=(100, 200, 400, 300))
+    assert grounder.click("OK button") == [300, 350]
+    assert grounder.seen == (400, 300)
+
+
+def test_full_screen_click_is_unchanged():
+    grounder = FakeGrounder()
+    proxy = GroundingProxy(grounder)
+    proxy.update_screenshot(png(1920, 1080))
+    assert grounder.click("OK button") == [960, 540]
+    assert grounder.seen == (1920, 1080)
+
+
+def test_normalised_model_on_crop():
+    grounder = FakeGrounder(grounding_size=(1000, 1000), normalised=True)
+    proxy = GroundingProxy(grounder)
+    proxy.update_screenshot(png(1920, 1080), region=(100, 200, 400, 300))
+    assert grounder.click("OK button") == [300, 350]
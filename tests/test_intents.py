@@ -0,0 +1,55 @@
+import pytest
+
+from backend.services.intents import IntentRouter, looks_like_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://example.org/path", True),
+    ("www.example.test", True),
+    ("github.com", True),
+    ("localhost:8080", False),
+    ("notes.txt", False),
+    ("report.pdf", False),
+    ("archive.tar.gz", False),
+])
+def test_looks_like_url(url, expected):
+    assert looks_like_url(url) is expected
+
+
+def test_launch_and_open_url_prefix():
+    plan = IntentRouter().plan("Open Firefox and go to github.com, then search for langgraph")
+    # open_url starts Firefox itself, so the launch is dropped
+    assert plan.actions == ["pyautogui.open_url('github.com')"]
+    assert plan.intents == ["open_url"]
+    assert plan.residual == "search for langgraph"
+    assert not plan.complete
+
+
+def test_fully_deterministic_instruction():
+    plan = IntentRouter().plan("Launch the terminal, type 'ls -la' and press enter")
+    assert plan.intents == ["launch_app", "type_text", "press_key"]
+    assert plan.actions[1:] == ["pyautogui.write('ls -la')", "pyautogui.press('enter')"]
+    assert plan.complete
+
+
+def test_file_names_are_not_urls():
+    plan = IntentRouter().plan("Open notes.txt")
+    assert plan.actions == []
+    assert plan.residual == "Open notes.txt"
+
+
+def test_unknown_app_goes_to_planner():
+    plan = IntentRouter().plan("Open the quarterly budget spreadsheet")
+    assert plan.actions == [] and plan.residual == "Open the quarterly budget spreadsheet"
+
+
+def test_focus_window():
+    router = IntentRouter()
+    assert router.match_clause("Switch to the Mousepad window") == ("focus_window", "agent.focus_window('Mousepad')")
+
+
+def test_start_menu_launch_rewrite():
+    router = IntentRouter()
+    code = "pyautogui.hotkey('win'); pyautogui.write('firefox'); pyautogui.press('enter')"
+    assert router.rewrite(code) == "pyautogui.launch('firefox')"
+    assert router.rewrite("pyautogui.click(1, 2)") == "pyautogui.click(1, 2)"
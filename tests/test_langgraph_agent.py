@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("langgraph")
+
+from backend.services.langgraph_agent import LangGraphAgentService  # noqa: E402
+from backend.services.resources import RunQuota  # noqa: E402
+
+
+class FakeAdapter:
+    def __init__(self):
+        self.clicks = []
+
+    def screenshot(self, format="bytes"):
+        return b"not-a-png"
+
+    def click(self, x, y, **kwargs):
+        self.clicks.append((x, y))
+
+
+class FakeAgent:
+    """Planner that never finishes: a different click every step."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, instruction, observation):
+        self.calls += 1
+        return {"plan": "keep clicking"}, [f"pyautogui.click({self.calls * 100}, 10)"]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("FAST_PATH", "0")
+    monkeypatch.setenv("RECORDING", "0")
+    adapter = FakeAdapter()
+    return LangGraphAgentService(FakeAgent(), adapter, quota=RunQuota(max_steps=3))
+
+
+def test_step_limit_ends_run_as_quota(service):
+    outputs = list(service.run("Keep clicking forever"))
+    statuses = [update["status"] for output in outputs for node, update in output.items()
+                if node == "agent" and "status" in update]
+    assert statuses[-1] == "quota"
+    assert service.quota_exceeded == "step limit reached (3/3)"
+    assert service.run_report()["quota"]["exceeded"] == "step limit reached (3/3)"
+    # Every planned step was executed before the limit stopped the run
+    assert len(service.adapter.clicks) == 3
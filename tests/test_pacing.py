@@ -0,0 +1,105 @@
+from backend.services.pacing import DEFAULT_SETTLE, PacingController, action_type
+
+
+class FakeAdapter:
+    """Screen fingerprint that changes at the given times (seconds after the first poll)."""
+
+    def __init__(self, clock, changes=()):
+        self.clock = clock
+        self.changes = sorted(changes)
+        self.polls = 0
+
+    def screen_fingerprint(self):
+        self.polls += 1
+        return sum(1 for t in self.changes if t <= self.clock.now)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def perf_counter(self):
+        return self.now
+
+
+def controller(monkeypatch, **kwargs):
+    from backend.services import pacing
+    clock = FakeClock()
+    monkeypatch.setattr(pacing.time, "sleep", clock.sleep)
+    monkeypatch.setattr(pacing.time, "perf_counter", clock.perf_counter)
+    options = {"max_wait": 5.0, "poll_interval": 0.1, "quiet": 0.3}
+    return PacingController(**{**options, **kwargs}), clock
+
+
+def test_action_type():
+    assert action_type("pyautogui.launch('firefox')") == "launch"
+    assert action_type("pyautogui.write('hello')") == "type"
+    assert action_type("pyautogui.hotkey('ctrl', 's')") == "key"
+    assert action_type("pyautogui.click(10, 10)") == "click"
+    assert action_type("pyautogui.scroll(-5)") == "scroll"
+    assert action_type("print('hi')") == "other"
+
+
+def test_settle_waits_quiet_window_after_last_change(monkeypatch):
+    pacer, clock = controller(monkeypatch)
+    adapter = FakeAdapter(clock, changes=[0.2, 0.4])
+    waited = pacer.settle(adapter, "click")
+    assert 0.69 <= waited <= 0.81
+    assert abs(pacer.samples["click"][-1] - 0.4) < 0.01
+
+
+def test_settle_without_change_waits_estimate_and_is_censored(monkeypatch):
+    pacer, clock = controller(monkeypatch)
+    waited = pacer.settle(FakeAdapter(clock), "launch")
+    assert waited >= DEFAULT_SETTLE["launch"]
+    assert "launch" not in pacer.samples
+    assert pacer.estimate("launch") == DEFAULT_SETTLE["launch"]
+
+
+def test_fast_keystrokes_sleep_estimate_without_polling(monkeypatch):
+    pacer, clock = controller(monkeypatch)
+    adapter = FakeAdapter(clock, changes=[0.05])
+    assert pacer.settle(adapter, "type") == DEFAULT_SETTLE["type"]
+    assert pacer.settle(adapter, "key") == DEFAULT_SETTLE["key"]
+    assert adapter.polls == 0
+
+
+def test_slow_keystrokes_are_polled(monkeypatch):
+    pacer, clock = controller(monkeypatch)
+    pacer.estimates["key"] = 1.0  # e.g. Enter usually loads a page here
+    adapter = FakeAdapter(clock, changes=[0.5])
+    assert pacer.settle(adapter, "key") >= 0.8
+    assert adapter.polls > 1
+
+
+def test_short_estimate_shortens_quiet_window(monkeypatch):
+    pacer, clock = controller(monkeypatch)
+    pacer.estimates["click"] = 0.1
+    adapter = FakeAdapter(clock, changes=[0.1])
+    assert pacer.settle(adapter, "click") <= 0.21
+
+
+def test_settle_gives_up_at_max_wait(monkeypatch):
+    pacer, clock = controller(monkeypatch, max_wait=1.0)
+    adapter = FakeAdapter(clock, changes=[i / 10 for i in range(1, 100)])
+    assert pacer.settle(adapter, "click") <= 1.1
+
+
+def test_fixed_mode_sleeps_estimate(monkeypatch):
+    pacer, clock = controller(monkeypatch, mode="fixed")
+    assert pacer.settle(FakeAdapter(clock, changes=[0.1]), "type") == DEFAULT_SETTLE["type"]
+    assert clock.now == DEFAULT_SETTLE["type"]
+
+
+def test_record_updates_ewma_with_floor():
+    pacer = PacingController(alpha=0.5, floor=0.5)
+    pacer.record("click", 0.5)
+    assert pacer.estimate("click") == (DEFAULT_SETTLE["click"] + 0.5) / 2
+    for _ in range(20):
+        pacer.record("click", 0.0)
+    assert pacer.estimate("click") == 0.5 * DEFAULT_SETTLE["click"]
+    snapshot = pacer.snapshot()["actions"]["click"]
+    assert snapshot["samples"] == 21 and snapshot["p50_ms"] == 0
@@ -0,0 +1,97 @@
+import pytest
+
+from backend.services import progress
+from backend.services.progress import ProgressMonitor, action_fingerprint, is_keyboard
+
+
+@pytest.fixture(autouse=True)
+def fake_dhash(monkeypatch):
+    # Screens are given as b"<int>"; the hash is that integer
+    monkeypatch.setattr(progress, "dhash", lambda png, size: int(png))
+
+
+def screen(value: int) -> bytes:
+    return str(value).encode()
+
+
+def test_fingerprint_snaps_pointer_coordinates_only():
+    a = action_fingerprint(["pyautogui.click(963, 541, button='left')", "pyautogui.write('1234')"])
+    b = action_fingerprint(["pyautogui.click(961, 547, button='left')", "pyautogui.write('1234')"])
+    assert a == b == "pyautogui.click(960, 540, button='left') | pyautogui.write('1234')"
+    assert action_fingerprint(["pyautogui.write('1234')"]) != action_fingerprint(["pyautogui.write('1239')"])
+    assert action_fingerprint(["pyautogui.scroll(15, x=1234, y=567)"]) == "pyautogui.scroll(15, x=1220, y=560)"
+
+
+def test_is_keyboard():
+    assert is_keyboard(["pyautogui.hotkey('ctrl', 's')"])
+    assert is_keyboard(["pyautogui.click(1, 2)", "pyautogui.write('a')"])
+    assert not is_keyboard(["pyautogui.click(1, 2)"])
+
+
+def test_period_one_cycle_needs_repeats():
+    monitor = ProgressMonitor(repeats=3, no_progress=0)
+    monitor.observe(screen(0), None, 0)
+    stalls = [monitor.observe(screen(0), ["pyautogui.click(100, 100)"], step) for step in range(1, 4)]
+    assert stalls[:2] == [None, None]
+    assert stalls[2].kind == "cycle" and stalls[2].intervention == "feedback"
+
+
+def test_two_step_cycle():
+    monitor = ProgressMonitor(repeats=3, no_progress=0, max_period=2)
+    monitor.observe(screen(0), None, 0)
+    stall = None
+    for step in range(1, 5):
+        # Alternates between two screens and two actions
+        stall = monitor.observe(screen(step % 2 * 0xFFFF), [f"pyautogui.click({step % 2 * 500}, 10)"], step)
+    assert stall is not None and stall.kind == "cycle" and "2-step" in stall.detail
+
+
+def test_no_progress_streak():
+    monitor = ProgressMonitor(repeats=10, no_progress=3)
+    monitor.observe(screen(0), None, 0)
+    results = [monitor.observe(screen(0), [f"pyautogui.click({x}, 10)"], step)
+               for step, x in enumerate((100, 300, 500), start=1)]
+    assert results[-1].kind == "no_progress" and results[-1].detail == "3"
+
+
+def test_screen_change_resets_streak():
+    monitor = ProgressMonitor(repeats=10, no_progress=3)
+    monitor.observe(screen(0), None, 0)
+    monitor.observe(screen(0), ["pyautogui.click(100, 10)"], 1)
+    monitor.observe(screen(0), ["pyautogui.click(300, 10)"], 2)
+    assert monitor.observe(screen(0xFFFF), ["pyautogui.click(500, 10)"], 3) is None
+    assert monitor.still_streak == 0
+
+
+def test_keyboard_steps_do_not_count_as_no_progress():
+    monitor = ProgressMonitor(repeats=10, no_progress=2)
+    monitor.observe(screen(0), None, 0)
+    for step, text in enumerate(("a", "b", "c", "d"), start=1):
+        assert monitor.observe(screen(0), [f"pyautogui.write({text!r})"], step) is None
+    assert monitor.still_streak == 0
+
+
+def test_idle_actions_are_ignored():
+    monitor = ProgressMonitor(repeats=2, no_progress=1)
+    monitor.observe(screen(0), None, 0)
+    assert monitor.observe(screen(0), ["WAIT"], 1) is None
+    assert monitor.history == []
+
+
+def test_intervention_ladder_ends_in_abort():
+    monitor = ProgressMonitor(repeats=2, no_progress=0, max_interventions=2)
+    monitor.observe(screen(0), None, 0)
+    interventions = []
+    for step in range(1, 7):
+        stall = monitor.observe(screen(0), ["pyautogui.click(100, 100)"], step)
+        if stall:
+            interventions.append(stall.intervention)
+    assert interventions == ["feedback", "escalate", "abort"]
+    report = monitor.report(aborted_at=6, max_steps=20, tokens_per_step=100)
+    assert report["aborted"] and report["steps_saved"] == 14 and report["tokens_saved_est"] == 1400
+
+
+def test_disabled_monitor_never_stalls():
+    monitor = ProgressMonitor(enabled=False, repeats=2)
+    for step in range(5):
+        assert monitor.observe(screen(0), ["pyautogui.click(1, 1)"], step) is None
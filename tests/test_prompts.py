@@ -0,0 +1,18 @@
+from backend.services.prompts import SYSTEM_PREFIX, PromptAssembler
+
+
+def test_mission_only_on_first_step():
+    prompts = PromptAssembler("google")
+    first = prompts.build("Open the settings", first_step=True)
+    later = prompts.build("Open the settings", feedback="Actions executed (1).", first_step=False)
+    assert first.text.startswith(SYSTEM_PREFIX)
+    assert SYSTEM_PREFIX not in later.text
+    assert later.text.startswith("\n\n# TASK\nOpen the settings")
+    assert later.text.endswith("Actions executed (1).")
+
+
+def test_user_image_note_and_elements():
+    prompt = PromptAssembler("google").build("Describe it", user_image=True, elements="[1] button OK",
+                                             first_step=False)
+    assert "[USER PROVIDED AN IMAGE/SCREENSHOT AS CONTEXT]" in prompt.text
+    assert prompt.text.endswith("[ACCESSIBILITY TREE]:\n[1] button OK")
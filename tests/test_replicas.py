@@ -0,0 +1,70 @@
+from backend.services.replicas import ReplicaPool
+
+
+def make_pool(**kwargs):
+    return ReplicaPool(["http://a/v1", "http://b/v1/", "http://c/v1"], probe_interval=0, **kwargs)
+
+
+def test_acquire_prefers_least_outstanding():
+    pool = make_pool()
+    first = pool.acquire()
+    second = pool.acquire()
+    third = pool.acquire()
+    assert len({first.url, second.url, third.url}) == 3
+    pool.release(second, 0.1, ok=True)
+    assert pool.acquire() is second
+
+
+def test_acquire_breaks_ties_by_latency():
+    pool = make_pool()
+    a, b, c = pool.replicas
+    a.ewma_latency, b.ewma_latency, c.ewma_latency = 0.3, 0.1, 0.2
+    assert pool.acquire() is b
+
+
+def test_acquire_excludes_replica_for_hedging():
+    pool = make_pool()
+    primary = pool.acquire()
+    assert pool.acquire(exclude=primary) is not primary
+
+
+def test_consecutive_failures_eject_replica():
+    pool = make_pool(failure_threshold=2)
+    bad = pool.replicas[0]
+    for _ in range(2):
+        pool.release(bad, 0.1, ok=False)
+    assert bad.ejected_until > 0
+    assert bad not in pool.ranked()
+
+
+def test_success_resets_failure_streak():
+    pool = make_pool(failure_threshold=2)
+    replica = pool.replicas[0]
+    pool.release(replica, 0.1, ok=False)
+    pool.release(replica, 0.1, ok=True)
+    pool.release(replica, 0.1, ok=False)
+    assert replica.ejected_until == 0.0
+
+
+def test_slow_replica_is_ejected():
+    pool = make_pool(slow_factor=3.0)
+    fast_a, fast_b, slow = pool.replicas
+    fast_a.ewma_latency = fast_b.ewma_latency = 0.1
+    for _ in range(5):
+        pool.release(slow, 1.0, ok=True)
+    assert slow.ejected_until > 0
+    assert slow not in pool.ranked()
+
+
+def test_everything_ejected_fails_open():
+    pool = make_pool(failure_threshold=1)
+    for replica in pool.replicas:
+        pool.release(replica, 0.1, ok=False)
+    assert len(pool.ranked()) == 3
+    assert pool.acquire() in pool.replicas
+
+
+def test_unhealthy_replica_is_skipped():
+    pool = make_pool()
+    pool.replicas[0].healthy = False
+    assert pool.replicas[0] not in pool.ranked()
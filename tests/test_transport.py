@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from backend.services import transport
+from backend.services.transport import TokenBucket
+
+
+def test_token_bucket_unlimited_never_blocks():
+    bucket = TokenBucket(0)
+    start = time.monotonic()
+    for _ in range(1000):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+def test_token_bucket_limits_rate_after_burst():
+    bucket = TokenBucket(20, burst=2)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # Two tokens come from the burst, the other two take 1/20 s each
+    assert time.monotonic() - start >= 0.09
+
+
+def _resilient(responses, max_retries=3):
+    httpx = pytest.importorskip("httpx")
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        status, headers = responses[min(len(calls), len(responses)) - 1]
+        return httpx.Response(status, headers=headers, json={})
+
+    inner = httpx.MockTransport(handler)
+    resilient = transport.ResilientTransport(inner, TokenBucket(0), max_retries=max_retries,
+                                             backoff_base=0.0, backoff_cap=0.01)
+    client = httpx.Client(transport=resilient)
+    return client, calls
+
+
+def test_retries_retryable_statuses_until_success():
+    client, calls = _resilient([(503, {}), (429, {}), (200, {})])
+    response = client.post("http://replica/v1/chat/completions", json={"x": 1})
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert all(call.content == calls[0].content for call in calls)
+
+
+def test_gives_up_after_max_retries():
+    client, calls = _resilient([(502, {})], max_retries=2)
+    assert client.get("http://replica/v1/models").status_code == 502
+    assert len(calls) == 3
+
+
+def test_does_not_retry_client_errors():
+    client, calls = _resilient([(400, {}), (200, {})])
+    assert client.get("http://replica/v1/models").status_code == 400
+    assert len(calls) == 1
+
+
+def test_retry_after_is_capped():
+    httpx = pytest.importorskip("httpx")
+    resilient = transport.ResilientTransport(None, TokenBucket(0), backoff_cap=2.0)
+    assert resilient._delay(0, httpx.Response(429, headers={"retry-after": "1.5"})) == 1.5
+    assert resilient._delay(0, httpx.Response(429, headers={"retry-after": "60"})) == 2.0